@@ -0,0 +1,119 @@
+"""
+Micro-benchmark for HistoryManager's favorites and continue-watching
+lookups against the old list/dict scans, at 10k and 100k entries.
+
+Run from the gui folder:
+    python benchmarks/bench_history.py
+"""
+import os
+import random
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.history_manager import HistoryManager
+
+
+class LegacyHistory:
+    """The in-memory part of the previous JSON HistoryManager, kept verbatim for comparison."""
+
+    def __init__(self, history, favorites):
+        self.history = history
+        self.favorites = favorites
+
+    def is_favorite(self, anime_id):
+        anime_id = str(anime_id)
+        return any(f["id"] == anime_id for f in self.favorites)
+
+    def get_continue_watching(self, limit=10):
+        continue_list = []
+        for anime_id, data in self.history.items():
+            continue_list.append({
+                "id": anime_id,
+                "title": data["title"],
+                "thumbnail": data.get("thumbnail"),
+                "last_episode": data["last_episode"],
+                "last_watched": data["last_watched"]
+            })
+        continue_list.sort(key=lambda x: x["last_watched"] or "", reverse=True)
+        return continue_list[:limit]
+
+
+def sample_library(count, seed=1):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    history = {}
+    for i in range(count):
+        history[f"show{i}"] = {
+            "title": f"Show {i}",
+            "thumbnail": None,
+            "episodes": {},
+            "last_episode": rng.randint(1, 24),
+            "last_watched": (start + timedelta(seconds=rng.randint(0, 10 ** 8))).isoformat()
+        }
+    favorites = [{"id": f"show{i}", "title": f"Show {i}", "thumbnail": None, "added": start.isoformat()}
+                 for i in range(count)]
+    return history, favorites
+
+
+def populate(manager, history, favorites):
+    """Bulk-loads the sample straight into SQLite (the public API commits per call)"""
+    with manager.conn:
+        manager.conn.executemany(
+            "INSERT INTO shows (anime_id, title, thumbnail, last_episode, last_watched) VALUES (?, ?, ?, ?, ?)",
+            [(anime_id, d["title"], d["thumbnail"], d["last_episode"], d["last_watched"])
+             for anime_id, d in history.items()]
+        )
+        manager.conn.executemany(
+            "INSERT INTO favorites (anime_id, title, thumbnail, added) VALUES (?, ?, ?, ?)",
+            [(f["id"], f["title"], f["thumbnail"], f["added"]) for f in favorites]
+        )
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    return label, seconds / number
+
+
+def run(count):
+    history, favorites = sample_library(count)
+    legacy = LegacyHistory(history, favorites)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        populate(HistoryManager(data_dir), history, favorites)
+        manager = HistoryManager(data_dir)  # fresh instance: indexes are built from the database
+
+        load_start = timeit.default_timer()
+        assert manager.get_continue_watching(10) == legacy.get_continue_watching(10)
+        first_call = timeit.default_timer() - load_start
+        missing, last = "nope", f"show{count - 1}"
+        assert manager.is_favorite(last) and not manager.is_favorite(missing)
+
+        episode = iter(range(1, 10 ** 9))
+        rows = [
+            bench("legacy is_favorite (miss)", lambda: legacy.is_favorite(missing), 20),
+            bench("is_favorite (miss)", lambda: manager.is_favorite(missing), 20000),
+            bench("legacy continue watching", lambda: legacy.get_continue_watching(10), 3),
+            bench("continue watching", lambda: manager.get_continue_watching(10), 20000),
+            bench("mark_episode_watched", lambda: manager.mark_episode_watched(last, "Show", next(episode)), 200),
+            ("first continue watching", first_call),
+        ]
+
+    print(f"--- {count:,} shows / favorites ---")
+    baseline = {"is_favorite (miss)": rows[0][1], "continue watching": rows[2][1]}
+    for label, seconds in rows:
+        speedup = f"{baseline[label] / seconds:8.0f}x" if label in baseline else ""
+        print(f"{label:<28} {seconds * 1e6:12.1f} µs {speedup}")
+    print()
+
+
+def main():
+    for count in (10_000, 100_000):
+        run(count)
+
+
+if __name__ == "__main__":
+    main()
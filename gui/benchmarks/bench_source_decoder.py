@@ -0,0 +1,97 @@
+"""
+Micro-benchmark for core.source_decoder against the old per-chunk decoder.
+
+Run from the gui folder:
+    python benchmarks/bench_source_decoder.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.source_decoder import SOURCE_MAP, decode_source, decode_many
+
+
+def legacy_decrypt(url):
+    """The previous AniScraper._decrypt_source, kept verbatim for comparison."""
+    mapping = dict(SOURCE_MAP)
+    if url.startswith("--"):
+        url = url[2:]
+    decoded_chars = []
+    for i in range(0, len(url), 2):
+        chunk = url[i:i+2]
+        if chunk in mapping:
+            decoded_chars.append(mapping[chunk])
+        else:
+            decoded_chars.append(chunk)
+    result = "".join(decoded_chars)
+    result = result.replace("/clock", "/clock.json")
+    return result
+
+
+def encode(plain):
+    reverse = {char: chunk for chunk, char in SOURCE_MAP.items()}
+    return "--" + "".join(reverse[c] for c in plain)
+
+
+def sample_urls(count, seed=1):
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    urls = []
+    for _ in range(count):
+        token = "".join(rng.choice(alphabet) for _ in range(rng.randint(20, 60)))
+        path = rng.choice(["/apivtwo/clock?id=", "/player/", "https://example.com/e/"])
+        urls.append(encode(f"{path}{token}"))
+    return urls
+
+
+EDGE_CASES = [
+    "",
+    "--",
+    "--175b54575b53",      # /clock
+    "--175b54575b5316",    # /clock.
+    "--7A79",              # upper case hex is left alone
+    "--7a7",               # odd length
+    "--ff7a",              # unknown chunk
+    "https://www.youtube.com/watch?v=2019",
+    "-- 7a",
+]
+
+
+def check_identical(urls):
+    for url in urls + EDGE_CASES:
+        expected = legacy_decrypt(url)
+        assert decode_source(url) == expected, url
+    assert decode_many(urls + EDGE_CASES) == [legacy_decrypt(u) for u in urls + EDGE_CASES]
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    return label, seconds / number
+
+
+def main():
+    urls = sample_urls(12)        # a typical episode has a handful of embeds
+    big_batch = sample_urls(2000)
+    check_identical(urls)
+    check_identical(big_batch[:200])
+    print("✓ Output is byte-for-byte identical to the legacy decoder\n")
+
+    rows = [
+        bench("legacy, per URL", lambda: [legacy_decrypt(u) for u in urls], 2000),
+        bench("decode_source, per URL", lambda: [decode_source(u) for u in urls], 2000),
+        bench("decode_many, 12 URLs", lambda: decode_many(urls), 2000),
+        bench("legacy, 2000 URLs", lambda: [legacy_decrypt(u) for u in big_batch], 10),
+        bench("decode_many, 2000 URLs", lambda: decode_many(big_batch), 10),
+    ]
+
+    baseline = {12: rows[0][1], 2000: rows[3][1]}
+    for label, seconds in rows:
+        size = 2000 if "2000" in label else 12
+        print(f"{label:<26} {seconds * 1e6:10.1f} µs/batch   {baseline[size] / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
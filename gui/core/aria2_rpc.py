@@ -0,0 +1,240 @@
+"""
+One long-lived aria2c, driven over JSON-RPC.
+
+Instead of an aria2c process per download (and scraping its console
+output), a single `aria2c --enable-rpc` listens on localhost with a random
+port and secret. Downloads are added with aria2.addUri; one poller thread
+fetches the status of every watched download in a single system.multicall,
+with exact byte counts. Pausing, resuming and removing use aria2's own calls.
+"""
+import atexit
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+STATUS_KEYS = ["gid", "status", "totalLength", "completedLength", "downloadSpeed", "errorCode", "errorMessage"]
+
+
+class Aria2Error(Exception):
+    pass
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Aria2Daemon:
+    # Seconds between status polls
+    POLL_INTERVAL = 1.0
+    STARTUP_TIMEOUT = 5.0
+    # The download manager does the queueing, aria2 just runs what it's given
+    MAX_CONCURRENT = 16
+
+    def __init__(self):
+        self.process: Optional[subprocess.Popen] = None
+        self.port = 0
+        self.secret = ""
+        self.lock = threading.Lock()
+        # Plain session: local calls shouldn't go through the retrying pool
+        self.session = requests.Session()
+        self.session.trust_env = False  # never send localhost RPC through a proxy
+
+        self.condition = threading.Condition()
+        self.statuses: Dict[str, Dict] = {}  # gid -> last tellStatus result
+        self.watched = set()
+        self.poller: Optional[threading.Thread] = None
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("aria2c") is not None
+
+    # --- process ---
+
+    def start(self) -> bool:
+        """Starts aria2c if it isn't running; False when it can't be started"""
+        with self.lock:
+            if self.process and self.process.poll() is None:
+                return True
+            if not self.available():
+                return False
+
+            self.port = _free_port()
+            self.secret = secrets.token_hex(16)
+            cmd = [
+                "aria2c",
+                "--enable-rpc=true",
+                "--rpc-listen-all=false",
+                f"--rpc-listen-port={self.port}",
+                f"--rpc-secret={self.secret}",
+                # Don't outlive the app, even if it crashes
+                f"--stop-with-process={os.getpid()}",
+                f"--max-concurrent-downloads={self.MAX_CONCURRENT}",
+                # Picks up .part files (and their .aria2 control files) after a pause or restart
+                "--continue=true",
+                "--auto-save-interval=5",
+                "--file-allocation=none",
+                "--console-log-level=error",
+                "--summary-interval=0",
+                "--quiet=true",
+            ]
+            # Nothing reads its output, so it can't fill up a pipe and block
+            self.process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + self.STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                print(f"✗ aria2c exited on startup (code {self.process.returncode})")
+                return False
+            try:
+                version = self.call("aria2.getVersion")
+                print(f"🚀 aria2c {version.get('version')} RPC on port {self.port}")
+                return True
+            except (requests.RequestException, Aria2Error):
+                time.sleep(0.1)
+        print("✗ aria2c RPC did not come up")
+        self.shutdown()
+        return False
+
+    def shutdown(self):
+        with self.lock:
+            process, self.process = self.process, None
+        if not process or process.poll() is not None:
+            return
+        try:
+            # Lets aria2 write its control files
+            self._post("aria2.shutdown", [f"token:{self.secret}"], timeout=2)
+            process.wait(timeout=5)
+        except Exception:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    # --- RPC ---
+
+    def _post(self, method: str, params: List, timeout: float = 10):
+        payload = {"jsonrpc": "2.0", "id": "ani-cli", "method": method, "params": params}
+        response = self.session.post(f"http://127.0.0.1:{self.port}/jsonrpc", json=payload, timeout=timeout)
+        body = response.json()
+        if "error" in body:
+            raise Aria2Error(body["error"].get("message", "aria2 error"))
+        return body.get("result")
+
+    def call(self, method: str, *params):
+        return self._post(method, [f"token:{self.secret}", *params])
+
+    def add_uri(self, url: str, directory: str, out: str, headers: Optional[Dict[str, str]] = None,
+                options: Optional[Dict[str, str]] = None) -> str:
+        """Queues a download and returns its gid"""
+        if not self.start():
+            raise Aria2Error("aria2c is not available")
+        opts = {"dir": directory, "out": out}
+        if headers:
+            referer = headers.get("Referer")
+            if referer:
+                opts["referer"] = referer
+            extra = [f"{key}: {value}" for key, value in headers.items() if key != "Referer"]
+            if extra:
+                opts["header"] = extra
+        opts.update(options or {})
+        return self.call("aria2.addUri", [url], opts)
+
+    def pause(self, gid: str):
+        self.call("aria2.forcePause", gid)
+
+    def unpause(self, gid: str):
+        self.call("aria2.unpause", gid)
+
+    def remove(self, gid: str):
+        if not self.process or self.process.poll() is not None:
+            return  # gone with the daemon
+        for method in ("aria2.forceRemove", "aria2.removeDownloadResult"):
+            try:
+                self.call(method, gid)
+            except (requests.RequestException, Aria2Error):
+                pass  # already stopped / no result kept
+
+    def tell_status(self, gid: str) -> Optional[Dict]:
+        """Status of one download, None if aria2 doesn't know the gid (e.g. after a restart)"""
+        if not self.process or self.process.poll() is not None:
+            return None
+        try:
+            return self.call("aria2.tellStatus", gid, STATUS_KEYS)
+        except (requests.RequestException, Aria2Error):
+            return None
+
+    def tell_all(self, gids: List[str]) -> Dict[str, Dict]:
+        """Status of many downloads in one round trip"""
+        calls = [{"methodName": "aria2.tellStatus", "params": [f"token:{self.secret}", gid, STATUS_KEYS]}
+                 for gid in gids]
+        results = self._post("system.multicall", [calls])
+        statuses = {}
+        for gid, result in zip(gids, results):
+            # Each entry is [status] or a fault struct
+            if isinstance(result, list) and result:
+                statuses[gid] = result[0]
+            else:
+                statuses[gid] = {"gid": gid, "status": "removed",
+                                 "errorMessage": (result or {}).get("message", "unknown download")}
+        return statuses
+
+    def change_global_limit(self, bytes_per_second: int):
+        """Overall download cap for everything aria2 runs, 0 = unlimited"""
+        if self.process and self.process.poll() is None:
+            self.call("aria2.changeGlobalOption", {"max-overall-download-limit": str(max(0, int(bytes_per_second)))})
+
+    # --- status polling ---
+
+    def watch(self, gid: str):
+        with self.condition:
+            self.watched.add(gid)
+            if not self.poller or not self.poller.is_alive():
+                self.poller = threading.Thread(target=self._poll, daemon=True, name="aria2-poll")
+                self.poller.start()
+
+    def unwatch(self, gid: str):
+        with self.condition:
+            self.watched.discard(gid)
+            self.statuses.pop(gid, None)
+
+    def wait_status(self, gid: str, timeout: float = POLL_INTERVAL) -> Optional[Dict]:
+        """Blocks until the next poll (or `timeout`) and returns the latest status of `gid`"""
+        with self.condition:
+            self.condition.wait(timeout)
+            return self.statuses.get(gid)
+
+    def _poll(self):
+        while True:
+            with self.condition:
+                gids = list(self.watched)
+                if not gids:
+                    self.poller = None
+                    return
+            try:
+                statuses = self.tell_all(gids)
+            except Exception as e:
+                print(f"⚠️ aria2 status poll failed: {e}")
+                statuses = {}
+                if not self.process or self.process.poll() is not None:
+                    statuses = {gid: {"gid": gid, "status": "error", "errorMessage": "aria2c exited"} for gid in gids}
+            with self.condition:
+                for gid, status in statuses.items():
+                    if gid in self.watched:
+                        self.statuses[gid] = status
+                self.condition.notify_all()
+            time.sleep(self.POLL_INTERVAL)
+
+# Global instance
+aria2_daemon = Aria2Daemon()
+atexit.register(aria2_daemon.shutdown)
@@ -0,0 +1,166 @@
+"""
+Global download bandwidth governor.
+
+Every download engine reports the bytes it reads through one shared token
+bucket, so the cap holds across all active downloads combined. The effective
+limit is the lowest of:
+  - the base limit ("limit_kbps")
+  - the playback limit ("playback_limit_kbps") while a player we launched runs
+  - the limit of the current time-of-day window ("schedule"), e.g.
+    {"start": "18:00", "end": "23:30", "limit_kbps": 300}
+A limit of 0 means unlimited.
+
+aria2 has its own limiter, so its downloads take a share of the limit out
+of the bucket (`reserve`) instead of reading through it; the two always add
+up to the limit. ffmpeg (encrypted HLS) can't be throttled and isn't counted.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from .settings_manager import settings_manager
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Callers may go into debt and sleep it off."""
+
+    def __init__(self, rate: float = 0.0):
+        self.lock = threading.Lock()
+        self.rate = 0.0
+        self.burst = 0.0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float):
+        with self.lock:
+            if rate == self.rate:
+                return
+            self.rate = max(0.0, rate)
+            # Half a second worth of data, but at least one read
+            self.burst = max(self.rate * 0.5, 64 * 1024)
+            self.tokens = min(self.tokens, self.burst)
+            self.updated = time.monotonic()
+
+    def consume(self, amount: int):
+        with self.lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _minutes(value: str) -> int:
+    hours, _, minutes = value.partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+class BandwidthGovernor:
+    # How often the effective limit is recomputed (seconds)
+    REFRESH_INTERVAL = 1.0
+    # The bucket never drops below this (bytes/s) so requests made through it
+    # keep moving while aria2 holds the rest of the limit
+    MIN_BUCKET_RATE = 32 * 1024
+
+    def __init__(self):
+        self.bucket = TokenBucket()
+        self.lock = threading.Lock()
+        self.players: List = []  # Popen handles of players we launched
+        self.listeners: List[Callable[[int], None]] = []
+        self.limit = 0  # bytes/s, 0 = unlimited
+        self.reserved_fraction = 0.0  # of the limit, handed to aria2
+        self._refreshed = 0.0
+        self.refresh()
+
+    def _settings(self) -> Dict:
+        return settings_manager.get_all().get("bandwidth", {})
+
+    def _scheduled_limit(self, settings: Dict, now: datetime) -> Optional[int]:
+        minute = now.hour * 60 + now.minute
+        for window in settings.get("schedule") or []:
+            try:
+                start, end = _minutes(window["start"]), _minutes(window["end"])
+            except (KeyError, ValueError):
+                continue
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)  # over midnight
+            if inside:
+                return int(window.get("limit_kbps") or 0)
+        return None
+
+    def player_running(self) -> bool:
+        with self.lock:
+            self.players = [p for p in self.players if p.poll() is None]
+            return bool(self.players)
+
+    def effective_limit_kbps(self, now: Optional[datetime] = None) -> int:
+        settings = self._settings()
+        limits = [int(settings.get("limit_kbps") or 0)]
+        if self.player_running():
+            limits.append(int(settings.get("playback_limit_kbps") or 0))
+        scheduled = self._scheduled_limit(settings, now or datetime.now())
+        if scheduled is not None:
+            limits.append(scheduled)
+        limits = [limit for limit in limits if limit > 0]
+        return min(limits) if limits else 0
+
+    def refresh(self):
+        """Recompute the limit; listeners hear about changes (e.g. to update aria2)"""
+        self._refreshed = time.monotonic()
+        limit = self.effective_limit_kbps() * 1024
+        if limit == self.limit:
+            return
+        self.limit = limit
+        self._split()
+        print(f"🚦 Download bandwidth limit: {f'{limit // 1024} KB/s' if limit else 'unlimited'}")
+        for listener in list(self.listeners):
+            try:
+                listener(limit)
+            except Exception as e:
+                print(f"Error in bandwidth listener: {e}")
+
+    def reserve(self, fraction: float) -> int:
+        """
+        Hands `fraction` of the limit to an engine with its own limiter (aria2);
+        the bucket keeps the rest. Returns the reserved bytes/s (0 = no limit).
+        """
+        with self.lock:
+            self.reserved_fraction = min(max(fraction, 0.0), 1.0)
+        return self._split()
+
+    def _split(self) -> int:
+        limit = self.limit
+        if not limit:
+            self.bucket.set_rate(0)
+            return 0
+        floor = min(self.MIN_BUCKET_RATE, limit // 10)
+        reserved = min(int(limit * self.reserved_fraction), limit - floor)
+        self.bucket.set_rate(limit - reserved)
+        return reserved
+
+    def maybe_refresh(self):
+        if time.monotonic() - self._refreshed >= self.REFRESH_INTERVAL:
+            self.refresh()
+
+    def throttle(self, num_bytes: int):
+        """Called by download engines after reading `num_bytes`; blocks while over the limit"""
+        self.maybe_refresh()
+        self.bucket.consume(num_bytes)
+
+    def track_player(self, process):
+        """Apply the playback limit until `process` exits"""
+        with self.lock:
+            self.players.append(process)
+        self.refresh()
+
+    def add_listener(self, callback: Callable[[int], None]):
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+# Global instance
+bandwidth_governor = BandwidthGovernor()
@@ -0,0 +1,291 @@
+"""
+Bulk "download episode range" pipeline.
+
+    episode list -> embeds (batched lookups) -> resolver pool -> ready queue -> DownloadManager
+
+A couple of resolver threads turn episodes into stream links a few episodes
+ahead of the downloads. The ready queue is bounded, so resolvers block
+(backpressure) instead of producing links that would expire before they're
+used, and new downloads are only handed over while the download manager has
+a free slot for them. Every episode is retried on its own (fresh link each
+time) without stopping the rest of the batch.
+"""
+import heapq
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from core.scraper import scraper as default_scraper
+from core.download_manager import download_manager as default_download_manager
+from core.settings_manager import settings_manager
+
+
+def _episode_number(episode: str) -> Optional[float]:
+    try:
+        return float(episode)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_episode_range(spec: str, episodes: List[str],
+                        is_watched: Optional[Callable[[str], bool]] = None) -> List[str]:
+    """
+    Picks episodes from `episodes` (kept in their order) by a spec such as
+    "1-24", "5-" (5 to the end), "1,3,7-9", "all" or "unwatched".
+    """
+    selected = set()
+    for token in (spec or "").replace(" ", "").lower().split(","):
+        if not token:
+            continue
+        if token == "all":
+            selected.update(episodes)
+        elif token == "unwatched":
+            selected.update(ep for ep in episodes if not (is_watched and is_watched(ep)))
+        elif "-" in token:
+            low, _, high = token.partition("-")
+            low_value = _episode_number(low) if low else float("-inf")
+            high_value = _episode_number(high) if high else float("inf")
+            if low_value is None or high_value is None:
+                raise ValueError(f"Invalid range: {token}")
+            selected.update(ep for ep in episodes
+                            if _episode_number(ep) is not None and low_value <= _episode_number(ep) <= high_value)
+        else:
+            value = _episode_number(token)
+            if value is None:
+                raise ValueError(f"Invalid episode: {token}")
+            selected.update(ep for ep in episodes if _episode_number(ep) == value)
+    return [ep for ep in episodes if ep in selected]
+
+
+class BatchDownload:
+    RESOLVE_WORKERS = 2
+    # Resolved links waiting for a download slot, at most
+    LOOKAHEAD = 3
+    RETRIES = 3
+    RETRY_DELAY = 2.0
+    POLL_INTERVAL = 0.5
+
+    # Per-episode states
+    QUEUED, RESOLVING, READY, DOWNLOADING, PAUSED, DONE, FAILED, CANCELLED = (
+        "queued", "resolving", "ready", "downloading", "paused", "done", "failed", "cancelled")
+
+    def __init__(self, show_id: str, title: str, episodes: List[str], mode: str = "sub",
+                 quality: Optional[str] = None, on_update: Optional[Callable[["BatchDownload"], None]] = None,
+                 scraper=None, download_manager=None):
+        self.show_id = show_id
+        self.title = title
+        self.episodes = list(episodes)
+        self.mode = mode
+        self.quality = quality or settings_manager.get("playback", "quality") or "auto"
+        self.on_update = on_update
+        self.scraper = scraper or default_scraper
+        self.download_manager = download_manager or default_download_manager
+
+        self.states: Dict[str, str] = {ep: self.QUEUED for ep in self.episodes}
+        self.attempts: Dict[str, int] = {ep: 0 for ep in self.episodes}
+        self.errors: Dict[str, str] = {}
+        self.download_ids: Dict[str, str] = {}
+
+        self.condition = threading.Condition()
+        self.todo = deque(self.episodes)
+        self.retry: List = []  # heap of (not_before, episode)
+        self.ready: "queue.Queue" = queue.Queue(maxsize=self.LOOKAHEAD)
+        self._fetched_chunks = set()
+        self._embeds_lock = threading.Lock()
+        self.cancelled = False
+        self.threads: List[threading.Thread] = []
+
+    # --- public ---
+
+    def start(self) -> "BatchDownload":
+        print(f"📦 Batch download: {self.title}, {len(self.episodes)} episode(s)")
+        self.threads = [threading.Thread(target=self._resolver, daemon=True, name=f"batch-resolve-{i}")
+                        for i in range(self.RESOLVE_WORKERS)]
+        self.threads.append(threading.Thread(target=self._coordinator, daemon=True, name="batch-handoff"))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def cancel(self):
+        """Stops resolving and cancels this batch's unfinished downloads"""
+        with self.condition:
+            self.cancelled = True
+            to_cancel = [self.download_ids[ep] for ep, state in self.states.items()
+                         if state in (self.DOWNLOADING, self.PAUSED) and ep in self.download_ids]
+            for ep, state in self.states.items():
+                if state not in (self.DONE, self.FAILED):
+                    self.states[ep] = self.CANCELLED
+            self.condition.notify_all()
+        for download_id in to_cancel:
+            self.download_manager.cancel_download(download_id)
+        self._notify()
+
+    def counts(self) -> Dict[str, int]:
+        with self.condition:
+            counts = {}
+            for state in self.states.values():
+                counts[state] = counts.get(state, 0) + 1
+            return counts
+
+    @property
+    def finished(self) -> bool:
+        with self.condition:
+            return self.cancelled or all(s in (self.DONE, self.FAILED) for s in self.states.values())
+
+    @property
+    def settled(self) -> bool:
+        """Nothing left in progress: finished, or only waiting on downloads the user paused"""
+        with self.condition:
+            return self.cancelled or all(s in (self.DONE, self.FAILED, self.PAUSED) for s in self.states.values())
+
+    # --- stages ---
+
+    def _set_state(self, ep: str, state: str, error: Optional[str] = None):
+        with self.condition:
+            if self.cancelled:
+                return  # a resolver or download finishing up after cancel()
+            self.states[ep] = state
+            if error:
+                self.errors[ep] = error
+            self.condition.notify_all()
+        self._notify()
+
+    def _notify(self):
+        if self.on_update:
+            try:
+                self.on_update(self)
+            except Exception as e:
+                print(f"Error in batch listener: {e}")
+
+    def _fail_or_retry(self, ep: str, error: str):
+        self.attempts[ep] += 1
+        if self.attempts[ep] < self.RETRIES and not self.cancelled:
+            print(f"🔁 Episode {ep}: {error}, retrying ({self.attempts[ep]}/{self.RETRIES - 1})")
+            with self.condition:
+                heapq.heappush(self.retry, (time.monotonic() + self.RETRY_DELAY * self.attempts[ep], ep))
+            self._set_state(ep, self.QUEUED)
+        else:
+            print(f"✗ Episode {ep} failed: {error}")
+            self._set_state(ep, self.FAILED, error)
+
+    def _next_episode(self) -> Optional[str]:
+        """Blocks until there's an episode to resolve; None once nothing is left to do"""
+        with self.condition:
+            while not self.cancelled:
+                now = time.monotonic()
+                if self.retry and self.retry[0][0] <= now:
+                    ep = heapq.heappop(self.retry)[1]
+                elif self.todo:
+                    ep = self.todo.popleft()
+                elif all(s in (self.DONE, self.FAILED) for s in self.states.values()):
+                    return None
+                else:
+                    # Downloads still running may come back as retries
+                    self.condition.wait(self.POLL_INTERVAL)
+                    continue
+                self.states[ep] = self.RESOLVING
+                return ep
+            return None
+
+    def _ensure_embeds(self, ep: str):
+        """One batched GraphQL lookup per chunk of episodes, the resolvers then hit the cache"""
+        size = self.scraper.EMBED_BATCH_SIZE
+        chunk = self.episodes.index(ep) // size
+        with self._embeds_lock:
+            if chunk in self._fetched_chunks:
+                return
+            self._fetched_chunks.add(chunk)
+            episodes = self.episodes[chunk * size:(chunk + 1) * size]
+            try:
+                self.scraper.get_episode_embeds_batch(self.show_id, episodes, mode=self.mode)
+            except Exception as e:
+                print(f"Batched embed lookup failed: {e}")
+
+    def _resolver(self):
+        while True:
+            ep = self._next_episode()
+            if ep is None:
+                return
+            if self.download_manager.find_existing(self.title, ep, self.mode):
+                # Already on disk, nothing to resolve
+                self._set_state(ep, self.DONE)
+                continue
+            try:
+                self._ensure_embeds(ep)
+                embeds = self.scraper.get_episode_embeds(self.show_id, ep, mode=self.mode)
+                if not embeds:
+                    raise Exception("no embeds found")
+                candidates = self.scraper.resolve_candidates(embeds, show_id=self.show_id)
+                stream = self.scraper.choose_stream(candidates, self.quality)
+                if not stream:
+                    raise Exception("no stream link")
+            except Exception as e:
+                self._fail_or_retry(ep, str(e))
+                continue
+
+            self._set_state(ep, self.READY)
+            # Blocks while the downloads are behind: backpressure
+            while not self.cancelled:
+                try:
+                    self.ready.put((ep, stream), timeout=self.POLL_INTERVAL)
+                    break
+                except queue.Full:
+                    continue
+
+    def _in_flight(self) -> int:
+        """This batch's downloads that are queued or running in the download manager"""
+        count = 0
+        for ep, download_id in list(self.download_ids.items()):
+            if self.states.get(ep) != self.DOWNLOADING:
+                continue
+            item = self.download_manager.downloads.get(download_id)
+            if item and item.status in ("pending", "downloading"):
+                count += 1
+        return count
+
+    def _check_downloads(self):
+        for ep, download_id in list(self.download_ids.items()):
+            state = self.states.get(ep)
+            if state not in (self.DOWNLOADING, self.PAUSED):
+                continue
+            item = self.download_manager.downloads.get(download_id)
+            if item is None:
+                continue
+            if item.status == "paused":
+                if state != self.PAUSED:
+                    self._set_state(ep, self.PAUSED)
+            elif item.status in ("pending", "downloading"):
+                if state != self.DOWNLOADING:
+                    self._set_state(ep, self.DOWNLOADING)  # resumed
+            elif item.status == "completed":
+                self._set_state(ep, self.DONE)
+            elif item.status == "cancelled":
+                self._set_state(ep, self.FAILED, "cancelled")
+            elif item.status == "error":
+                # The link may have expired or the CDN hiccupped: resolve again
+                self._fail_or_retry(ep, item.error_msg or "download failed")
+
+    def _coordinator(self):
+        slots = self.download_manager.limits()[0]
+        while not self.finished:
+            self._check_downloads()
+            if self._in_flight() >= slots:
+                time.sleep(self.POLL_INTERVAL)
+                continue
+            try:
+                ep, stream = self.ready.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if self.cancelled:
+                break
+            self.download_ids[ep] = self.download_manager.download_episode(
+                stream.url, self.title, ep, referer=stream.referer, hls=stream.hls,
+                show_id=self.show_id, mode=self.mode
+            )
+            self._set_state(ep, self.DOWNLOADING)
+
+        counts = self.counts()
+        print(f"📦 Batch finished: {counts.get(self.DONE, 0)} done, {counts.get(self.FAILED, 0)} failed")
+        self._notify()
@@ -1,13 +1,24 @@
 import os
-import subprocess
+import json
+import heapq
+import itertools
 import shutil
-import requests
 import threading
 import uuid
 import time
-from dataclasses import dataclass
-from typing import Callable, Dict, Optional, List
+from dataclasses import dataclass, asdict, fields
+from pathlib import Path
+from typing import Callable, Dict, Optional, List, Set
+from urllib.parse import urlparse
 from core.settings_manager import settings_manager
+from core.hls import throughput_estimator
+from core.http_transport import http_transport
+from core.segmented_download import SegmentedDownloader, DownloadCancelled
+from core.bandwidth import bandwidth_governor
+from core.hls_download import HlsDownloader, has_ffmpeg, is_hls_url, remux, ffmpeg_download
+from core.aria2_rpc import aria2_daemon, Aria2Error
+from core.integrity import container_problem, sha256_file
+from core.persistence import atomic_write_json
 
 @dataclass
 class DownloadItem:
@@ -16,20 +27,72 @@ class DownloadItem:
     episode: str
     url: str
     path: str
-    status: str = "pending"  # pending, downloading, completed, error, cancelled
+    referer: str = "https://allmanga.to"
+    hls: bool = False
+    show_id: str = ""
+    mode: str = "sub"
+    status: str = "pending"  # pending (queued), downloading, paused, completed, error, cancelled
+    priority: int = 0  # lower starts first, see DownloadManager.download_next
     progress: float = 0.0
     speed: str = "0 KB/s"
     eta: str = "--:--"
     error_msg: Optional[str] = None
     cancel_flag: bool = False
+    pause_flag: bool = False
+    # What's already in the .part file (see SegmentedDownloader.resume_state)
+    resume: Optional[Dict] = None
+    total_bytes: int = 0  # size the server announced, 0 if unknown
+    sha256: Optional[str] = None  # expected checksum if given, else the computed one
+
+    @property
+    def part_path(self) -> str:
+        """Where the download is written until it's complete"""
+        return self.path + ".part"
+
+    @property
+    def stream_path(self) -> str:
+        """Raw HLS segments, before they're remuxed into part_path"""
+        return self.path + ".ts.part"
+
+# Statuses worth keeping in the journal, everything else is done with
+JOURNAL_STATUSES = ("pending", "downloading", "paused", "error")
+# Fields that only make sense while the process is running
+TRANSIENT_FIELDS = ("cancel_flag", "pause_flag", "speed", "eta")
 
 class DownloadManager:
+    JOURNAL_INTERVAL = 2.0  # seconds between progress snapshots
+    # Used when the settings don't say otherwise
+    MAX_CONCURRENT = 3
+    MAX_PER_HOST = 2
+    # Progress events go out at most this often (seconds), state changes right away
+    PROGRESS_INTERVAL = 0.1
+
     def __init__(self):
         self.has_aria2 = shutil.which("aria2c") is not None
         print(f"⬇️ Download Manager initialized. aria2c detected: {self.has_aria2}")
         self.downloads: Dict[str, DownloadItem] = {}
-        self.listeners: List[Callable] = []  # List of callback functions
+        self.listeners: List[Callable] = []  # Called with the set of changed ids (None = all)
+        self._dirty: Set[str] = set()  # ids with progress not yet sent to listeners
+        self._flush_timer: Optional[threading.Timer] = None
+        self._last_flush = 0.0
         self.lock = threading.Lock()
+        # Shares the scraper's pool, timeouts and retries
+        self.session = http_transport.session()
+        # aria2 enforces its share of the bandwidth limit itself
+        bandwidth_governor.add_listener(self._apply_aria2_limit)
+
+        # Unfinished downloads survive restarts through this journal
+        self.journal_file = Path.home() / ".ani-cli-gui" / "downloads.json"
+        self.journal_lock = threading.Lock()
+        self._last_journal = 0.0
+        self._active: Dict[str, Optional[SegmentedDownloader]] = {}  # running workers
+        self._callbacks: Dict[str, tuple] = {}  # id -> (on_complete, on_error)
+
+        # Waiting downloads: heap of (priority, sequence, id). FIFO within a priority;
+        # stale entries (paused, cancelled, re-prioritized) are skipped when popped.
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._load_journal()
 
     def add_listener(self, callback: Callable):
         """Add a listener for updates"""
@@ -46,8 +109,8 @@ class DownloadManager:
     def get_download_dir(self):
         """Get current download directory from settings"""
         download_dir = settings_manager.get("downloads", "location") or os.path.join(os.path.expanduser("~"), "ani-cli-downloads")
-        if not os.path.exists(download_dir):
-            os.makedirs(download_dir)
+        # Concurrent requests (batch + manual) may both get here first
+        os.makedirs(download_dir, exist_ok=True)
         return download_dir
 
     def get_all_downloads(self):
@@ -57,164 +120,541 @@ class DownloadManager:
 
     def cancel_download(self, download_id):
         with self.lock:
-            if download_id in self.downloads:
-                self.downloads[download_id].cancel_flag = True
-                self.downloads[download_id].status = "cancelled"
+            item = self.downloads.get(download_id)
+            if not item:
+                return
+            item.cancel_flag = True
+            item.status = "cancelled"
+            running = download_id in self._active
+        if not running:
+            # Nobody is writing to the partial file, drop it right away
+            self._remove_partial(item)
+            self._save_journal(force=True)
+        self._notify_update(download_id)
+
+    def pause_download(self, download_id):
+        """Stop transferring but keep the partial file, see resume_download"""
+        with self.lock:
+            item = self.downloads.get(download_id)
+            if not item or item.status not in ("pending", "downloading"):
+                return
+            item.pause_flag = True
+            item.status = "paused"
+        self._save_journal(force=True)
+        self._notify_update(download_id)
+
+    def resume_download(self, download_id):
+        """Continue a paused (or failed) download from where it stopped"""
+        with self.lock:
+            item = self.downloads.get(download_id)
+            if not item or item.status not in ("paused", "error") or download_id in self._active:
+                return
+            item.pause_flag = False
+            item.cancel_flag = False
+            item.error_msg = None
+            item.status = "pending"
+        self._enqueue(item)
+
+    def download_next(self, download_id):
+        """Move a waiting download to the front of the queue"""
+        with self.lock:
+            item = self.downloads.get(download_id)
+            if not item or item.status != "pending" or download_id in self._active:
+                return
+            item.priority = min([0] + [self.downloads[i].priority for _, _, i in self._queue if i in self.downloads]) - 1
+            heapq.heappush(self._queue, (item.priority, next(self._sequence), item.id))
+        self._save_journal(force=True)
+        self._schedule()
+        self._notify_update()
+
+    def reschedule(self):
+        """Apply changed limits (e.g. after saving settings)"""
+        self._schedule()
         self._notify_update()
 
-    def download_episode(self, url, anime_title, episode_no, on_progress=None, on_complete=None, on_error=None):
-        """Start a download and return the download ID"""
+    def download_episode(self, url, anime_title, episode_no, on_progress=None, on_complete=None, on_error=None,
+                         referer=None, hls=None, show_id=None, mode="sub", replace=False, sha256=None):
+        """
+        Start a download and return the download ID.
+
+        The same episode (show, episode, mode) is only downloaded once: while
+        it's queued or running its existing ID is returned, and a complete file
+        already on disk is kept unless `replace` is set.
+        """
+        filepath = self._episode_path(anime_title, episode_no, mode)
+        key = (show_id or anime_title, str(episode_no), mode)
+
         download_id = str(uuid.uuid4())
-        filename = f"{self._sanitize_filename(anime_title)} - Episode {episode_no}.mp4"
-        filepath = os.path.join(self.get_download_dir(), filename)
-        
         item = DownloadItem(
             id=download_id,
             title=anime_title,
             episode=str(episode_no),
             url=url,
-            path=filepath
+            path=filepath,
+            show_id=show_id or "",
+            mode=mode,
+            sha256=sha256
         )
+        if referer:
+            item.referer = referer
+        item.hls = bool(hls) or is_hls_url(url)
+
+        # Lookup and insert under one lock: a second call for the same episode
+        # (double-click, batch + manual) must find this item, not race past it
         with self.lock:
-            self.downloads[download_id] = item
-        self._notify_update()
-        
-        threading.Thread(
-            target=self._download_worker,
-            args=(download_id, url, filepath, on_progress, on_complete, on_error),
-            daemon=True
-        ).start()
-        
+            for existing in self.downloads.values():
+                if self._dedup_key(existing) == key and existing.status in ("pending", "downloading", "paused"):
+                    print(f"🔁 Episode {episode_no} is already queued")
+                    if on_complete or on_error:
+                        self._callbacks[existing.id] = (on_complete, on_error)
+                    return existing.id
+            existing_file = None if replace else self.find_existing(anime_title, episode_no, mode)
+            self.downloads[download_id] = item  # "pending" until _enqueue or completed below
+            self._callbacks[download_id] = (on_complete, on_error)
+        if existing_file:
+            print(f"⏭️ Already downloaded: {existing_file}")
+            item.path = existing_file
+            item.status = "completed"
+            item.progress = 1.0
+            self._notify_update(download_id)
+            if on_complete:
+                on_complete(existing_file)
+            return download_id
+        self._enqueue(item)
+
         return download_id
 
-    def _notify_update(self):
-        # Iterate over a copy to avoid modification during iteration errors (threading)
-        listeners_copy = []
+    def find_existing(self, anime_title, episode_no, mode="sub") -> Optional[str]:
+        """Path of a complete download of this episode on disk, if there is one"""
+        base = os.path.splitext(self._episode_path(anime_title, episode_no, mode))[0]
+        # HLS streams are saved as .ts when ffmpeg isn't around
+        for path in (base + ".mp4", base + ".ts"):
+            if os.path.isfile(path) and os.path.getsize(path) > 0:
+                return path
+        return None
+
+    def _episode_path(self, anime_title, episode_no, mode="sub") -> str:
+        suffix = "" if mode == "sub" else f" ({mode.capitalize()})"
+        filename = f"{self._sanitize_filename(anime_title)} - Episode {episode_no}{suffix}.mp4"
+        return os.path.join(self.get_download_dir(), filename)
+
+    @staticmethod
+    def _dedup_key(item: DownloadItem) -> tuple:
+        return (item.show_id or item.title, item.episode, item.mode)
+
+    def _enqueue(self, item: DownloadItem):
+        """Queue a download; it shows as pending until the scheduler starts it"""
+        with self.lock:
+            item.status = "pending"
+            heapq.heappush(self._queue, (item.priority, next(self._sequence), item.id))
+        self._save_journal(force=True)
+        self._schedule()
+        self._notify_update(item.id)
+
+    def limits(self):
+        max_total = settings_manager.get("downloads", "max_concurrent") or self.MAX_CONCURRENT
+        max_host = settings_manager.get("downloads", "max_per_host") or self.MAX_PER_HOST
+        return max(1, int(max_total)), max(1, int(max_host))
+
+    @staticmethod
+    def _host(item: DownloadItem) -> str:
+        return urlparse(item.url).hostname or ""
+
+    def _schedule(self):
+        """Start queued downloads while the global and per-host limits allow"""
+        max_total, max_host = self.limits()
+        to_start = []
+        with self.lock:
+            per_host: Dict[str, int] = {}
+            for download_id in self._active:
+                host = self._host(self.downloads[download_id])
+                per_host[host] = per_host.get(host, 0) + 1
+
+            held_back = []  # waiting on a busy host, but shouldn't block other hosts
+            while self._queue and len(self._active) < max_total:
+                entry = heapq.heappop(self._queue)
+                priority, _, download_id = entry
+                item = self.downloads.get(download_id)
+                if (not item or item.status != "pending" or download_id in self._active
+                        or priority != item.priority):
+                    continue  # stale entry
+                host = self._host(item)
+                if per_host.get(host, 0) >= max_host:
+                    held_back.append(entry)
+                    continue
+                per_host[host] = per_host.get(host, 0) + 1
+                self._active[download_id] = None
+                to_start.append(download_id)
+
+            for entry in held_back:
+                heapq.heappush(self._queue, entry)
+
+        for download_id in to_start:
+            threading.Thread(target=self._download_worker, args=(download_id,), daemon=True).start()
+
+    def _notify_update(self, download_id: Optional[str] = None):
+        """
+        State changes (queued, started, paused, finished...) reach listeners right
+        away, together with any progress still waiting. Listeners get the set of
+        changed ids, or None when anything may have changed.
+        """
         with self.lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            changed = None if download_id is None else self._dirty | {download_id}
+            self._dirty = set()
+            self._last_flush = time.monotonic()
             listeners_copy = list(self.listeners)
-            
-        for listener in listeners_copy:
+        self._dispatch(listeners_copy, changed)
+
+    def _notify_progress(self, download_id: str):
+        """Progress ticks are coalesced and flushed at most every PROGRESS_INTERVAL"""
+        with self.lock:
+            self._dirty.add(download_id)
+            if self._flush_timer is not None:
+                return
+            delay = max(0.0, self._last_flush + self.PROGRESS_INTERVAL - time.monotonic())
+            self._flush_timer = threading.Timer(delay, self._flush_progress)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_progress(self):
+        with self.lock:
+            self._flush_timer = None
+            changed, self._dirty = self._dirty, set()
+            self._last_flush = time.monotonic()
+            listeners_copy = list(self.listeners)
+        if changed:
+            self._dispatch(listeners_copy, changed)
+
+    def _dispatch(self, listeners: List[Callable], changed: Optional[Set[str]]):
+        for listener in listeners:
             try:
-                listener()
+                listener(changed)
             except Exception as e:
                 print(f"Error in download listener: {e}")
 
-    def _download_worker(self, download_id, url, filepath, on_progress, on_complete, on_error):
+    def _download_worker(self, download_id):
         item = self.downloads.get(download_id)
         if not item: 
             return
+        on_complete, on_error = self._callbacks.get(download_id, (None, None))
 
-        item.status = "downloading"
-        self._notify_update()
+        if not (item.cancel_flag or item.pause_flag):
+            item.status = "downloading"
+        self._notify_update(download_id)
 
         try:
-            if self.has_aria2:
-                self._download_aria2(item)
-            else:
-                self._download_requests(item)
-            
+            if not (item.cancel_flag or item.pause_flag):
+                if item.hls:
+                    # aria2c would only save the playlist text
+                    self._download_hls(item)
+                elif self.has_aria2 and aria2_daemon.start():
+                    self._download_aria2(item)
+                else:
+                    self._download_requests(item)
+
             if item.cancel_flag:
                 item.status = "cancelled"
                 # Cleanup partial file
-                if os.path.exists(filepath):
-                    os.remove(filepath)
+                self._remove_partial(item)
+            elif item.pause_flag:
+                item.status = "paused"
             else:
+                # Only a complete file ever shows up under the real name
+                self._verify(item)
+                os.replace(item.part_path, item.path)
                 item.status = "completed"
                 item.progress = 1.0
+                item.resume = None
                 if on_complete:
-                    on_complete(filepath)
+                    on_complete(item.path)
             
         except Exception as e:
             item.status = "error"
             item.error_msg = str(e)
             if on_error:
                 on_error(str(e))
+        finally:
+            with self.lock:
+                self._active.pop(download_id, None)
+            self._save_journal(force=True)
+            # A slot just freed up
+            self._schedule()
         
-        self._notify_update()
+        self._notify_update(download_id)
 
-    def _download_aria2(self, item: DownloadItem):
-        print(f"🚀 Starting aria2c download: {item.path}")
-        cmd = [
-            "aria2c", 
-            item.url, 
-            "--summary-interval=1",
-            "--referer=https://allmanga.to",
-            "--out",
-            os.path.basename(item.path),
-            "--dir",
-            os.path.dirname(item.path)
-        ]
-        
-        # We process stdout to check for cancel and parsing progress
-        import re
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1, universal_newlines=True)
-        
-        # Regex to parse aria2 output: [#oid 10MiB/100MiB(10%) CN:1 DL:1.2MiB ETA:1m]
-        progress_pattern = re.compile(r"\[.*?(\d+\.?\d*[KMG]?)i?B/(\d+\.?\d*[KMG]?)i?B\((\d+)%\).*?DL:(\d+\.?\d*[KMG]?)i?B.*?ETA:(.*?)\]")
-        
-        while process.poll() is None:
-            if item.cancel_flag:
-                process.terminate()
-                return
-            
-            # Read line without blocking indefinitely
-            output_line = process.stdout.readline()
-            
-            if output_line:
-                # print(f"ARIA2: {output_line.strip()}") # Debug
-                match = progress_pattern.search(output_line)
-                if match:
-                    # current_size = match.group(1) # Unused for now
-                    # total_size = match.group(2) # Unused for now
-                    percentage = int(match.group(3))
-                    speed = match.group(4)
-                    eta = match.group(5)
-                    
-                    item.progress = percentage / 100.0
-                    item.speed = f"{speed}iB/s"
-                    item.eta = eta
-                    self._notify_update()
-            else:
-                 time.sleep(0.1)
-            
-        if process.returncode != 0:
-            stderr = process.stderr.read()
-            # Check if it was just because of cancellation
-            if item.cancel_flag:
+    def _verify(self, item: DownloadItem):
+        """
+        Raises if the finished .part file is shorter than announced, truncated
+        or fails its checksum. A rejected file is deleted, so the next attempt
+        starts over instead of resuming (appending to) it.
+        """
+        try:
+            self._check_part(item)
+        except Exception:
+            self._remove_partial(item)
+            item.resume = None
+            raise
+
+    def _check_part(self, item: DownloadItem):
+        size = os.path.getsize(item.part_path)
+        if item.total_bytes and size != item.total_bytes:
+            raise Exception(f"Truncated download: {size} of {item.total_bytes} bytes")
+        problem = container_problem(item.part_path)
+        if problem:
+            raise Exception(f"Incomplete file: {problem}")
+        if item.sha256 or settings_manager.get("downloads", "verify_checksum"):
+            digest = sha256_file(item.part_path)
+            if item.sha256 and digest != item.sha256.lower():
+                raise Exception(f"Checksum mismatch: {digest[:12]}... expected {item.sha256[:12]}...")
+            item.sha256 = digest
+            print(f"🔒 SHA-256 {digest}")
+
+    def _remove_partial(self, item: DownloadItem):
+        gid = (item.resume or {}).get("aria2")
+        if gid:
+            # A paused aria2 download still holds the file
+            aria2_daemon.remove(gid)
+        for path in (item.part_path, item.part_path + ".aria2", item.stream_path):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                print(f"⚠️ Could not remove {path}: {e}")
+
+    def _load_journal(self):
+        """Restore unfinished downloads and pick up the ones that were running"""
+        try:
+            if not self.journal_file.exists():
                 return
-            raise Exception(f"Aria2c failed: {stderr}")
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Error loading download journal: {e}")
+            return
+
+        known = {f.name for f in fields(DownloadItem)}
+        to_resume = []
+        for entry in entries:
+            item = DownloadItem(**{k: v for k, v in entry.items() if k in known})
+            self.downloads[item.id] = item
+            if item.status in ("pending", "downloading"):
+                to_resume.append(item)
+        if entries:
+            print(f"📒 Restored {len(entries)} download(s) from journal, resuming {len(to_resume)}")
+        for item in to_resume:
+            self._enqueue(item)
+
+    def _save_journal(self, force=False):
+        """Write unfinished downloads to disk; progress-only saves are throttled"""
+        now = time.time()
+        if not force and now - self._last_journal < self.JOURNAL_INTERVAL:
+            return
+        self._last_journal = now
+
+        with self.lock:
+            for download_id, downloader in self._active.items():
+                if downloader is not None:
+                    self.downloads[download_id].resume = downloader.resume_state()
+            entries = []
+            for item in self.downloads.values():
+                if item.status in JOURNAL_STATUSES:
+                    entry = asdict(item)
+                    for key in TRANSIENT_FIELDS:
+                        entry.pop(key, None)
+                    entries.append(entry)
+
+        with self.journal_lock:
+            try:
+                atomic_write_json(self.journal_file, entries, indent=2)
+            except Exception as e:
+                print(f"⚠️ Error saving download journal: {e}")
+
+    def _download_aria2(self, item: DownloadItem):
+        gid = self._aria2_start(item)
+        item.resume = {"aria2": gid}
+        aria2_daemon.watch(gid)
+        self._apply_aria2_limit()
+        try:
+            while True:
+                if item.cancel_flag:
+                    aria2_daemon.remove(gid)
+                    item.resume = None
+                    return
+                if item.pause_flag:
+                    # Stays in aria2 (paused) so resuming is a single unpause
+                    try:
+                        aria2_daemon.pause(gid)
+                    except Aria2Error:
+                        pass
+                    return
+
+                # Notices player start/exit and schedule windows, see _apply_aria2_limit
+                bandwidth_governor.maybe_refresh()
+                status = aria2_daemon.wait_status(gid)
+                if not status:
+                    continue
+                state = status.get("status")
+                total = int(status.get("totalLength") or 0)
+                if total:
+                    item.total_bytes = total
+                if state == "complete":
+                    aria2_daemon.remove(gid)
+                    return
+                if state in ("error", "removed"):
+                    aria2_daemon.remove(gid)
+                    item.resume = None
+                    raise Exception(f"aria2c failed: {status.get('errorMessage') or state}")
+
+                done = int(status.get("completedLength") or 0)
+                speed_bps = int(status.get("downloadSpeed") or 0)
+                item.progress = done / total if total else 0.0
+                item.speed = f"{speed_bps/1024/1024:.2f} MB/s"
+                if total and speed_bps > 0:
+                    remaining = int((total - done) / speed_bps)
+                    item.eta = f"{remaining // 60}:{remaining % 60:02d}"
+                self._save_journal()
+                self._notify_progress(item.id)
+        finally:
+            aria2_daemon.unwatch(gid)
+            self._apply_aria2_limit()
+
+    def _aria2_start(self, item: DownloadItem) -> str:
+        """Unpauses the download aria2 still holds, or adds it (continuing the .part file)"""
+        gid = (item.resume or {}).get("aria2")
+        status = aria2_daemon.tell_status(gid) if gid else None
+        if status and status.get("status") in ("paused", "waiting", "active"):
+            if status.get("status") == "paused":
+                aria2_daemon.unpause(gid)
+            print(f"⏯️ Resuming aria2 download: {item.path}")
+            return gid
+        print(f"🚀 Starting aria2 download: {item.path}")
+        return aria2_daemon.add_uri(
+            item.url,
+            os.path.dirname(item.path),
+            os.path.basename(item.part_path),
+            headers={"Referer": item.referer}
+        )
+
+    def _apply_aria2_limit(self, limit: Optional[int] = None):
+        """
+        aria2 has its own limiter; give it the running aria2 downloads' share
+        of the global limit and leave the rest to the shared bucket.
+        """
+        with self.lock:
+            running = len(self._active)
+        aria2_running = min(len(aria2_daemon.watched), running)
+        share = bandwidth_governor.reserve(aria2_running / running if running else 0.0)
+        # Idle aria2 can't exceed anything, but 0 would mean unlimited to it
+        share = share or bandwidth_governor.limit
+        try:
+            aria2_daemon.change_global_limit(share)
+        except Exception as e:
+            print(f"⚠️ Could not update the aria2 limit: {e}")
 
     def _download_requests(self, item: DownloadItem):
         print(f"🐢 Starting requests download (fallback): {item.path}")
-        headers = {"Referer": "https://allmanga.to"}
-        
         start_time = time.time()
-        
-        with requests.get(item.url, stream=True, headers=headers) as r:
-            r.raise_for_status()
-            total_length = int(r.headers.get('content-length', 0))
-            
-            with open(item.path, 'wb') as f:
-                if total_length == 0:
-                    f.write(r.content)
-                else:
-                    dl = 0
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if item.cancel_flag:
-                            return
-                            
-                        if chunk:
-                            f.write(chunk)
-                            dl += len(chunk)
-                            
-                            # Calculate stats
-                            item.progress = dl / total_length
-                            elapsed = time.time() - start_time
-                            if elapsed > 0:
-                                speed_bps = dl / elapsed
-                                item.speed = f"{speed_bps/1024/1024:.2f} MB/s"
-                            
-                            self._notify_update()
+
+        def on_progress(downloaded, total, speed_bps):
+            item.progress = downloaded / total if total else 0.0
+            item.speed = f"{speed_bps/1024/1024:.2f} MB/s"
+            if total and speed_bps > 0:
+                remaining = int((total - downloaded) / speed_bps)
+                item.eta = f"{remaining // 60}:{remaining % 60:02d}"
+            self._save_journal()
+            self._notify_progress(item.id)
+
+        downloader = SegmentedDownloader(
+            self.session,
+            item.url,
+            item.part_path,
+            headers={"Referer": item.referer},
+            timeout=http_transport.download_timeout,
+            on_progress=on_progress,
+            should_cancel=lambda: item.cancel_flag or item.pause_flag,
+            resume=item.resume,
+            throttle=bandwidth_governor.throttle
+        )
+        with self.lock:
+            self._active[item.id] = downloader
+        try:
+            dl = downloader.run()
+        except DownloadCancelled:
+            return
+        finally:
+            item.resume = downloader.resume_state()
+        item.total_bytes = downloader.total
+
+        # Feed the quality selector with what this link actually sustained
+        throughput_estimator.record(dl, time.time() - start_time)
+
+    def _download_hls(self, item: DownloadItem):
+        print(f"🎞️ Starting HLS download: {item.path}")
+        start_time = time.time()
+        headers = {"Referer": item.referer}
+        should_cancel = lambda: item.cancel_flag or item.pause_flag
+
+        def on_progress(written, total, speed_bps):
+            item.progress = written / total if total else 0.0
+            item.speed = f"{speed_bps/1024/1024:.2f} MB/s"
+            if written and speed_bps > 0:
+                # Segments are roughly the same size, extrapolate from what we have
+                elapsed = time.time() - start_time
+                remaining = int(elapsed / max(item.progress - start_progress, 1e-6) * (1 - item.progress))
+                item.eta = f"{remaining // 60}:{remaining % 60:02d}"
+            self._save_journal()
+            self._notify_progress(item.id)
+
+        start_progress = item.progress if item.resume else 0.0
+        downloader = HlsDownloader(
+            self.session,
+            item.url,
+            item.stream_path,
+            headers=headers,
+            timeout=http_transport.download_timeout,
+            quality=settings_manager.get("playback", "quality") or "auto",
+            on_progress=on_progress,
+            should_cancel=should_cancel,
+            resume=item.resume,
+            throttle=bandwidth_governor.throttle
+        )
+        with self.lock:
+            self._active[item.id] = downloader
+        try:
+            playlist = downloader.load()
+            if playlist.encrypted:
+                # Needs the key handling ffmpeg already has
+                if not has_ffmpeg():
+                    raise Exception("Encrypted HLS stream, ffmpeg is required")
+                print("🔐 Encrypted HLS stream, handing it to ffmpeg")
+                ffmpeg_download(
+                    downloader.media_url, item.part_path, headers, playlist.duration,
+                    on_progress=lambda fraction: on_progress(int(fraction * 1000), 1000, 0.0),
+                    should_cancel=should_cancel
+                )
+                return
+            dl = downloader.run()
+        except DownloadCancelled:
+            return
+        finally:
+            item.resume = downloader.resume_state()
+
+        if has_ffmpeg():
+            item.speed = "Remuxing..."
+            self._notify_update(item.id)
+            remux(item.stream_path, item.part_path)
+            os.remove(item.stream_path)
+        else:
+            # No ffmpeg: keep the plain MPEG-TS, most players handle it fine
+            print("⚠️ ffmpeg not found, saving HLS stream as .ts")
+            stream_path = item.stream_path
+            item.path = os.path.splitext(item.path)[0] + ".ts"
+            os.replace(stream_path, item.part_path)
+
+        throughput_estimator.record(dl, time.time() - start_time)
 
     def _sanitize_filename(self, name):
         return "".join([c for c in name if c.isalpha() or c.isdigit() or c==' ']).rstrip()
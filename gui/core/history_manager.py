@@ -1,22 +1,138 @@
 import json
-import os
+import sqlite3
+import threading
+from bisect import bisect_left, insort
 from datetime import datetime
 from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.range_set import RangeSet
+
+# 1: tables, 2: shows.watched range set
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shows (
+    anime_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    thumbnail TEXT,
+    last_episode INTEGER NOT NULL DEFAULT 0,
+    last_watched TEXT,
+    watched TEXT NOT NULL DEFAULT ''  -- RangeSet.to_string() of the watched episodes
+);
+CREATE INDEX IF NOT EXISTS idx_shows_last_watched ON shows (last_watched);
+
+-- When single episodes were watched; range marks don't add rows
+CREATE TABLE IF NOT EXISTS episodes (
+    anime_id TEXT NOT NULL,
+    episode TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (anime_id, episode)
+);
+
+CREATE TABLE IF NOT EXISTS favorites (
+    anime_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    thumbnail TEXT,
+    added TEXT NOT NULL
+);
+"""
+
+class RecencyIndex:
+    """
+    Shows ordered by last_watched, kept sorted as they're updated, so the
+    most recent k are a slice instead of a sort of the whole library.
+    """
 
-class HistoryManager:
     def __init__(self):
+        self.keys: List[Tuple[str, str]] = []  # (last_watched or "", anime_id), ascending
+        self.shows: Dict[str, Dict] = {}       # anime_id -> continue-watching entry
+
+    def __len__(self) -> int:
+        return len(self.shows)
+
+    @staticmethod
+    def _key(show: Dict) -> Tuple[str, str]:
+        return (show["last_watched"] or "", show["id"])
+
+    def get(self, anime_id: str) -> Optional[Dict]:
+        return self.shows.get(anime_id)
+
+    def update(self, show: Dict):
+        previous = self.shows.get(show["id"])
+        if previous is not None:
+            index = bisect_left(self.keys, self._key(previous))
+            del self.keys[index]
+        self.shows[show["id"]] = show
+        insort(self.keys, self._key(show))
+
+    def top(self, limit: int) -> List[Dict]:
+        """The `limit` most recently watched shows, newest first"""
+        start = max(len(self.keys) - limit, 0)
+        return [self.shows[anime_id] for _, anime_id in reversed(self.keys[start:])]
+
+
+class HistoryManager:
+    """
+    Watch history and favorites in SQLite (WAL mode), so marking an episode
+    watched writes one row instead of the whole history file. The old JSON
+    files are imported once and then left alone.
+
+    Which episodes of a show are watched is a RangeSet (kept in memory once
+    loaded), timestamps of single plays live in their own table. Favorites
+    (an id -> entry dict) and the continue-watching order (RecencyIndex) are
+    mirrored in memory too, so the home screen never scans the library.
+    """
+
+    def __init__(self, data_dir=None):
         # Store history in user's home directory
-        self.history_dir = Path.home() / ".ani-cli-gui"
+        self.history_dir = Path(data_dir) if data_dir else Path.home() / ".ani-cli-gui"
+        self.db_file = self.history_dir / "history.db"
+        # Pre-SQLite storage, only read by the one-time import
         self.history_file = self.history_dir / "watch_history.json"
         self.favorites_file = self.history_dir / "favorites.json"
-        
+
         # Create directory if not exists
-        self.history_dir.mkdir(exist_ok=True)
-        
-        # Load existing data
-        self.history = self._load_json(self.history_file, {})
-        self.favorites = self._load_json(self.favorites_file, [])
-    
+        self.history_dir.mkdir(parents=True, exist_ok=True)
+
+        # Flet calls us from several threads; one connection, one writer at a time
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps the database consistent without a sync on every commit
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._watched: Dict[str, RangeSet] = {}  # anime_id -> watched episodes, loaded on demand
+        self._recent: Optional[RecencyIndex] = None  # loaded on first use
+        self.listeners: List[Callable] = []  # called with (anime_id, title, episode) after a watch
+        self._migrate()
+        self._favorites = self._load_favorites()  # anime_id -> entry, in the order they were added
+
+    def _migrate(self):
+        with self.lock:
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+            with self.conn:
+                if version == 1:
+                    self.conn.execute("ALTER TABLE shows ADD COLUMN watched TEXT NOT NULL DEFAULT ''")
+                self.conn.executescript(SCHEMA)
+            with self.conn:
+                if version == 0:
+                    self._import_json()
+                self._build_watched_ranges()
+                self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _build_watched_ranges(self):
+        """Fills shows.watched from the per-episode rows (after the JSON import or a v1 database)"""
+        watched: Dict[str, RangeSet] = {}
+        for anime_id, episode in self.conn.execute("SELECT anime_id, episode FROM episodes"):
+            watched.setdefault(anime_id, RangeSet()).add(episode)
+        self.conn.executemany(
+            "UPDATE shows SET watched = ? WHERE anime_id = ?",
+            [(ranges.to_string(), anime_id) for anime_id, ranges in watched.items()]
+        )
+
     def _load_json(self, filepath, default):
         """Load JSON file or return default"""
         try:
@@ -26,102 +142,243 @@ class HistoryManager:
         except Exception as e:
             print(f"Error loading {filepath}: {e}")
         return default
-    
-    def _save_json(self, filepath, data):
-        """Save data to JSON file"""
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error saving {filepath}: {e}")
-    
+
+    def _import_json(self):
+        """One-time import of watch_history.json / favorites.json (runs inside the migration transaction)"""
+        history = self._load_json(self.history_file, {})
+        favorites = self._load_json(self.favorites_file, [])
+        if not history and not favorites:
+            return
+
+        for anime_id, data in history.items():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO shows (anime_id, title, thumbnail, last_episode, last_watched) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (str(anime_id), data.get("title") or "", data.get("thumbnail"),
+                 data.get("last_episode") or 0, data.get("last_watched"))
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO episodes (anime_id, episode, timestamp) VALUES (?, ?, ?)",
+                [(str(anime_id), str(ep), (info or {}).get("timestamp") or data.get("last_watched") or "")
+                 for ep, info in (data.get("episodes") or {}).items()]
+            )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO favorites (anime_id, title, thumbnail, added) VALUES (?, ?, ?, ?)",
+            [(str(f["id"]), f.get("title") or "", f.get("thumbnail"), f.get("added") or datetime.now().isoformat())
+             for f in favorites if f.get("id") is not None]
+        )
+        print(f"📥 Imported {len(history)} show(s) and {len(favorites)} favorite(s) into {self.db_file.name}")
+
     def mark_episode_watched(self, anime_id, anime_title, episode_no, thumbnail=None):
         """Mark an episode as watched"""
         anime_id = str(anime_id)
         episode_no = str(episode_no)
-        
-        # Initialize anime entry if not exists
-        if anime_id not in self.history:
-            self.history[anime_id] = {
+        now = datetime.now().isoformat()
+
+        with self.lock, self.conn:
+            watched = self._load_watched(anime_id).copy()
+            watched.add(episode_no)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO episodes (anime_id, episode, timestamp) VALUES (?, ?, ?)",
+                (anime_id, episode_no, now)
+            )
+            self._save_show(anime_id, anime_title, thumbnail, int(episode_no), now, watched)
+        self._notify_watched(anime_id, anime_title, episode_no)
+
+    def add_listener(self, callback: Callable):
+        """`callback(anime_id, title, episode)` runs after episodes are marked watched (see hsts_sync)"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback: Callable):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _notify_watched(self, anime_id, anime_title, episode_no):
+        for listener in list(self.listeners):
+            try:
+                listener(anime_id, anime_title, episode_no)
+            except Exception as e:
+                print(f"Error in history listener: {e}")
+
+    def merge_external(self, entries: Iterable[Tuple[str, str, str, str]]) -> int:
+        """
+        Merges (anime_id, title, last episode, timestamp) entries from another
+        frontend in one transaction: episodes up to the last one count as
+        watched and a show only moves up in continue-watching if it got further
+        there. Listeners aren't notified. Returns the number of shows changed.
+        """
+        changed = 0
+        with self.lock, self.conn:
+            for anime_id, title, episode, timestamp in entries:
+                anime_id, episode = str(anime_id), str(episode)
+                row = self.conn.execute(
+                    "SELECT title, last_episode, last_watched FROM shows WHERE anime_id = ?", (anime_id,)
+                ).fetchone()
+                watched = self._load_watched(anime_id).copy()
+                if episode.isdigit():
+                    watched.add_range(1, int(episode))
+                else:
+                    watched.add(episode)
+                last_episode = int(episode) if episode.isdigit() else 0
+                if row is not None:
+                    if watched == self._load_watched(anime_id) and last_episode <= row["last_episode"]:
+                        continue
+                    if last_episode <= row["last_episode"]:
+                        # We're ahead here: keep our position and recency
+                        last_episode, timestamp = row["last_episode"], row["last_watched"]
+                    title = row["title"]
+                self._save_show(anime_id, title, None, last_episode, timestamp, watched)
+                changed += 1
+        return changed
+
+    def mark_range_watched(self, anime_id, anime_title, first, last, thumbnail=None):
+        """Mark episodes first..last watched in one write, e.g. when catching up on a show"""
+        anime_id = str(anime_id)
+        with self.lock, self.conn:
+            watched = self._load_watched(anime_id).copy()
+            watched.add_range(int(first), int(last))
+            self._save_show(anime_id, anime_title, thumbnail, int(last), datetime.now().isoformat(), watched)
+        self._notify_watched(anime_id, anime_title, str(int(last)))
+
+    def mark_episodes_watched(self, anime_id, anime_title, episodes: Iterable, thumbnail=None):
+        """Mark a batch of (not necessarily contiguous) episodes watched in one write"""
+        anime_id = str(anime_id)
+        episodes = [str(ep) for ep in episodes]
+        if not episodes:
+            return
+        with self.lock, self.conn:
+            watched = self._load_watched(anime_id).copy()
+            for episode in episodes:
+                watched.add(episode)
+            numbers = [int(ep) for ep in episodes if ep.isdigit()]
+            last_episode = max(numbers) if numbers else self._last_episode(anime_id)
+            self._save_show(anime_id, anime_title, thumbnail, last_episode, datetime.now().isoformat(), watched)
+        self._notify_watched(anime_id, anime_title, str(max(numbers)) if numbers else episodes[-1])
+
+    def get_show(self, anime_id) -> Optional[Dict]:
+        """History entry of a show (same fields as get_continue_watching), None if never watched"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT anime_id AS id, title, thumbnail, last_episode, last_watched FROM shows WHERE anime_id = ?",
+                (str(anime_id),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def _last_episode(self, anime_id) -> int:
+        row = self.conn.execute("SELECT last_episode FROM shows WHERE anime_id = ?", (anime_id,)).fetchone()
+        return row["last_episode"] if row else 0
+
+    def _save_show(self, anime_id, anime_title, thumbnail, last_episode, now, watched: RangeSet):
+        """Upserts the show row (caller holds the lock and the transaction)"""
+        # Update last watched info (and the title in case it changed)
+        self.conn.execute(
+            "INSERT INTO shows (anime_id, title, thumbnail, last_episode, last_watched, watched) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (anime_id) DO UPDATE SET title = excluded.title, "
+            "thumbnail = COALESCE(excluded.thumbnail, shows.thumbnail), "
+            "last_episode = excluded.last_episode, last_watched = excluded.last_watched, "
+            "watched = excluded.watched",
+            (anime_id, anime_title, thumbnail, last_episode, now, watched.to_string())
+        )
+        # Only swapped in once the statement went through
+        self._watched[anime_id] = watched
+        if self._recent is not None:
+            previous = self._recent.get(anime_id)
+            self._recent.update({
+                "id": anime_id,
                 "title": anime_title,
-                "thumbnail": thumbnail,
-                "episodes": {},
-                "last_episode": 0,
-                "last_watched": None
-            }
-        
-        # Mark episode as watched
-        self.history[anime_id]["episodes"][episode_no] = {
-            "watched": True,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Update last watched info
-        self.history[anime_id]["last_episode"] = int(episode_no)
-        self.history[anime_id]["last_watched"] = datetime.now().isoformat()
-        self.history[anime_id]["title"] = anime_title  # Update title in case it changed
-        if thumbnail:
-            self.history[anime_id]["thumbnail"] = thumbnail
-        
-        self._save_json(self.history_file, self.history)
-    
+                "thumbnail": thumbnail or (previous["thumbnail"] if previous else None),
+                "last_episode": last_episode,
+                "last_watched": now
+            })
+
+    def _load_watched(self, anime_id: str) -> RangeSet:
+        """Cached watched set of a show (caller holds the lock)"""
+        watched = self._watched.get(anime_id)
+        if watched is None:
+            row = self.conn.execute("SELECT watched FROM shows WHERE anime_id = ?", (anime_id,)).fetchone()
+            watched = RangeSet.from_string(row["watched"] if row else "")
+            self._watched[anime_id] = watched
+        return watched
+
+    def get_watched_set(self, anime_id) -> RangeSet:
+        """All watched episodes of a show; `str(ep) in result` is a cheap check"""
+        with self.lock:
+            return self._load_watched(str(anime_id)).copy()
+
     def is_episode_watched(self, anime_id, episode_no):
         """Check if episode is watched"""
-        anime_id = str(anime_id)
-        episode_no = str(episode_no)
-        
-        if anime_id in self.history:
-            return episode_no in self.history[anime_id]["episodes"]
-        return False
-    
+        with self.lock:
+            return str(episode_no) in self._load_watched(str(anime_id))
+
+    def _load_recent(self) -> RecencyIndex:
+        """Continue-watching index, built from the shows table once (caller holds the lock)"""
+        if self._recent is None:
+            recent = RecencyIndex()
+            rows = self.conn.execute(
+                "SELECT anime_id, title, thumbnail, last_episode, last_watched FROM shows ORDER BY last_watched"
+            )
+            for row in rows:
+                show = {
+                    "id": row["anime_id"],
+                    "title": row["title"],
+                    "thumbnail": row["thumbnail"],
+                    "last_episode": row["last_episode"],
+                    "last_watched": row["last_watched"]
+                }
+                recent.shows[show["id"]] = show
+                recent.keys.append(RecencyIndex._key(show))
+            # Rows come (nearly) sorted already, so this is a linear pass
+            recent.keys.sort()
+            self._recent = recent
+        return self._recent
+
     def get_continue_watching(self, limit=10):
         """Get list of anime to continue watching (sorted by last watched)"""
-        continue_list = []
-        
-        for anime_id, data in self.history.items():
-            continue_list.append({
-                "id": anime_id,
-                "title": data["title"],
-                "thumbnail": data.get("thumbnail"),
-                "last_episode": data["last_episode"],
-                "last_watched": data["last_watched"]
-            })
-        
-        # Sort by last watched (most recent first)
-        continue_list.sort(key=lambda x: x["last_watched"] or "", reverse=True)
-        
-        return continue_list[:limit]
-    
+        with self.lock:
+            return [dict(show) for show in self._load_recent().top(limit)]
+
+    def _load_favorites(self) -> Dict[str, Dict]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT anime_id, title, thumbnail, added FROM favorites ORDER BY rowid"
+            ).fetchall()
+        return {row["anime_id"]: {"id": row["anime_id"], "title": row["title"],
+                                  "thumbnail": row["thumbnail"], "added": row["added"]}
+                for row in rows}
+
     def add_favorite(self, anime_id, anime_title, thumbnail=None):
         """Add anime to favorites"""
         anime_id = str(anime_id)
-        
-        # Check if already in favorites
-        if not any(f["id"] == anime_id for f in self.favorites):
-            self.favorites.append({
-                "id": anime_id,
-                "title": anime_title,
-                "thumbnail": thumbnail,
-                "added": datetime.now().isoformat()
-            })
-            self._save_json(self.favorites_file, self.favorites)
-            return True
-        return False
-    
+        with self.lock:
+            if anime_id in self._favorites:
+                return False
+            entry = {"id": anime_id, "title": anime_title, "thumbnail": thumbnail, "added": datetime.now().isoformat()}
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO favorites (anime_id, title, thumbnail, added) VALUES (?, ?, ?, ?)",
+                    (anime_id, anime_title, thumbnail, entry["added"])
+                )
+            self._favorites[anime_id] = entry
+        return True
+
     def remove_favorite(self, anime_id):
         """Remove anime from favorites"""
         anime_id = str(anime_id)
-        self.favorites = [f for f in self.favorites if f["id"] != anime_id]
-        self._save_json(self.favorites_file, self.favorites)
-    
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM favorites WHERE anime_id = ?", (anime_id,))
+            self._favorites.pop(anime_id, None)
+
     def is_favorite(self, anime_id):
         """Check if anime is in favorites"""
-        anime_id = str(anime_id)
-        return any(f["id"] == anime_id for f in self.favorites)
-    
+        return str(anime_id) in self._favorites
+
     def get_favorites(self):
         """Get all favorites"""
-        return self.favorites
+        with self.lock:
+            return [dict(entry) for entry in self._favorites.values()]
 
 # Global instance
 history_manager = HistoryManager()
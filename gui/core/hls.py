@@ -0,0 +1,224 @@
+"""
+HLS helpers: master and media playlist parsing, quality selection and a
+rolling throughput estimate used to pick a variant the connection can sustain.
+Mirrors what `get_links`/`select_quality` do with master.m3u8 in ani-cli.
+"""
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+from urllib.parse import urljoin
+
+QUALITY_OPTIONS = ["auto", "best", "1080", "720", "480", "360", "worst"]
+
+# Leave some headroom so a variant doesn't eat the whole measured bandwidth
+BANDWIDTH_HEADROOM = 0.8
+
+# "auto" before anything was measured (only downloads are timed; playlists are
+# too small and the player fetches the segments): start no higher than this
+AUTO_DEFAULT_HEIGHT = 720
+AUTO_DEFAULT_BANDWIDTH = 3_000_000  # bits/s, for variants without a resolution
+
+@dataclass
+class HlsVariant:
+    url: str
+    bandwidth: int = 0            # bits per second, from BANDWIDTH=
+    resolution: Optional[str] = None  # "1920x1080"
+    codecs: Optional[str] = None
+
+    @property
+    def height(self) -> Optional[int]:
+        if self.resolution and "x" in self.resolution:
+            try:
+                return int(self.resolution.split("x")[1])
+            except ValueError:
+                return None
+        return None
+
+
+@dataclass
+class HlsSegment:
+    url: str
+    duration: float = 0.0
+    byterange: Optional[Tuple[int, int]] = None  # (length, offset) from EXT-X-BYTERANGE
+
+
+@dataclass
+class MediaPlaylist:
+    segments: List[HlsSegment]
+    init_segment: Optional[HlsSegment] = None  # EXT-X-MAP, for fMP4 streams
+    encrypted: bool = False                    # any EXT-X-KEY other than METHOD=NONE
+
+    @property
+    def duration(self) -> float:
+        return sum(segment.duration for segment in self.segments)
+
+
+_ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def parse_attributes(line: str) -> dict:
+    """Parses the `KEY=value,KEY="quoted"` list after an #EXT tag."""
+    attributes = {}
+    _, _, attribute_list = line.partition(":")
+    for key, value in _ATTRIBUTE_RE.findall(attribute_list):
+        attributes[key] = value.strip('"')
+    return attributes
+
+
+def is_master_playlist(text: str) -> bool:
+    return "#EXTM3U" in text and "#EXT-X-STREAM-INF" in text
+
+
+def parse_master_playlist(text: str, base_url: str) -> List[HlsVariant]:
+    """Returns the variants of a master playlist, best (highest bandwidth) first."""
+    variants = []
+    pending = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#EXT-X-STREAM-INF"):
+            pending = parse_attributes(line)
+        elif line.startswith("#"):
+            continue
+        elif pending is not None:
+            try:
+                bandwidth = int(pending.get("BANDWIDTH") or pending.get("AVERAGE-BANDWIDTH") or 0)
+            except ValueError:
+                bandwidth = 0
+            variants.append(HlsVariant(
+                url=urljoin(base_url, line),
+                bandwidth=bandwidth,
+                resolution=pending.get("RESOLUTION"),
+                codecs=pending.get("CODECS")
+            ))
+            pending = None
+
+    variants.sort(key=lambda v: (v.height or 0, v.bandwidth), reverse=True)
+    return variants
+
+
+def _parse_byterange(value: str, next_offset: int) -> Tuple[int, int]:
+    length, _, offset = value.partition("@")
+    return int(length), int(offset) if offset else next_offset
+
+
+def parse_media_playlist(text: str, base_url: str) -> MediaPlaylist:
+    """Segments of a media (variant) playlist, in playback order."""
+    playlist = MediaPlaylist(segments=[])
+    duration = 0.0
+    byterange = None
+    next_offset = 0  # a BYTERANGE without @offset continues the previous range
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#EXTINF:"):
+            try:
+                duration = float(line[8:].split(",", 1)[0])
+            except ValueError:
+                duration = 0.0
+        elif line.startswith("#EXT-X-BYTERANGE:"):
+            byterange = _parse_byterange(line[17:], next_offset)
+            next_offset = byterange[0] + byterange[1]
+        elif line.startswith("#EXT-X-KEY"):
+            if parse_attributes(line).get("METHOD", "NONE").upper() != "NONE":
+                playlist.encrypted = True
+        elif line.startswith("#EXT-X-MAP"):
+            attributes = parse_attributes(line)
+            if attributes.get("URI"):
+                map_range = None
+                if attributes.get("BYTERANGE"):
+                    map_range = _parse_byterange(attributes["BYTERANGE"], 0)
+                playlist.init_segment = HlsSegment(url=urljoin(base_url, attributes["URI"]), byterange=map_range)
+        elif line.startswith("#"):
+            continue
+        else:
+            playlist.segments.append(HlsSegment(url=urljoin(base_url, line), duration=duration, byterange=byterange))
+            duration = 0.0
+            byterange = None
+
+    return playlist
+
+
+def select_variant(variants: Sequence, quality: str = "auto", throughput: Optional[float] = None):
+    """
+    Picks one of `variants` (anything with `height`, optionally `bandwidth`),
+    which must be sorted best first.
+
+    quality: "best", "worst", a height like "720", or "auto" which is "best"
+    capped by `throughput` (bytes/s) when we have a measurement. Without one,
+    "auto" on a master playlist starts at AUTO_DEFAULT_HEIGHT at most.
+    """
+    if not variants:
+        return None
+    quality = str(quality or "auto").lower().rstrip("p")
+
+    if quality == "worst":
+        return variants[-1]
+
+    if quality.isdigit():
+        wanted = int(quality)
+        for variant in variants:
+            if variant.height == wanted:
+                return variant
+        print(f"Specified quality {quality}p not found, defaulting to best")
+        return variants[0]
+
+    # Plain mp4 links don't say what they cost, "auto" is "best" for those
+    if quality == "auto" and any(getattr(v, "bandwidth", 0) for v in variants):
+        if throughput:
+            budget = throughput * 8 * BANDWIDTH_HEADROOM
+            fits = lambda v: v.bandwidth and v.bandwidth <= budget
+        else:
+            fits = lambda v: (v.height <= AUTO_DEFAULT_HEIGHT if v.height
+                              else v.bandwidth and v.bandwidth <= AUTO_DEFAULT_BANDWIDTH)
+        for variant in variants:
+            if fits(variant):
+                return variant
+        # Even the smallest doesn't fit, it's still the best bet
+        return variants[-1]
+
+    return variants[0]
+
+
+class ThroughputEstimator:
+    """
+    Exponentially weighted average of observed download throughput (bytes/s).
+    Small transfers are ignored, they measure latency rather than bandwidth.
+    """
+    MIN_SAMPLE_BYTES = 256 * 1024
+    # Measurements older than this don't say much about the link anymore
+    MAX_AGE = 15 * 60
+    ALPHA = 0.3
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value: Optional[float] = None
+        self.updated = 0.0
+
+    def record(self, num_bytes: int, seconds: float):
+        if num_bytes < self.MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+        sample = num_bytes / seconds
+        with self.lock:
+            if self.value is None or self._expired():
+                self.value = sample
+            else:
+                self.value = self.ALPHA * sample + (1 - self.ALPHA) * self.value
+            self.updated = time.monotonic()
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self.updated > self.MAX_AGE
+
+    def estimate(self) -> Optional[float]:
+        with self.lock:
+            if self.value is None or self._expired():
+                return None
+            return self.value
+
+# Global instance, fed by the download manager
+throughput_estimator = ThroughputEstimator()
@@ -0,0 +1,247 @@
+"""
+Native HLS downloader, what `yt-dlp -N 16` / `ffmpeg -c copy` do in ani-cli.
+
+The master playlist (if any) is resolved to one variant, its media playlist
+is parsed and the segments are fetched on a bounded pool, a few segments
+ahead of a writer that appends them to disk strictly in order. The result is
+then stream-copied into an .mp4 with ffmpeg. Encrypted streams are left to
+ffmpeg entirely.
+"""
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from .hls import (HlsSegment, MediaPlaylist, is_master_playlist, parse_master_playlist,
+                  parse_media_playlist, select_variant, throughput_estimator)
+from .segmented_download import DownloadCancelled
+
+
+def has_ffmpeg() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def is_hls_url(url: str) -> bool:
+    return ".m3u8" in url.split("?", 1)[0].lower()
+
+
+class HlsDownloader:
+    WORKERS = 8
+    # Segments in flight ahead of the writer per worker, bounds memory use
+    WINDOW_PER_WORKER = 2
+    SEGMENT_RETRIES = 3
+    CHUNK_SIZE = 64 * 1024
+    # How often the writer wakes up to check for cancellation (seconds)
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, session: requests.Session, url: str, path: str,
+                 headers: Optional[Dict[str, str]] = None, timeout=None,
+                 quality: str = "auto", workers: int = WORKERS,
+                 on_progress: Optional[Callable[[int, int, float], None]] = None,
+                 should_cancel: Optional[Callable[[], bool]] = None,
+                 resume: Optional[Dict] = None,
+                 throttle: Optional[Callable[[int], None]] = None):
+        self.session = session
+        self.url = url
+        self.path = path
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.quality = quality
+        self.workers = max(1, workers)
+        self.on_progress = on_progress
+        self.should_cancel = should_cancel or (lambda: False)
+        self.resume = resume if resume and resume.get("hls") else {}
+        self.throttle = throttle or (lambda num_bytes: None)
+
+        self.media_url: Optional[str] = None
+        self.playlist: Optional[MediaPlaylist] = None
+        self.written = 0   # parts (init segment + segments) on disk, in order
+        self.offset = 0    # bytes on disk
+        self.fetched = 0   # bytes transferred by this run
+        self.started = 0.0
+        self.lock = threading.Lock()
+        # Set when run() leaves (done, failed or cancelled): fetches still going stop too
+        self.stop = threading.Event()
+
+    # --- playlists ---
+
+    def _get_text(self, url: str):
+        response = self.session.get(url, headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text, response.url or url
+
+    def load(self) -> MediaPlaylist:
+        """Resolves the variant to download (the same one again when resuming) and parses it."""
+        url = self.resume.get("media_url") or self.url
+        text, url = self._get_text(url)
+        if is_master_playlist(text):
+            variant = select_variant(parse_master_playlist(text, url), self.quality, throughput_estimator.estimate())
+            print(f"📺 HLS variant: {variant.resolution or 'unknown'} @ {variant.bandwidth // 1000} kbps")
+            text, url = self._get_text(variant.url)
+        if "#EXTM3U" not in text:
+            raise Exception("Not an HLS playlist")
+
+        self.media_url = url
+        self.playlist = parse_media_playlist(text, url)
+        if not self.playlist.segments:
+            raise Exception("HLS playlist has no segments")
+        return self.playlist
+
+    def _parts(self) -> List[HlsSegment]:
+        init = [self.playlist.init_segment] if self.playlist.init_segment else []
+        return init + self.playlist.segments
+
+    def resume_state(self) -> Dict:
+        with self.lock:
+            return {
+                "hls": True,
+                "media_url": self.media_url,
+                "parts": len(self._parts()) if self.playlist else 0,
+                "written": self.written,
+                "offset": self.offset,
+            }
+
+    # --- download ---
+
+    def run(self) -> int:
+        """Downloads every segment into `path`, in order. Returns bytes transferred by this run."""
+        self.started = time.monotonic()
+        self.stop.clear()
+        if self.playlist is None:
+            self.load()
+        parts = self._parts()
+        total = len(parts)
+
+        start = 0
+        if (self.resume.get("media_url") == self.media_url and self.resume.get("parts") == total
+                and os.path.exists(self.path) and os.path.getsize(self.path) >= self.resume.get("offset", 0)):
+            start, self.offset = self.resume.get("written", 0), self.resume.get("offset", 0)
+        if start:
+            print(f"⏯️ Resuming HLS at segment {start}/{total}")
+        self.written = start
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hls")
+        window = self.workers * self.WINDOW_PER_WORKER
+        pending = {}
+        next_index = start
+        try:
+            with open(self.path, "r+b" if start else "wb") as f:
+                f.seek(self.offset)
+                f.truncate()
+                for index in range(start, total):
+                    # Keep the pool busy, but never run too far ahead of the writer
+                    while next_index < total and next_index - index < window:
+                        pending[next_index] = executor.submit(self._fetch, parts[next_index])
+                        next_index += 1
+
+                    data = self._wait(pending.pop(index))
+                    f.write(data)
+                    with self.lock:
+                        self.written = index + 1
+                        self.offset += len(data)
+                    self._report(total)
+        finally:
+            self.stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return self.fetched
+
+    def _wait(self, future) -> bytes:
+        while True:
+            if self.should_cancel():
+                raise DownloadCancelled()
+            try:
+                return future.result(timeout=self.POLL_INTERVAL)
+            except FutureTimeout:
+                continue
+
+    def _fetch(self, segment: HlsSegment) -> bytes:
+        headers = dict(self.headers)
+        if segment.byterange:
+            length, offset = segment.byterange
+            headers["Range"] = f"bytes={offset}-{offset + length - 1}"
+
+        for attempt in range(self.SEGMENT_RETRIES):
+            if self._stopped():
+                raise DownloadCancelled()
+            try:
+                chunks = []
+                with self.session.get(segment.url, headers=headers, timeout=self.timeout, stream=True) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                        if self._stopped():
+                            raise DownloadCancelled()
+                        chunks.append(chunk)
+                        self.throttle(len(chunk))
+                data = b"".join(chunks)
+                with self.lock:
+                    self.fetched += len(data)
+                return data
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                if attempt + 1 >= self.SEGMENT_RETRIES:
+                    raise Exception(f"Segment failed: {e}")
+                print(f"⚠️ HLS segment failed ({e}), retrying")
+                self.stop.wait(0.5 * (attempt + 1))
+
+    def _stopped(self) -> bool:
+        return self.stop.is_set() or self.should_cancel()
+
+    def _report(self, total: int):
+        if self.on_progress:
+            elapsed = time.monotonic() - self.started
+            self.on_progress(self.written, total, self.fetched / elapsed if elapsed > 0 else 0.0)
+
+
+def remux(source: str, target: str):
+    """Stream-copies an MPEG-TS/fMP4 file into an .mp4 container (no re-encode)."""
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", source,
+        "-c", "copy",
+        "-movflags", "+faststart",
+        "-f", "mp4", target
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg remux failed: {result.stderr.strip()[-300:]}")
+
+
+def ffmpeg_download(url: str, target: str, headers: Optional[Dict[str, str]] = None,
+                    duration: float = 0.0,
+                    on_progress: Optional[Callable[[float], None]] = None,
+                    should_cancel: Optional[Callable[[], bool]] = None):
+    """
+    Lets ffmpeg fetch and copy the whole stream (used for encrypted playlists).
+    `on_progress` gets a 0..1 fraction when the duration is known.
+    """
+    header_lines = "".join(f"{key}: {value}\r\n" for key, value in (headers or {}).items())
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-nostats", "-progress", "pipe:1"]
+    if header_lines:
+        cmd += ["-headers", header_lines]
+    cmd += ["-i", url, "-c", "copy", "-f", "mp4", target]
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
+    try:
+        for line in process.stdout:
+            if should_cancel and should_cancel():
+                process.terminate()
+                process.wait()
+                raise DownloadCancelled()
+            if line.startswith("out_time_us=") and duration and on_progress:
+                try:
+                    on_progress(min(int(line.split("=", 1)[1]) / 1e6 / duration, 1.0))
+                except ValueError:
+                    pass
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg failed: {process.stderr.read().strip()[-300:]}")
@@ -0,0 +1,233 @@
+"""
+Two-way sync with the shell client's history file (`ani-hsts`).
+
+ani-cli keeps one line per show: "<last episode>\t<id>\t<title>", in
+$ANI_CLI_HIST_DIR, else $XDG_STATE_HOME/ani-cli (~/.local/state/ani-cli).
+Whenever the file changes it is merged into the GUI's history in a single
+transaction; afterwards the next available episode of every show is looked
+up on a bounded pool (what `process_hist_entry` does one process per line)
+for Continue Watching. Episodes marked watched in the GUI are written back
+the way `update_history` does.
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from core.history_manager import history_manager
+from core.persistence import atomic_write
+from core.scraper import scraper
+from core.settings_manager import settings_manager
+
+# ani-cli titles carry the episode count, e.g. "Frieren (28 episodes)"
+_EPISODE_COUNT_RE = re.compile(r"\s*\(\d+ episodes\)\s*$")
+
+
+def hsts_path() -> Path:
+    state_dir = os.environ.get("XDG_STATE_HOME") or os.path.join(Path.home(), ".local", "state")
+    hist_dir = os.environ.get("ANI_CLI_HIST_DIR") or os.path.join(state_dir, "ani-cli")
+    return Path(hist_dir) / "ani-hsts"
+
+
+@dataclass
+class HstsEntry:
+    episode: str
+    id: str
+    title: str
+
+    @property
+    def show_title(self) -> str:
+        return _EPISODE_COUNT_RE.sub("", self.title).strip() or self.title
+
+
+def parse_hsts(text: str) -> List[HstsEntry]:
+    entries = []
+    for line in text.splitlines():
+        parts = line.split("\t", 2)
+        if len(parts) == 3 and parts[0] and parts[1]:
+            entries.append(HstsEntry(parts[0].strip(), parts[1].strip(), parts[2].strip()))
+    return entries
+
+
+def format_hsts(entries: List[HstsEntry]) -> str:
+    return "".join(f"{entry.episode}\t{entry.id}\t{entry.title}\n" for entry in entries)
+
+
+class HstsSync:
+    # Concurrent episode-list lookups while importing
+    WORKERS = 8
+    # How often the file is checked for changes made by ani-cli (seconds)
+    POLL_INTERVAL = 30
+
+    def __init__(self, history=None, scraper_=None, path: Optional[Path] = None):
+        self.history = history or history_manager
+        self.scraper = scraper_ or scraper
+        self.path = path or hsts_path()
+        self.lock = threading.Lock()  # the file and _mtime
+        self._mtime: Optional[float] = None  # of the version we last merged or wrote
+        # next_episodes and _played, never held during I/O
+        self.state_lock = threading.Lock()
+        self.next_episodes: Dict[str, str] = {}  # show id -> next available episode
+        self._played: Optional[Set[str]] = None  # shows played while a lookup runs
+        self.listeners: List[Callable[[], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        # Plays are written back in order, off the (UI) thread that marked them
+        self._exporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hsts-export")
+        self._last_export: Optional[Future] = None
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings_manager.get("history", "sync_ani_cli") is not False
+
+    def start(self):
+        """Merge now and keep following the file; played episodes are written back"""
+        if not self.enabled() or self._thread is not None:
+            return
+        self.history.add_listener(self.on_watched)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="hsts-sync")
+        self._thread.start()
+
+    def add_listener(self, callback: Callable[[], None]):
+        """`callback()` runs after an import changed the history or new episodes were found"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"⚠️ ani-cli history sync failed: {e}")
+            time.sleep(self.POLL_INTERVAL)
+
+    def _read(self) -> List[HstsEntry]:
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            return parse_hsts(f.read())
+
+    # --- import ---
+
+    def sync(self, force: bool = False) -> int:
+        """Imports the file if it changed since we last saw it; returns the number of shows updated"""
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return 0  # ani-cli isn't used here
+        with self.lock:
+            if not force and mtime == self._mtime:
+                return 0
+            entries = self._read()
+            self._mtime = mtime
+        if not entries:
+            return 0
+
+        # The history is usable right away; episode lookups (network) come after
+        timestamp = datetime.fromtimestamp(mtime).isoformat()
+        changed = self.history.merge_external(
+            (entry.id, entry.show_title, entry.episode, timestamp) for entry in entries
+        )
+        print(f"🔄 ani-cli history: {len(entries)} show(s), {changed} updated")
+        if changed:
+            self._notify()
+
+        with self.state_lock:
+            self._played = set()
+        try:
+            next_episodes = self._resolve_next(entries)
+        finally:
+            with self.state_lock:
+                # Whatever was played during the lookup isn't new anymore
+                for anime_id in self._played:
+                    next_episodes.pop(anime_id, None)
+                self._played = None
+                found = next_episodes != self.next_episodes
+                self.next_episodes = next_episodes
+        if found:
+            print(f"🆕 {len(next_episodes)} show(s) from ani-cli have new episodes")
+            self._notify()
+        return changed
+
+    def _notify(self):
+        for listener in list(self.listeners):
+            try:
+                listener()
+            except Exception as e:
+                print(f"Error in hsts listener: {e}")
+
+    def _resolve_next(self, entries: List[HstsEntry]) -> Dict[str, str]:
+        """Episode after the current position of every show, looked up concurrently"""
+        mode = settings_manager.get("playback", "default_mode") or "sub"
+        with ThreadPoolExecutor(max_workers=min(self.WORKERS, len(entries)), thread_name_prefix="hsts") as pool:
+            results = pool.map(lambda entry: (entry.id, self._next_episode(entry, mode)), entries)
+            return {show_id: episode for show_id, episode in results if episode}
+
+    def _next_episode(self, entry: HstsEntry, mode: str) -> Optional[str]:
+        # The GUI may be further along than the file
+        show = self.history.get_show(entry.id)
+        current = str(show["last_episode"]) if show and show["last_episode"] else entry.episode
+        try:
+            episodes = self.scraper.get_episodes_list(entry.id, mode)
+        except Exception as e:
+            print(f"⚠️ Episode lookup failed for {entry.show_title}: {e}")
+            return None
+        try:
+            index = episodes.index(current)
+        except ValueError:
+            return None
+        return episodes[index + 1] if index + 1 < len(episodes) else None
+
+    # --- export ---
+
+    def on_watched(self, anime_id, title, episode):
+        """History listener: forgets the show's "new episode" and queues the write-back"""
+        self._forget_next(str(anime_id))
+        self._last_export = self._exporter.submit(self._export_safely, anime_id, title, episode)
+
+    def wait_exports(self, timeout: Optional[float] = None):
+        """Blocks until the queued write-backs are on disk"""
+        if self._last_export is not None:
+            self._last_export.result(timeout)
+
+    def _forget_next(self, anime_id: str):
+        with self.state_lock:
+            self.next_episodes.pop(anime_id, None)
+            if self._played is not None:
+                self._played.add(anime_id)
+
+    def _export_safely(self, anime_id, title, episode):
+        try:
+            self.export_episode(anime_id, title, episode)
+        except Exception as e:
+            print(f"⚠️ Could not update ani-cli history: {e}")
+
+    def export_episode(self, anime_id, title, episode):
+        """Records a GUI play in ani-hsts, like ani-cli's update_history"""
+        anime_id, episode = str(anime_id), str(episode)
+        with self.lock:
+            try:
+                up_to_date = self.path.stat().st_mtime == self._mtime
+            except OSError:
+                return  # don't create ani-cli state for people who don't use it
+            entries = self._read()
+            for entry in entries:
+                if entry.id == anime_id:
+                    entry.episode = episode  # keep ani-cli's title (with its episode count)
+                    break
+            else:
+                entries.append(HstsEntry(episode, anime_id, title))
+            atomic_write(self.path, format_hsts(entries))
+            if up_to_date:
+                # Our own write isn't news to import (unless ani-cli's changes are still waiting)
+                self._mtime = self.path.stat().st_mtime
+        self._forget_next(anime_id)
+
+# Global instance
+hsts_sync = HstsSync()
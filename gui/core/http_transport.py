@@ -0,0 +1,127 @@
+"""
+Shared HTTP transport for the scraper and the download manager.
+
+Every session handed out here mounts the same connection pool, has connect
+and read timeouts by default (so a stuck provider costs seconds instead of a
+thread) and retries idempotent requests with jittered exponential backoff.
+API sessions (the scraper) don't retry timed-out reads and only retry a
+connect once, so a hung provider fails within one timeout and the next one
+gets tried; downloads keep the full retries. Defaults live in the "network"
+section of the settings.
+"""
+import random
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .settings_manager import settings_manager
+
+# Statuses worth another try: rate limiting and flaky upstreams
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class JitteredRetry(Retry):
+    """urllib3 Retry with "full jitter" backoff, so parallel retries don't line up."""
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout when the caller gives none."""
+
+    def __init__(self, timeout: Tuple[float, float], *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class HttpTransport:
+    # Number of per-host pools kept around; "pool_size" is connections per host
+    POOL_HOSTS = 20
+    DEFAULTS = {
+        "connect_timeout": 5.0,
+        "read_timeout": 15.0,
+        # Downloads can legitimately stall for a bit between chunks
+        "download_read_timeout": 30.0,
+        "pool_size": 10,
+        "retries": 3,
+        # Scraper calls: a read that timed out once will most likely time out again
+        "api_read_retries": 0,
+        "backoff": 0.5,
+    }
+    API_CONNECT_RETRIES = 1
+
+    def __init__(self, settings: Optional[Dict] = None):
+        if settings is None:
+            settings = settings_manager.get_all().get("network", {})
+        config = dict(self.DEFAULTS, **{k: v for k, v in settings.items() if v is not None})
+
+        self.connect_timeout = float(config["connect_timeout"])
+        self.read_timeout = float(config["read_timeout"])
+        self.download_read_timeout = float(config["download_read_timeout"])
+        self.pool_size = int(config["pool_size"])
+        self.retries = int(config["retries"])
+        self.api_read_retries = int(config["api_read_retries"])
+        self.backoff = float(config["backoff"])
+
+        self.adapter = self._adapter(self._retry(self.retries, self.retries))
+        self.api_adapter = self._adapter(
+            self._retry(min(self.API_CONNECT_RETRIES, self.retries), min(self.api_read_retries, self.retries))
+        )
+
+    def _adapter(self, retry: Retry) -> TimeoutHTTPAdapter:
+        return TimeoutHTTPAdapter(
+            timeout=self.timeout,
+            pool_connections=self.POOL_HOSTS,
+            pool_maxsize=self.pool_size,
+            max_retries=retry
+        )
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+    @property
+    def download_timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.download_read_timeout)
+
+    def _retry(self, connect: int, read: int) -> Retry:
+        return JitteredRetry(
+            total=self.retries,
+            connect=connect,
+            read=read,
+            status=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+
+    def session(self, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+        """New session (own headers/cookies) on the shared keep-alive pool, for downloads."""
+        return self._session(self.adapter, headers)
+
+    def api_session(self, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+        """Like `session`, but fails fast on a stuck server (no read retries)."""
+        return self._session(self.api_adapter, headers)
+
+    @staticmethod
+    def _session(adapter: HTTPAdapter, headers: Optional[Dict[str, str]]) -> requests.Session:
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if headers:
+            session.headers.update(headers)
+        return session
+
+# Global instance
+http_transport = HttpTransport()
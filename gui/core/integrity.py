@@ -0,0 +1,70 @@
+"""
+Cheap completeness checks for finished downloads.
+
+A download that stopped early can still end with a clean EOF (e.g. a proxy
+closing the connection), so before a file gets its final name we check that
+the container is whole:
+  - MP4: the top-level boxes must cover the file exactly and include `moov`
+  - MPEG-TS: a whole number of 188-byte packets, starting with a sync byte
+Other formats are passed through.
+"""
+import hashlib
+import os
+import struct
+from typing import Optional
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+# Top-level box types an MP4 file starts with
+MP4_FIRST_BOXES = {b"ftyp", b"styp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pdin"}
+
+
+def _mp4_problem(f, size: int) -> Optional[str]:
+    offset = 0
+    boxes = set()
+    while offset < size:
+        f.seek(offset)
+        header = f.read(16)
+        if len(header) < 8:
+            return f"truncated MP4 box header at byte {offset}"
+        box_size, box_type = struct.unpack(">I4s", header[:8])
+        if box_size == 1:
+            if len(header) < 16:
+                return f"truncated MP4 box header at byte {offset}"
+            box_size = struct.unpack(">Q", header[8:16])[0]
+        elif box_size == 0:
+            box_size = size - offset  # box runs to the end of the file
+        if box_size < 8:
+            return f"invalid MP4 box at byte {offset}"
+        boxes.add(box_type)
+        offset += box_size
+    if offset != size:
+        return f"MP4 truncated: last box needs {offset - size} more bytes"
+    if b"moov" not in boxes:
+        return "MP4 has no moov box"
+    return None
+
+
+def container_problem(path: str) -> Optional[str]:
+    """Why the file at `path` looks incomplete, or None if it looks fine (or the format is unknown)"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return "file is empty"
+    with open(path, "rb") as f:
+        head = f.read(8)
+        if head[0] == TS_SYNC_BYTE:
+            if size % TS_PACKET_SIZE:
+                return f"MPEG-TS truncated: {size % TS_PACKET_SIZE} bytes of a partial packet"
+            return None
+        if len(head) == 8 and head[4:8] in MP4_FIRST_BOXES:
+            return _mp4_problem(f, size)
+    return None
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Streams the file through SHA-256 without loading it into memory"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,122 @@
+"""
+Crash-safe, coalesced writes of small state files.
+
+`atomic_write` never leaves a half-written file behind: data goes to a temp
+file next to the target, is fsynced and then renamed over it. A
+`DebouncedWriter` sits on top for state that changes in bursts (settings,
+theme): `schedule()` only marks the file dirty, a background timer writes
+the latest state once per burst, and anything pending is flushed on exit.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+
+def atomic_write(path: Union[str, Path], data: Union[str, bytes]):
+    """Replaces `path` with `data` in one step: temp file, fsync, rename."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # mkstemp creates 0600, keep the permissions the file had
+            os.chmod(tmp, os.stat(path).st_mode & 0o777)
+        except OSError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        # Make the rename itself durable (POSIX only)
+        try:
+            dir_fd = os.open(str(path.parent), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+
+def atomic_write_json(path: Union[str, Path], data: Any, **kwargs):
+    atomic_write(path, json.dumps(data, ensure_ascii=False, **kwargs))
+
+
+class DebouncedWriter:
+    """
+    Writes `get_data()` to `path` as JSON at most once per `delay` seconds,
+    however often `schedule()` is called in between.
+    """
+    DELAY = 0.5
+
+    def __init__(self, path: Union[str, Path], get_data: Callable[[], Any], delay: float = DELAY,
+                 indent: Optional[int] = 2):
+        self.path = Path(path)
+        self.get_data = get_data
+        self.delay = delay
+        self.indent = indent
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.timer: Optional[threading.Timer] = None
+        self.dirty = False
+        self.error: Optional[str] = None  # why the last write failed
+        _writers.add(self)
+
+    def schedule(self):
+        """Marks the state dirty; it's written once the current burst is over"""
+        with self.lock:
+            self.dirty = True
+            if self.timer is None:
+                self.timer = threading.Timer(self.delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self) -> bool:
+        """
+        Writes pending changes now (after a background write in progress, so
+        its failure isn't missed). Returns False if the write failed, see `error`.
+        """
+        # The disk is only touched under write_lock, so schedule() never waits on it
+        with self.write_lock:
+            with self.lock:
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+                if not self.dirty:
+                    return True
+                self.dirty = False
+            try:
+                atomic_write_json(self.path, self.get_data(), indent=self.indent)
+                self.error = None
+                return True
+            except Exception as e:
+                print(f"⚠️ Error writing {self.path}: {e}")
+                self.error = str(e)
+                with self.lock:
+                    self.dirty = True
+                return False
+
+
+_writers: "weakref.WeakSet[DebouncedWriter]" = weakref.WeakSet()
+
+
+@atexit.register
+def flush_all():
+    """Writes whatever is still pending (registered to run on exit)"""
+    for writer in list(_writers):
+        writer.flush()
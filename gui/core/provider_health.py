@@ -0,0 +1,179 @@
+import atexit
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .persistence import atomic_write_json
+
+class ProviderHealth:
+    """
+    Persistent scoreboard of how embed providers (and their hosts) behave.
+
+    Every resolution attempt records latency and success. Embeds are then
+    ordered by expected time-to-link and providers that keep failing are
+    skipped by a circuit breaker: after FAILURE_THRESHOLD consecutive failures
+    the circuit opens, after a cooldown a single probe is let through
+    (half-open), and its outcome closes or re-opens the circuit. The provider
+    that last worked for a show is always tried first.
+    """
+    FAILURE_THRESHOLD = 3
+    # Cooldown before a half-open probe, doubled on every trip that follows
+    OPEN_FOR = 10 * 60
+    MAX_OPEN_FOR = 6 * 60 * 60
+    # A probe that never reports back (e.g. cancelled) frees its slot after this
+    PROBE_TIMEOUT = 60
+    # Assumed latency (seconds) for providers we know nothing about yet
+    DEFAULT_LATENCY = 2.0
+    LATENCY_ALPHA = 0.3
+    SAVE_INTERVAL = 30
+    MAX_REMEMBERED_SHOWS = 500
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or Path.home() / ".ani-cli-gui" / "provider_health.json"
+        self.lock = threading.Lock()
+        self.stats: Dict[str, Dict] = {}       # "provider:Default" / "host:example.com" -> stats
+        self.last_working: Dict[str, str] = {}  # show id -> provider name
+        self._probing: Dict[str, float] = {}   # key -> probe start
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+        atexit.register(self.save)
+
+    def _load(self):
+        try:
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.stats = data.get("stats", {})
+                self.last_working = data.get("last_working", {})
+        except Exception as e:
+            print(f"Error loading provider health: {e}")
+
+    def save(self):
+        with self.lock:
+            if not self._dirty:
+                return
+            data = {"stats": self.stats, "last_working": self.last_working}
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            atomic_write_json(self.path, data)
+        except Exception as e:
+            print(f"Error saving provider health: {e}")
+
+    def _maybe_save(self):
+        if time.time() - self._last_save >= self.SAVE_INTERVAL:
+            self.save()
+
+    @staticmethod
+    def _keys(provider: str, host: Optional[str]) -> List[str]:
+        keys = [f"provider:{provider}"]
+        if host:
+            keys.append(f"host:{host}")
+        return keys
+
+    def record(self, provider: str, host: Optional[str], ok: bool, latency: float):
+        """Records the outcome of one resolution attempt."""
+        now = time.time()
+        with self.lock:
+            for key in self._keys(provider, host):
+                entry = self.stats.setdefault(key, {
+                    "ok": 0, "fail": 0, "latency": None, "streak": 0, "opened_at": None, "trips": 0
+                })
+                self._probing.pop(key, None)
+                if ok:
+                    entry["ok"] += 1
+                    entry["streak"] = 0
+                    entry["opened_at"] = None
+                    entry["trips"] = 0
+                    previous = entry["latency"]
+                    entry["latency"] = latency if previous is None else (
+                        self.LATENCY_ALPHA * latency + (1 - self.LATENCY_ALPHA) * previous
+                    )
+                else:
+                    entry["fail"] += 1
+                    entry["streak"] += 1
+                    if entry["streak"] >= self.FAILURE_THRESHOLD:
+                        # Trip, or re-trip with a longer cooldown after a failed probe
+                        entry["trips"] += 1
+                        entry["opened_at"] = now
+            self._dirty = True
+        self._maybe_save()
+
+    def remember_working(self, show_id: Optional[str], provider: str):
+        if not show_id:
+            return
+        with self.lock:
+            self.last_working.pop(str(show_id), None)
+            self.last_working[str(show_id)] = provider
+            while len(self.last_working) > self.MAX_REMEMBERED_SHOWS:
+                self.last_working.pop(next(iter(self.last_working)))
+            self._dirty = True
+        self._maybe_save()
+
+    def _cooldown(self, entry: Dict) -> float:
+        return min(self.OPEN_FOR * (2 ** max(entry.get("trips", 1) - 1, 0)), self.MAX_OPEN_FOR)
+
+    def _state(self, key: str, now: float) -> str:
+        """closed, open or half_open (cooldown over, a probe may go through)."""
+        entry = self.stats.get(key)
+        if not entry or entry.get("opened_at") is None:
+            return "closed"
+        if now - entry["opened_at"] < self._cooldown(entry):
+            return "open"
+        return "half_open"
+
+    def _expected_time(self, key: str) -> float:
+        """Expected seconds until a working link: latency / smoothed success rate."""
+        entry = self.stats.get(key)
+        if not entry:
+            return self.DEFAULT_LATENCY
+        latency = entry["latency"] if entry["latency"] is not None else self.DEFAULT_LATENCY
+        success_rate = (entry["ok"] + 1) / (entry["ok"] + entry["fail"] + 2)
+        return latency / success_rate
+
+    def order(self, embeds: List[Dict], show_id: Optional[str] = None, host_of=None) -> List[Dict]:
+        """
+        Returns `embeds` best first, without providers whose circuit is open.
+        `host_of(embed)` gives the embed's host so host-wide outages count too.
+        If every provider is open we return them all rather than nothing.
+        """
+        now = time.time()
+        preferred = self.last_working.get(str(show_id)) if show_id else None
+        allowed = []
+
+        with self.lock:
+            for embed in embeds:
+                keys = self._keys(embed.get("sourceName", ""), host_of(embed) if host_of else None)
+                states = [self._state(key, now) for key in keys]
+                if "open" in states:
+                    continue
+                probe_keys = [key for key, state in zip(keys, states) if state == "half_open"]
+                if any(now - self._probing.get(key, 0) < self.PROBE_TIMEOUT for key in probe_keys):
+                    # Someone is already probing this one
+                    continue
+                for key in probe_keys:
+                    print(f"🩺 Probing provider circuit {key}")
+                    self._probing[key] = now
+                score = max(self._expected_time(key) for key in keys)
+                allowed.append((embed.get("sourceName") != preferred, score, -(embed.get("priority") or 0), embed))
+
+        if not allowed:
+            return sorted(embeds, key=lambda e: e.get("priority") or 0, reverse=True)
+
+        allowed.sort(key=lambda item: item[:3])
+        return [item[3] for item in allowed]
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Copy of the current stats plus circuit state, for debugging/tuning."""
+        now = time.time()
+        with self.lock:
+            return {
+                key: dict(entry, state=self._state(key, now), expected_time=round(self._expected_time(key), 3))
+                for key, entry in self.stats.items()
+            }
+
+# Global instance
+provider_health = ProviderHealth()
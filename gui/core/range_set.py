@@ -0,0 +1,86 @@
+"""
+Compact set of episode numbers.
+
+Whole-numbered episodes are kept as sorted, non-overlapping [first, last]
+ranges, so "watched 1-1100" is a single pair instead of 1,100 entries.
+Anything else ("12.5", "SP1") goes into a small side set. Serialized as
+"1-500,502,12.5".
+"""
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Set
+
+
+def _as_int(episode) -> Optional[int]:
+    text = str(episode).strip()
+    return int(text) if text.isdigit() else None
+
+
+class RangeSet:
+    def __init__(self, episodes: Iterable = ()):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.other: Set[str] = set()
+        for episode in episodes:
+            self.add(episode)
+
+    def __contains__(self, episode) -> bool:
+        number = _as_int(episode)
+        if number is None:
+            return str(episode).strip() in self.other
+        index = bisect_right(self.starts, number) - 1
+        return index >= 0 and number <= self.ends[index]
+
+    def __len__(self) -> int:
+        return sum(end - start + 1 for start, end in zip(self.starts, self.ends)) + len(self.other)
+
+    def __iter__(self) -> Iterator[str]:
+        for start, end in zip(self.starts, self.ends):
+            for number in range(start, end + 1):
+                yield str(number)
+        yield from sorted(self.other)
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, RangeSet) and self.starts == other.starts
+                and self.ends == other.ends and self.other == other.other)
+
+    def copy(self) -> "RangeSet":
+        copy = RangeSet()
+        copy.starts, copy.ends, copy.other = list(self.starts), list(self.ends), set(self.other)
+        return copy
+
+    def add(self, episode):
+        number = _as_int(episode)
+        if number is None:
+            self.other.add(str(episode).strip())
+        else:
+            self.add_range(number, number)
+
+    def add_range(self, first: int, last: int):
+        """Adds first..last (inclusive), merging with overlapping or adjacent ranges"""
+        if last < first:
+            return
+        # Every range that touches [first - 1, last + 1] is folded into the new one
+        low = bisect_right(self.ends, first - 2)
+        high = bisect_right(self.starts, last + 1)
+        if low < high:
+            first = min(first, self.starts[low])
+            last = max(last, self.ends[high - 1])
+        self.starts[low:high] = [first]
+        self.ends[low:high] = [last]
+
+    def to_string(self) -> str:
+        parts = [str(start) if start == end else f"{start}-{end}" for start, end in zip(self.starts, self.ends)]
+        return ",".join(parts + sorted(self.other))
+
+    @classmethod
+    def from_string(cls, text: Optional[str]) -> "RangeSet":
+        result = cls()
+        for part in (text or "").split(","):
+            if not part:
+                continue
+            first, sep, last = part.partition("-")
+            if sep and first.isdigit() and last.isdigit():
+                result.add_range(int(first), int(last))
+            else:
+                result.add(part)
+        return result
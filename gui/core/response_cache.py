@@ -0,0 +1,169 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+class ResponseCache:
+    """
+    On-disk cache for allanime GraphQL responses.
+
+    Entries are keyed by the GraphQL document plus its variables and live in a
+    small SQLite file under ~/.ani-cli-gui. Each query kind has its own TTL.
+    Expired entries are still served for `stale_for` seconds (the caller is
+    expected to refresh them in the background), except for kinds in NO_STALE,
+    and the least recently used entries are evicted once the cache grows past
+    `max_bytes`. Access times are only needed for eviction, so hits collect
+    them in memory and they're written together with the next store.
+    """
+    # Seconds an entry is considered fresh, per query kind
+    DEFAULT_TTLS = {
+        "search": 10 * 60,
+        "episodes": 30 * 60,
+        "embeds": 10 * 60,
+    }
+    DEFAULT_TTL = 5 * 60
+    STALE_FOR = 24 * 60 * 60
+    # Episode sources carry expiring links; past the TTL they're refetched
+    NO_STALE = frozenset({"embeds"})
+    # Pending access times written without waiting for a store
+    TOUCH_BATCH = 256
+    MAX_BYTES = 20 * 1024 * 1024
+
+    def __init__(self, path: Optional[Path] = None, max_bytes: int = MAX_BYTES,
+                 ttls: Optional[Dict[str, int]] = None, stale_for: int = STALE_FOR):
+        self.path = path or Path.home() / ".ani-cli-gui" / "api_cache.sqlite3"
+        self.max_bytes = max_bytes
+        self.ttls = dict(self.DEFAULT_TTLS, **(ttls or {}))
+        self.stale_for = stale_for
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._touched: Dict[str, float] = {}  # key -> access time not written yet
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self.db.commit()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    @staticmethod
+    def make_key(gql: str, variables: Dict) -> str:
+        """Stable key for a GraphQL document + variables (whitespace and key order don't matter)."""
+        document = " ".join(gql.split())
+        raw = document + "\n" + json.dumps(variables, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Tuple[Optional[Any], bool]:
+        """
+        Returns `(value, fresh)`. `value` is None on a miss; `fresh` is False
+        when the entry is past its TTL but still inside the stale window.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT kind, body, stored FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None, False
+
+            kind, body, stored = row
+            age = now - stored
+            ttl = self.ttls.get(kind, self.DEFAULT_TTL)
+            stale_for = 0 if kind in self.NO_STALE else self.stale_for
+            if age > ttl + stale_for:
+                self._delete(key)
+                self.db.commit()
+                self.counters["misses"] += 1
+                return None, False
+
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._write_touched()
+                self.db.commit()
+            fresh = age <= ttl
+            self.counters["hits" if fresh else "stale_hits"] += 1
+
+        return json.loads(body), fresh
+
+    def put(self, key: str, kind: str, value: Any):
+        body = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        size = len(body.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            self._delete(key)
+            self.db.execute(
+                "INSERT INTO entries (key, kind, body, size, stored, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, body, size, now, now)
+            )
+            self.total_bytes += size
+            self.counters["stores"] += 1
+            self._write_touched()
+            self._evict()
+            self.db.commit()
+
+    def _write_touched(self):
+        """Writes the access times collected by get() (caller holds the lock and commits)"""
+        if self._touched:
+            self.db.executemany("UPDATE entries SET accessed = ? WHERE key = ?",
+                                [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+
+    def _delete(self, key: str):
+        self._touched.pop(key, None)
+        row = self.db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row:
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.total_bytes -= row[0]
+
+    def _evict(self):
+        """Drop least recently used entries until we're back under budget."""
+        while self.total_bytes > self.max_bytes:
+            rows = self.db.execute(
+                "SELECT key, size FROM entries ORDER BY accessed LIMIT 32"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM entries")
+            self.db.commit()
+            self._touched.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus current size, for tuning TTLs and the budget."""
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            stats = dict(self.counters)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["entries"] = entries
+        stats["bytes"] = self.total_bytes
+        stats["hit_rate"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else 0.0
+        return stats
+
+# Global instance
+response_cache = ResponseCache()
@@ -1,111 +1,392 @@
-
-import requests
+import httpx
+import asyncio
 import json
 import re
-from typing import List, Dict, Optional
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Optional, Tuple, Any, Iterator, AsyncIterator
+from urllib.parse import urlparse
+from .response_cache import ResponseCache, response_cache
+from .source_decoder import decode_source, decode_many
+from .stream_extractor import StreamCandidate, extract_candidates
+from .provider_health import ProviderHealth, provider_health
+from .hls import HlsVariant, is_master_playlist, parse_master_playlist, select_variant, throughput_estimator
+from .singleflight import SingleFlight, AsyncSingleFlight
+from .http_transport import HttpTransport, http_transport
 
-class AniScraper:
+class ScraperBase:
+    """
+    Everything the sync and async scrapers share: endpoints, GraphQL documents,
+    request variables and response parsing. Subclasses only do the networking.
+    """
     BASE_URL = "https://allanime.day"
     API_URL = "https://api.allanime.day/api"
     REFERER = "https://allmanga.to"
     AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0"
+    # After the first working link arrives, wait this long (seconds) for a
+    # higher priority provider to finish before settling.
+    RESOLVE_GRACE_PERIOD = 0.35
+    # Master playlists carry short lived tokens, don't hold on to them for long
+    VARIANTS_TTL = 5 * 60
+    VARIANTS_CACHE_SIZE = 64
+    # Episodes per batched embed query (aliased `episode` fields in one document)
+    EMBED_BATCH_SIZE = 12
+    # Results per page when paging through a search
+    SEARCH_PAGE_SIZE = 20
 
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": self.AGENT,
-            "Referer": self.REFERER
-        })
-
-    def search_anime(self, query: str, mode: str = "sub") -> List[Dict]:
-        """
-        Searches for anime.
-        Equivalent to `search_anime` in shell script.
-        """
-        search_gql = """
+    SEARCH_GQL = """
         query( $search: SearchInput $limit: Int $page: Int $translationType: VaildTranslationTypeEnumType $countryOrigin: VaildCountryOriginEnumType ) {
             shows( search: $search limit: $limit page: $page translationType: $translationType countryOrigin: $countryOrigin ) {
                 edges { _id name availableEpisodes __typename thumbnail }
             }
         }
         """
-        
-        variables = {
+
+    EPISODES_LIST_GQL = """
+        query ($showId: String!) {
+            show( _id: $showId ) {
+                _id availableEpisodesDetail
+            }
+        }
+        """
+
+    EPISODE_EMBED_GQL = """
+        query ($showId: String!, $translationType: VaildTranslationTypeEnumType!, $episodeString: String!) {
+            episode( showId: $showId translationType: $translationType episodeString: $episodeString ) {
+                episodeString sourceUrls
+            }
+        }
+        """
+
+    @property
+    def default_headers(self) -> Dict[str, str]:
+        return {
+            "User-Agent": self.AGENT,
+            "Referer": self.REFERER
+        }
+
+    def _api_params(self, gql: str, variables: Dict) -> Dict[str, str]:
+        return {
+            "variables": json.dumps(variables),
+            "query": gql
+        }
+
+    def _cache_lookup(self, gql: str, variables: Dict) -> Tuple[Optional[str], Optional[Any], bool]:
+        """Returns `(key, data, fresh)`; `data` is None on a miss or when caching is off."""
+        if self.cache is None:
+            return None, None, False
+        key = self.cache.make_key(gql, variables)
+        data, fresh = self.cache.get(key)
+        return key, data, fresh
+
+    def _api_flight_key(self, gql: str, variables: Dict) -> Tuple[str, str]:
+        return ("api", ResponseCache.make_key(gql, variables))
+
+    def _resolve_flight_key(self, embeds: List[Dict], show_id: Optional[str]) -> Tuple:
+        return ("resolve", show_id, tuple(embed.get("sourceUrl") or "" for embed in embeds))
+
+    def _cache_store(self, key: Optional[str], kind: str, data: Any):
+        # Only keep clean answers, a GraphQL error shouldn't stick around for the whole TTL
+        if key and self.cache is not None and isinstance(data, dict) and data.get("data") and not data.get("errors"):
+            self.cache.put(key, kind, data)
+
+    def _search_variables(self, query: str, mode: str, limit: int = 40, page: int = 1) -> Dict:
+        return {
             "search": {
                 "allowAdult": False,
                 "allowUnknown": False,
                 "query": query
             },
-            "limit": 40,
-            "page": 1,
+            "limit": limit,
+            "page": page,
             "translationType": mode,
             "countryOrigin": "ALL"
         }
 
-        try:
-            response = self.session.get(
-                self.API_URL,
-                params={
-                    "variables": json.dumps(variables),
-                    "query": search_gql
-                }
+    def _parse_search(self, data: Dict, mode: str) -> List[Dict]:
+        results = []
+        if "data" in data and "shows" in data["data"]:
+            for edge in data["data"]["shows"]["edges"]:
+                results.append({
+                    "id": edge["_id"],
+                    "title": edge["name"],
+                    "episodes": edge.get("availableEpisodes", {}).get(mode, 0),
+                    "thumbnail": edge.get("thumbnail") # New: Get thumbnail!
+                })
+        return results
+
+    def _parse_episodes_list(self, data: Dict, mode: str) -> List[str]:
+        if "data" in data and "show" in data["data"]:
+            details = data["data"]["show"]["availableEpisodesDetail"]
+            if mode in details:
+                # The API returns a list of strings, e.g. ["1", "2", "3"]
+                # We should probably sort them numerically if possible
+                eps = details[mode]
+                # Sort numerically if they are numbers, otherwise keep as is
+                try:
+                    eps.sort(key=lambda x: float(x))
+                except ValueError:
+                    eps.sort()
+                return eps
+        return []
+
+    def _parse_episode_embeds(self, data: Dict) -> List[Dict]:
+        sources = []
+        if "data" in data and "episode" in data["data"]:
+            ep_data = data["data"]["episode"]
+            if ep_data and "sourceUrls" in ep_data:
+                for source in ep_data["sourceUrls"]:
+                    # source is like {"sourceUrl": "--crypt...", "priority": 1.0, "sourceName": "Luf-Mp4"}
+                    # We need to decrypt/clean the sourceUrl if it starts with --
+                    if source.get("sourceUrl"):
+                         sources.append(source)
+
+                # Decode the whole list in one go, get_stream_link picks it up from "decodedUrl"
+                for source, decoded in zip(sources, decode_many([s["sourceUrl"] for s in sources])):
+                    source["decodedUrl"] = decoded
+        return sources
+
+    def _embed_variables(self, show_id: str, episode_string: str, mode: str) -> Dict:
+        return {
+            "showId": show_id,
+            "translationType": mode,
+            "episodeString": episode_string
+        }
+
+    def _chunks(self, items: List, size: Optional[int]) -> List[List]:
+        size = max(1, size or self.EMBED_BATCH_SIZE)
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def _batch_embed_query(self, show_id: str, episodes: List[str], mode: str) -> Tuple[str, Dict]:
+        """One GraphQL document fetching sourceUrls for several episodes via aliases e0, e1, ..."""
+        definitions = ["$showId: String!", "$translationType: VaildTranslationTypeEnumType!"]
+        fields = []
+        variables = {"showId": show_id, "translationType": mode}
+        for i, episode_string in enumerate(episodes):
+            definitions.append(f"$ep{i}: String!")
+            fields.append(
+                f"e{i}: episode( showId: $showId translationType: $translationType episodeString: $ep{i} ) "
+                "{ episodeString sourceUrls }"
             )
-            response.raise_for_status()
-            data = response.json()
-            
-            results = []
-            if "data" in data and "shows" in data["data"]:
-                for edge in data["data"]["shows"]["edges"]:
-                    results.append({
-                        "id": edge["_id"],
-                        "title": edge["name"],
-                        "episodes": edge.get("availableEpisodes", {}).get(mode, 0),
-                        "thumbnail": edge.get("thumbnail") # New: Get thumbnail!
-                    })
-            return results
+            variables[f"ep{i}"] = episode_string
+        gql = f"query ({', '.join(definitions)}) {{ {' '.join(fields)} }}"
+        return gql, variables
+
+    def _cached_embeds(self, show_id: str, episode_string: str, mode: str) -> Optional[List[Dict]]:
+        """Fresh cached embeds of a single episode, None if we have to ask the API."""
+        _, data, fresh = self._cache_lookup(self.EPISODE_EMBED_GQL, self._embed_variables(show_id, episode_string, mode))
+        if data is None or not fresh:
+            return None
+        return self._parse_episode_embeds(data)
+
+    def _parse_batch_embeds(self, show_id: str, episodes: List[str], mode: str,
+                            data: Dict) -> Tuple[Dict[str, List[Dict]], List[str]]:
+        """
+        Splits a batched response per episode and seeds the single-episode cache
+        with each part. Returns `(results, failed)`, `failed` being the episodes
+        the server didn't answer (errors/null) that need a request of their own.
+        """
+        results = {}
+        failed = []
+        answers = data.get("data") or {}
+        has_errors = bool(data.get("errors"))
+        for i, episode_string in enumerate(episodes):
+            ep_data = answers.get(f"e{i}")
+            if ep_data is None and (has_errors or f"e{i}" not in answers):
+                failed.append(episode_string)
+                continue
+            single = {"data": {"episode": ep_data}}
+            if ep_data:
+                key = self.cache.make_key(self.EPISODE_EMBED_GQL, self._embed_variables(show_id, episode_string, mode)) if self.cache else None
+                self._cache_store(key, "embeds", single)
+            results[episode_string] = self._parse_episode_embeds(single)
+        return results, failed
+
+    def _decrypt_source(self, url: str) -> str:
+        """
+        Decrypts the source URL.
+        Ported from `provider_init` in ani-cli, see `core.source_decoder`.
+        """
+        return decode_source(url)
+
+    def _embed_url(self, source_embed: Dict) -> Optional[str]:
+        """Decrypts an embed's sourceUrl and makes it absolute."""
+        source_url = source_embed.get("sourceUrl")
+        if not source_url:
+            return None
+
+        # Decrypt first (embeds from get_episode_embeds are already decoded)
+        decrypted_path = source_embed.get("decodedUrl") or self._decrypt_source(source_url)
+        if not decrypted_path.startswith("http"):
+            # Check for protocol-relative URL (e.g., //vidstreaming.io/...)
+            if decrypted_path.startswith("//"):
+                return f"https:{decrypted_path}"
+            # If relative, append to BASE_URL
+            elif decrypted_path.startswith("/"):
+                 return f"{self.BASE_URL}{decrypted_path}"
+            else:
+                 return f"{self.BASE_URL}/{decrypted_path}"
+        return decrypted_path
+
+    def _direct_candidates(self, full_url: str) -> Optional[List[StreamCandidate]]:
+        """Embeds that already are the stream and need no extra request."""
+        if "tools.fast4speed.rsvp" in full_url:
+            return [StreamCandidate(url=full_url, referer=self.REFERER)]
+        return None
+
+    def _cached_variants(self, url: str) -> Optional[List[HlsVariant]]:
+        entry = self._variants_cache.get(url)
+        if entry and time.monotonic() - entry[0] < self.VARIANTS_TTL:
+            return entry[1]
+        return None
+
+    def _remember_variants(self, url: str, variants: List[HlsVariant]):
+        if len(self._variants_cache) >= self.VARIANTS_CACHE_SIZE:
+            # Forget the oldest one (dicts keep insertion order)
+            self._variants_cache.pop(next(iter(self._variants_cache)), None)
+        self._variants_cache[url] = (time.monotonic(), variants)
+
+    def _playlist_headers(self, candidate: StreamCandidate) -> Dict[str, str]:
+        return {"Referer": candidate.referer} if candidate.referer else {}
+
+    def _wants_variants(self, candidate: StreamCandidate) -> bool:
+        return candidate.hls or ".m3u8" in candidate.url
+
+    def _variant_stream(self, master: StreamCandidate, variant: HlsVariant) -> StreamCandidate:
+        return StreamCandidate(
+            url=variant.url,
+            resolution=f"{variant.height}p" if variant.height else master.resolution,
+            hls=True,
+            hardsub_lang=master.hardsub_lang,
+            referer=master.referer
+        )
+
+    def _pick_candidate(self, candidates: List[StreamCandidate], quality: str, throughput: Optional[float]) -> StreamCandidate:
+        """Quality selection among plain (mp4) candidates, by their resolutionStr."""
+        sized = sorted((c for c in candidates if c.height), key=lambda c: c.height, reverse=True)
+        if not sized:
+            return candidates[0]
+        return select_variant(sized, quality, throughput)
+
+    def _embed_host(self, embed: Dict) -> Optional[str]:
+        url = self._embed_url(embed)
+        host = urlparse(url).hostname if url else None
+        # Most embeds go through allanime's own /apivtwo/clock, that host says
+        # nothing about a single provider
+        return None if host == urlparse(self.BASE_URL).hostname else host
+
+    def _rank_embeds(self, embeds: List[Dict], show_id: Optional[str] = None) -> List[Dict]:
+        """
+        Orders embeds best first: by provider health (expected time-to-link,
+        open circuits skipped) when we track it, else by the API's `priority`.
+        """
+        if self.health is None:
+            return sorted(embeds, key=lambda e: e.get("priority") or 0, reverse=True)
+        return self.health.order(embeds, show_id, host_of=self._embed_host)
+
+    def _record_attempt(self, embed: Dict, ok: bool, started: float):
+        if self.health is not None:
+            self.health.record(embed.get("sourceName", ""), self._embed_host(embed), ok, time.monotonic() - started)
+
+    def _record_winner(self, show_id: Optional[str], embed: Dict):
+        if self.health is not None:
+            self.health.remember_working(show_id, embed.get("sourceName", ""))
+
+
+class AniScraper(ScraperBase):
+    """
+    Blocking scraper built on `requests`, for worker threads and scripts
+    such as `debug_scraper.py`.
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = response_cache,
+                 health: Optional[ProviderHealth] = provider_health,
+                 transport: HttpTransport = http_transport):
+        # Shared pool with default timeouts, fails fast on a stuck provider, see core/http_transport.py
+        self.session = transport.api_session(self.default_headers)
+        self.cache = cache
+        self.health = health
+        self._revalidating = set()
+        self._revalidating_lock = threading.Lock()
+        self._variants_cache = {}
+        # Identical calls in flight at the same time share one request
+        self.inflight = SingleFlight()
+
+    def _fetch_api(self, gql: str, variables: Dict) -> Dict:
+        return self.inflight.do(self._api_flight_key(gql, variables), self._get_api, gql, variables)
+
+    def _get_api(self, gql: str, variables: Dict) -> Dict:
+        response = self.session.get(self.API_URL, params=self._api_params(gql, variables))
+        response.raise_for_status()
+        return response.json()
+
+    def _query_api(self, gql: str, variables: Dict, kind: str) -> Dict:
+        """Cached GraphQL GET. Stale entries are returned at once and refreshed in the background."""
+        key, data, fresh = self._cache_lookup(gql, variables)
+        if data is not None:
+            if not fresh:
+                self._revalidate(key, kind, gql, variables)
+            return data
+
+        data = self._fetch_api(gql, variables)
+        self._cache_store(key, kind, data)
+        return data
+
+    def _revalidate(self, key: str, kind: str, gql: str, variables: Dict):
+        with self._revalidating_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def refresh():
+            try:
+                self._cache_store(key, kind, self._fetch_api(gql, variables))
+            except Exception as e:
+                print(f"Background refresh failed: {e}")
+            finally:
+                with self._revalidating_lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def search_anime(self, query: str, mode: str = "sub", limit: int = 40, page: int = 1) -> List[Dict]:
+        """
+        Searches for anime.
+        Equivalent to `search_anime` in shell script.
+        """
+        try:
+            data = self._query_api(self.SEARCH_GQL, self._search_variables(query, mode, limit, page), "search")
+            return self._parse_search(data, mode)
         except Exception as e:
             print(f"Error searching anime: {e}")
             return []
 
+    def iter_search(self, query: str, mode: str = "sub", page_size: Optional[int] = None,
+                    max_pages: Optional[int] = None) -> Iterator[List[Dict]]:
+        """
+        Yields search results page by page, so the first ones can be shown
+        before the rest arrive. Stops at the first short (or empty) page.
+        """
+        page_size = page_size or self.SEARCH_PAGE_SIZE
+        page = 1
+        while max_pages is None or page <= max_pages:
+            results = self.search_anime(query, mode, limit=page_size, page=page)
+            if not results:
+                return
+            yield results
+            if len(results) < page_size:
+                return
+            page += 1
+
     def get_episodes_list(self, show_id: str, mode: str = "sub") -> List[str]:
         """
         Gets list of available episode numbers.
         Equivalent to `episodes_list` in shell script.
         """
-        episodes_list_gql = """
-        query ($showId: String!) {
-            show( _id: $showId ) {
-                _id availableEpisodesDetail
-            }
-        }
-        """
-
-        variables = {"showId": show_id}
-
         try:
-            response = self.session.get(
-                self.API_URL,
-                params={
-                    "variables": json.dumps(variables),
-                    "query": episodes_list_gql
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            if "data" in data and "show" in data["data"]:
-                details = data["data"]["show"]["availableEpisodesDetail"]
-                if mode in details:
-                    # The API returns a list of strings, e.g. ["1", "2", "3"]
-                    # We should probably sort them numerically if possible
-                    eps = details[mode]
-                    # Sort numerically if they are numbers, otherwise keep as is
-                    try:
-                        eps.sort(key=lambda x: float(x))
-                    except ValueError:
-                        eps.sort()
-                    return eps
-            return []
+            data = self._query_api(self.EPISODES_LIST_GQL, {"showId": show_id}, "episodes")
+            return self._parse_episodes_list(data, mode)
         except Exception as e:
             print(f"Error getting episodes list: {e}")
             return []
@@ -115,222 +396,518 @@ class AniScraper:
         Gets the embed URLs for a specific episode.
         Equivalent to `get_episode_url` query part.
         """
-        episode_embed_gql = """
-        query ($showId: String!, $translationType: VaildTranslationTypeEnumType!, $episodeString: String!) {
-            episode( showId: $showId translationType: $translationType episodeString: $episodeString ) {
-                episodeString sourceUrls
-            }
-        }
-        """
-        
-        variables = {
-            "showId": show_id,
-            "translationType": mode,
-            "episodeString": episode_string
-        }
-        
         try:
-            response = self.session.get(
-                self.API_URL,
-                params={
-                    "variables": json.dumps(variables),
-                    "query": episode_embed_gql
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            sources = []
-            if "data" in data and "episode" in data["data"]:
-                ep_data = data["data"]["episode"]
-                if ep_data and "sourceUrls" in ep_data:
-                    for source in ep_data["sourceUrls"]:
-                        # source is like {"sourceUrl": "--crypt...", "priority": 1.0, "sourceName": "Luf-Mp4"}
-                        # We need to decrypt/clean the sourceUrl if it starts with --
-                        if source.get("sourceUrl"):
-                             sources.append(source)
-            return sources
-            
+            data = self._query_api(self.EPISODE_EMBED_GQL, self._embed_variables(show_id, episode_string, mode), "embeds")
+            return self._parse_episode_embeds(data)
         except Exception as e:
             print(f"Error getting episode embeds: {e}")
             return []
-    
-    
-    def _decrypt_source(self, url: str) -> str:
+
+    def get_episode_embeds_batch(self, show_id: str, episodes: List[str], mode: str = "sub",
+                                 chunk_size: Optional[int] = None) -> Dict[str, List[Dict]]:
         """
-        Decrypts the source URL.
-        Ported from `provider_init` in ani-cli.
+        Gets the embed URLs for many episodes with one request per `chunk_size`
+        episodes instead of one each. Falls back to per-episode requests for
+        whatever the server rejects. Returns {episode_string: embeds}.
         """
-        # Hex to char mapping
-        mapping = {
-            "01": "9", "00": "8", "0f": "7", "0e": "6", "0d": "5", "0c": "4",
-            "0b": "3", "0a": "2", "09": "1", "08": "0", "42": "z", "41": "y",
-            "40": "x", "4f": "w", "4e": "v", "4d": "u", "4c": "t", "4b": "s",
-            "4a": "r", "49": "q", "48": "p", "57": "o", "56": "n", "55": "m",
-            "54": "l", "53": "k", "52": "j", "51": "i", "50": "h", "5f": "g",
-            "5e": "f", "5d": "e", "5c": "d", "5b": "c", "5a": "b", "59": "a",
-            "62": "Z", "61": "Y", "60": "X", "6f": "W", "6e": "V", "6d": "U",
-            "6c": "T", "6b": "S", "6a": "R", "69": "Q", "68": "P", "77": "O",
-            "76": "N", "75": "M", "74": "L", "73": "K", "72": "J", "71": "I",
-            "70": "H", "7f": "G", "7e": "F", "7d": "E", "7c": "D", "7b": "C",
-            "7a": "B", "79": "A",
-            
-            # Symbols
-            "15": "-", "16": ".", "67": "_", "46": "~", "02": ":", "17": "/",
-            "07": "?", "1b": "#", "63": "[", "65": "]", "78": "@", "19": "!",
-            "1c": "$", "1e": "&", "10": "(", "11": ")", "12": "*", "13": "+",
-            "14": ",", "03": ";", "05": "=", "1d": "%",
-        }
+        results = {}
+        missing = []
+        for episode_string in episodes:
+            cached = self._cached_embeds(show_id, episode_string, mode)
+            if cached is not None:
+                results[episode_string] = cached
+            else:
+                missing.append(episode_string)
 
-        # 1. Remove "--" prefix if present (implied by regex in ani-cli)
-        if url.startswith("--"):
-            url = url[2:]
+        chunks = self._chunks(missing, chunk_size)
+        if chunks:
+            with ThreadPoolExecutor(max_workers=min(len(chunks), 4), thread_name_prefix="embeds") as executor:
+                for part in executor.map(lambda chunk: self._fetch_embed_chunk(show_id, chunk, mode), chunks):
+                    results.update(part)
 
-        # 2. Split into 2-char chunks and map
-        decoded_chars = []
-        for i in range(0, len(url), 2):
-            chunk = url[i:i+2]
-            if chunk in mapping:
-                decoded_chars.append(mapping[chunk])
-            else:
-                # If not found, keep as is? Or maybe it's raw char?
-                # The sed script only maps specific patterns. 
-                # Ideally we should decode from hex if it's standard hex, but this is a specific cypher.
-                # If not in mapping, let's assume it failed or is skipped.
-                # Wait, sed 's/../&\n/g' splits EVERYTHING.
-                # Then only specific lines are replaced.
-                # So if it's "FF" and not in mapping, it remains "FF".
-                # But looking at the mapping, it covers A-Z, a-z, 0-9 and symbols.
-                # So mostly everything should be covered.
-                decoded_chars.append(chunk)
-
-        result = "".join(decoded_chars)
-        
-        # 3. Replace /clock with /clock.json
-        result = result.replace("/clock", "/clock.json")
-        return result
+        return {episode_string: results.get(episode_string, []) for episode_string in episodes}
 
-    def get_stream_link(self, source_embed: Dict) -> Optional[str]:
+    def _fetch_embed_chunk(self, show_id: str, chunk: List[str], mode: str) -> Dict[str, List[Dict]]:
+        gql, variables = self._batch_embed_query(show_id, chunk, mode)
+        try:
+            data = self._fetch_api(gql, variables)
+            results, failed = self._parse_batch_embeds(show_id, chunk, mode, data)
+        except Exception as e:
+            print(f"Batched embed lookup failed ({e}), falling back to per-episode requests")
+            results, failed = {}, chunk
+
+        for episode_string in failed:
+            results[episode_string] = self.get_episode_embeds(show_id, episode_string, mode)
+        return results
+
+    def get_stream_candidates(self, source_embed: Dict) -> List[StreamCandidate]:
         """
-        Given a source embed object (from get_episode_embeds), returns the final stream URL (m3u8/mp4).
+        Given a source embed object (from get_episode_embeds), returns every stream
+        (m3u8/mp4) the provider offers, best first.
         Equivalent to `get_links` in ani-cli.
         """
-        source_url = source_embed.get("sourceUrl")
-        if not source_url:
-            return None
-            
-        # Decrypt first
-        decrypted_path = self._decrypt_source(source_url)
-        if not decrypted_path.startswith("http"):
-            # Check for protocol-relative URL (e.g., //vidstreaming.io/...)
-            if decrypted_path.startswith("//"):
-                full_url = f"https:{decrypted_path}"
-            # If relative, append to BASE_URL
-            elif decrypted_path.startswith("/"):
-                 full_url = f"{self.BASE_URL}{decrypted_path}"
-            else:
-                 full_url = f"{self.BASE_URL}/{decrypted_path}"
-        else:
-            full_url = decrypted_path
+        full_url = self._embed_url(source_embed)
+        if not full_url:
+            return []
 
-        if "tools.fast4speed.rsvp" in full_url:
-            return full_url
+        direct = self._direct_candidates(full_url)
+        if direct:
+            return direct
 
+        return self.inflight.do(("stream", full_url), self._fetch_candidates, full_url)
+
+    def _fetch_candidates(self, full_url: str) -> List[StreamCandidate]:
         print(f"Fetching stream details from: {full_url}")
 
         try:
             response = self.session.get(full_url)
             response.raise_for_status()
-            
-            try:
-                data = response.json()
-            except (json.JSONDecodeError, ValueError):
-                # Fallback: Try to regex scrape the response text (EXACTLY like ani-cli does)
-                # ani-cli: sed 's|},{|\n|g' | sed -nE 's|.*link":"([^"]*)".*"resolutionStr":"([^"]*)".*|\2 >\1|p'
-                
-                print(f"JSON parsing failed. Trying ani-cli style line-based parsing...")
-                text = response.text
-                
-                # Step 1: Mimic sed 's|},{|\n|g' - split JSON objects into separate lines
-                # This is THE KEY to ani-cli's success!
-                text = text.replace('},{', '}\n{')
-                
-                # Step 2: Search each line (like ani-cli's sed does)
-                for line in text.split('\n'):
-                    # Priority 1: HLS with en-US hardsub (best quality)
-                    # Pattern: hls","url":"...","hardsub_lang":"en-US"
-                    if 'hls' in line and 'hardsub_lang":"en-US"' in line:
-                        hls_match = re.search(r'"url"\s*:\s*"([^"]*)"', line)
-                        if hls_match:
-                            link = hls_match.group(1).replace('\\u002F', '/')
-                            print(f"Found HLS link: {link}")
-                            return link
-                    
-                    # Priority 2: Standard link with resolution
-                    # Pattern: link":"...","resolutionStr":"..."
-                    if 'link"' in line and 'resolutionStr"' in line:
-                        link_match = re.search(r'link"\s*:\s*"([^"]*)"', line)
-                        if link_match:
-                            link = link_match.group(1).replace('\\u002F', '/')
-                            print(f"Found standard link: {link}")
-                            return link
-                
-                # Step 3: If line-based parsing failed, try common player patterns
-                # (for sites that use different JSON structure)
-                print("Line-based parsing failed. Trying common player patterns...")
-                common_patterns = [
-                    (r'file\s*:\s*["\']([^"\']+)["\']', 'file'),
-                    (r'source\s*:\s*["\']([^"\']+)["\']', 'source'),
-                    (r'src\s*:\s*["\']([^"\']+)["\']', 'src'),
-                    (r'link"\s*:\s*"([^"]*)"', 'link'),  # Any link (last resort)
-                ]
-                
-                for pattern, name in common_patterns:
-                    match = re.search(pattern, text)
-                    if match:
-                        link = match.group(1).replace('\\u002F', '/')
-                        if link.startswith('http') or link.startswith('//'):
-                            print(f"Found {name} pattern link: {link}")
-                            return link
-                
-                # Step 4: Check if response is HTML/redirect (invalid!)
-                # If it's HTML or redirect page, this provider failed - return None to try next provider
-                if '<html' in text.lower() or 'redirecting' in text.lower() or '<script' in text.lower():
-                    print(f"⚠ Response is HTML/redirect page, not a valid stream URL!")
-                    print(f"⚠ This provider is blocked or requires JavaScript. Skipping...")
-                    return None
-                
-                # Step 5: Last resort - if it looks like a valid URL, return for yt-dlp
-                # Only return if it's an actual media URL (not HTML page)
-                if full_url.startswith('http') and not any(ext in full_url.lower() for ext in ['.html', '.php?', '.asp']):
-                    print(f"Returning raw URL for yt-dlp to attempt: {full_url}")
-                    return full_url
-                
-                print(f"❌ No valid video link found from this provider.")
-                return None
-
-            # The response JSON structure varies.
-            # Ideally we look for "links" -> [ { "link": "...", "resolutionStr": "..." } ]
-            
-            if "links" in data:
-                # Setup logic to pick best quality or return all?
-                # For now let's return the first link or HLS
-                # HLS is usually better for streaming
-                
-                # Check for HLS first
-                for link in data["links"]:
-                    if "hls" in link and link["hls"]:
-                         return link["link"] # This is usually the m3u8
-                
-                # Fallback to mp4
-                if len(data["links"]) > 0:
-                    return data["links"][0]["link"]
-            
+            return extract_candidates(response.text, full_url)
+        except Exception as e:
+            print(f"Error fetching stream link: {e}")
+            return []
+
+    def get_stream_link(self, source_embed: Dict) -> Optional[str]:
+        """
+        Given a source embed object (from get_episode_embeds), returns the final stream URL (m3u8/mp4).
+        """
+        candidates = self.get_stream_candidates(source_embed)
+        return candidates[0].url if candidates else None
+
+    def get_variants(self, candidate: StreamCandidate) -> List[HlsVariant]:
+        """
+        Fetches the master playlist behind an HLS candidate and lists its variants,
+        best first. Empty if it isn't a master playlist.
+        """
+        cached = self._cached_variants(candidate.url)
+        if cached is not None:
+            return cached
+        return self.inflight.do(("variants", candidate.url), self._fetch_variants, candidate)
+
+    def _fetch_variants(self, candidate: StreamCandidate) -> List[HlsVariant]:
+        try:
+            response = self.session.get(candidate.url, headers=self._playlist_headers(candidate))
+            response.raise_for_status()
+            text = response.text
+        except Exception as e:
+            print(f"Error fetching master playlist: {e}")
+            return []
+
+        variants = parse_master_playlist(text, candidate.url) if is_master_playlist(text) else []
+        self._remember_variants(candidate.url, variants)
+        return variants
+
+    def choose_stream(self, candidates: List[StreamCandidate], quality: str = "auto",
+                      throughput: Optional[float] = None) -> Optional[StreamCandidate]:
+        """
+        Picks the stream to play from `resolve_candidates` output.
+        Equivalent to `select_quality` in ani-cli, with "auto" also respecting
+        the measured throughput.
+        """
+        if not candidates:
             return None
+        if throughput is None:
+            throughput = throughput_estimator.estimate()
+
+        primary = candidates[0]
+        if self._wants_variants(primary):
+            variants = self.get_variants(primary)
+            if variants:
+                variant = select_variant(variants, quality, throughput)
+                print(f"🎚️ Picked {variant.resolution or '?'} @ {variant.bandwidth // 1000} kbps (quality: {quality})")
+                return self._variant_stream(primary, variant)
+            return primary
+        return self._pick_candidate(candidates, quality, throughput)
+
+    def _timed_candidates(self, embed: Dict) -> List[StreamCandidate]:
+        started = time.monotonic()
+        candidates = self.get_stream_candidates(embed)
+        self._record_attempt(embed, bool(candidates), started)
+        return candidates
+
+    def resolve_stream(self, embeds: List[Dict], grace_period: Optional[float] = None,
+                       show_id: Optional[str] = None) -> Optional[str]:
+        """Resolves all embeds concurrently and returns the best stream URL."""
+        candidates = self.resolve_candidates(embeds, grace_period, show_id)
+        return candidates[0].url if candidates else None
+
+    def resolve_candidates(self, embeds: List[Dict], grace_period: Optional[float] = None,
+                           show_id: Optional[str] = None) -> List[StreamCandidate]:
+        """
+        Resolves all embeds concurrently and returns the streams of the best provider.
+        Equivalent to the `generate_link ... &` + `wait` loop in `get_episode_url`.
+
+        Embeds are ranked by provider health (see `ProviderHealth.order`), with
+        the provider that last worked for `show_id` first. The first working
+        provider wins unless a better ranked one is still running, in which case
+        we wait up to `grace_period` seconds for it. Everything else is cancelled.
+        A second call for the same embeds while one is running just waits for it.
+        """
+        if not embeds:
+            return []
+        return self.inflight.do(self._resolve_flight_key(embeds, show_id),
+                                self._resolve_candidates, embeds, grace_period, show_id)
+
+    def _resolve_candidates(self, embeds: List[Dict], grace_period: Optional[float],
+                            show_id: Optional[str]) -> List[StreamCandidate]:
+        if grace_period is None:
+            grace_period = self.RESOLVE_GRACE_PERIOD
+
+        ranked = self._rank_embeds(embeds, show_id)
+        executor = ThreadPoolExecutor(max_workers=len(ranked), thread_name_prefix="resolve")
+        futures = {executor.submit(self._timed_candidates, embed): rank for rank, embed in enumerate(ranked)}
+        pending = set(futures)
+        results = {}  # rank -> stream candidates
+        deadline = None
+
+        try:
+            while pending:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    rank = futures[future]
+                    provider_name = ranked[rank].get("sourceName", f"Provider {rank + 1}")
+                    try:
+                        candidates = future.result()
+                    except Exception as e:
+                        print(f"✗ Provider '{provider_name}' raised: {e}")
+                        candidates = []
+                    if candidates:
+                        print(f"✓ Provider '{provider_name}' returned: {candidates[0].url}")
+                        results[rank] = candidates
+                    else:
+                        print(f"✗ Provider '{provider_name}' failed")
+
+                if not results:
+                    continue
+
+                # Nothing better ranked is still running, no point in waiting
+                best_rank = min(results)
+                if all(futures[f] > best_rank for f in pending):
+                    break
+                if deadline is None:
+                    deadline = time.monotonic() + grace_period
+                elif time.monotonic() >= deadline:
+                    break
+        finally:
+            # Drop providers that are still in flight, we don't need them anymore
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if not results:
+            return []
+        self._record_winner(show_id, ranked[min(results)])
+        return results[min(results)]
+
+
+class AsyncAniScraper(ScraperBase):
+    """
+    asyncio-native scraper. Meant to be awaited from Flet handlers
+    (`page.run_task`) so a click doesn't need its own thread.
+
+    All calls share one keep-alive connection pool, which is bound to the
+    event loop that first uses it.
+    """
+    MAX_KEEPALIVE = 10
+    KEEPALIVE_EXPIRY = 30.0
+
+    def __init__(self, timeout: Optional[float] = None, cache: Optional[ResponseCache] = response_cache,
+                 health: Optional[ProviderHealth] = provider_health,
+                 transport: HttpTransport = http_transport):
+        # Pool size, timeouts and retries come from the same "network" settings as AniScraper.
+        # Default per-call timeout (seconds), override with `timeout=` on any call
+        self.timeout = timeout or transport.read_timeout
+        self.connect_timeout = transport.connect_timeout
+        self.max_connections = transport.pool_size
+        self.retries = transport.retries
+        self.cache = cache
+        self.health = health
+        self._client: Optional[httpx.AsyncClient] = None
+        self._revalidating: Dict[str, asyncio.Task] = {}
+        self._variants_cache = {}
+        self.inflight = AsyncSingleFlight()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers=self.default_headers,
+                # httpx only retries failed connects, which is the safe part anyway
+                transport=httpx.AsyncHTTPTransport(retries=self.retries, limits=self._limits()),
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                follow_redirects=True
+            )
+        return self._client
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=min(self.MAX_KEEPALIVE, self.max_connections),
+            keepalive_expiry=self.KEEPALIVE_EXPIRY
+        )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def _call_timeout(self, timeout: Optional[float]):
+        return httpx.USE_CLIENT_DEFAULT if timeout is None else timeout
+
+    async def _fetch_api(self, gql: str, variables: Dict, timeout: Optional[float] = None) -> Dict:
+        return await self.inflight.do(self._api_flight_key(gql, variables),
+                                      lambda: self._get_api(gql, variables, timeout))
+
+    async def _get_api(self, gql: str, variables: Dict, timeout: Optional[float] = None) -> Dict:
+        response = await self.client.get(
+            self.API_URL,
+            params=self._api_params(gql, variables),
+            timeout=self._call_timeout(timeout)
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def _query_api(self, gql: str, variables: Dict, kind: str, timeout: Optional[float] = None) -> Dict:
+        """Cached GraphQL GET. Stale entries are returned at once and refreshed in the background."""
+        key, data, fresh = self._cache_lookup(gql, variables)
+        if data is not None:
+            if not fresh and key not in self._revalidating:
+                self._revalidating[key] = asyncio.ensure_future(self._revalidate(key, kind, gql, variables))
+            return data
 
+        data = await self._fetch_api(gql, variables, timeout)
+        self._cache_store(key, kind, data)
+        return data
+
+    async def _revalidate(self, key: str, kind: str, gql: str, variables: Dict):
+        try:
+            self._cache_store(key, kind, await self._fetch_api(gql, variables))
+        except Exception as e:
+            print(f"Background refresh failed: {e}")
+        finally:
+            self._revalidating.pop(key, None)
+
+    async def search_anime(self, query: str, mode: str = "sub", timeout: Optional[float] = None,
+                           limit: int = 40, page: int = 1) -> List[Dict]:
+        """Async version of `AniScraper.search_anime`."""
+        try:
+            data = await self._query_api(self.SEARCH_GQL, self._search_variables(query, mode, limit, page), "search", timeout)
+            return self._parse_search(data, mode)
+        except Exception as e:
+            print(f"Error searching anime: {e}")
+            return []
+
+    async def search_pages(self, query: str, mode: str = "sub", page_size: Optional[int] = None,
+                           max_pages: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """Async version of `AniScraper.iter_search`."""
+        page_size = page_size or self.SEARCH_PAGE_SIZE
+        page = 1
+        while max_pages is None or page <= max_pages:
+            results = await self.search_anime(query, mode, limit=page_size, page=page)
+            if not results:
+                return
+            yield results
+            if len(results) < page_size:
+                return
+            page += 1
+
+    async def get_episodes_list(self, show_id: str, mode: str = "sub", timeout: Optional[float] = None) -> List[str]:
+        """Async version of `AniScraper.get_episodes_list`."""
+        try:
+            data = await self._query_api(self.EPISODES_LIST_GQL, {"showId": show_id}, "episodes", timeout)
+            return self._parse_episodes_list(data, mode)
+        except Exception as e:
+            print(f"Error getting episodes list: {e}")
+            return []
+
+    async def get_episode_embeds(self, show_id: str, episode_string: str, mode: str = "sub", timeout: Optional[float] = None) -> List[Dict]:
+        """Async version of `AniScraper.get_episode_embeds`."""
+        try:
+            data = await self._query_api(self.EPISODE_EMBED_GQL, self._embed_variables(show_id, episode_string, mode), "embeds", timeout)
+            return self._parse_episode_embeds(data)
+        except Exception as e:
+            print(f"Error getting episode embeds: {e}")
+            return []
+
+    async def get_episode_embeds_batch(self, show_id: str, episodes: List[str], mode: str = "sub",
+                                       chunk_size: Optional[int] = None) -> Dict[str, List[Dict]]:
+        """Async version of `AniScraper.get_episode_embeds_batch`, chunks are fetched concurrently."""
+        results = {}
+        missing = []
+        for episode_string in episodes:
+            cached = self._cached_embeds(show_id, episode_string, mode)
+            if cached is not None:
+                results[episode_string] = cached
+            else:
+                missing.append(episode_string)
+
+        parts = await asyncio.gather(*(
+            self._fetch_embed_chunk(show_id, chunk, mode) for chunk in self._chunks(missing, chunk_size)
+        ))
+        for part in parts:
+            results.update(part)
+
+        return {episode_string: results.get(episode_string, []) for episode_string in episodes}
+
+    async def _fetch_embed_chunk(self, show_id: str, chunk: List[str], mode: str) -> Dict[str, List[Dict]]:
+        gql, variables = self._batch_embed_query(show_id, chunk, mode)
+        try:
+            data = await self._fetch_api(gql, variables)
+            results, failed = self._parse_batch_embeds(show_id, chunk, mode, data)
+        except Exception as e:
+            print(f"Batched embed lookup failed ({e}), falling back to per-episode requests")
+            results, failed = {}, chunk
+
+        for episode_string in failed:
+            results[episode_string] = await self.get_episode_embeds(show_id, episode_string, mode)
+        return results
+
+    async def get_stream_candidates(self, source_embed: Dict, timeout: Optional[float] = None) -> List[StreamCandidate]:
+        """Async version of `AniScraper.get_stream_candidates`."""
+        full_url = self._embed_url(source_embed)
+        if not full_url:
+            return []
+
+        direct = self._direct_candidates(full_url)
+        if direct:
+            return direct
+
+        return await self.inflight.do(("stream", full_url), lambda: self._fetch_candidates(full_url, timeout))
+
+    async def _fetch_candidates(self, full_url: str, timeout: Optional[float] = None) -> List[StreamCandidate]:
+        print(f"Fetching stream details from: {full_url}")
+
+        try:
+            response = await self.client.get(full_url, timeout=self._call_timeout(timeout))
+            response.raise_for_status()
+            return extract_candidates(response.text, full_url)
         except Exception as e:
             print(f"Error fetching stream link: {e}")
+            return []
+
+    async def get_stream_link(self, source_embed: Dict, timeout: Optional[float] = None) -> Optional[str]:
+        """Async version of `AniScraper.get_stream_link`."""
+        candidates = await self.get_stream_candidates(source_embed, timeout)
+        return candidates[0].url if candidates else None
+
+    async def get_variants(self, candidate: StreamCandidate, timeout: Optional[float] = None) -> List[HlsVariant]:
+        """Async version of `AniScraper.get_variants`."""
+        cached = self._cached_variants(candidate.url)
+        if cached is not None:
+            return cached
+        return await self.inflight.do(("variants", candidate.url), lambda: self._fetch_variants(candidate, timeout))
+
+    async def _fetch_variants(self, candidate: StreamCandidate, timeout: Optional[float] = None) -> List[HlsVariant]:
+        try:
+            response = await self.client.get(
+                candidate.url,
+                headers=self._playlist_headers(candidate),
+                timeout=self._call_timeout(timeout)
+            )
+            response.raise_for_status()
+            text = response.text
+        except Exception as e:
+            print(f"Error fetching master playlist: {e}")
+            return []
+
+        variants = parse_master_playlist(text, candidate.url) if is_master_playlist(text) else []
+        self._remember_variants(candidate.url, variants)
+        return variants
+
+    async def choose_stream(self, candidates: List[StreamCandidate], quality: str = "auto",
+                            throughput: Optional[float] = None) -> Optional[StreamCandidate]:
+        """Async version of `AniScraper.choose_stream`."""
+        if not candidates:
             return None
+        if throughput is None:
+            throughput = throughput_estimator.estimate()
+
+        primary = candidates[0]
+        if self._wants_variants(primary):
+            variants = await self.get_variants(primary)
+            if variants:
+                return self._variant_stream(primary, select_variant(variants, quality, throughput))
+            return primary
+        return self._pick_candidate(candidates, quality, throughput)
+
+    async def _timed_candidates(self, embed: Dict) -> List[StreamCandidate]:
+        started = time.monotonic()
+        candidates = await self.get_stream_candidates(embed)
+        self._record_attempt(embed, bool(candidates), started)
+        return candidates
+
+    async def resolve_stream(self, embeds: List[Dict], grace_period: Optional[float] = None,
+                             show_id: Optional[str] = None) -> Optional[str]:
+        """Async version of `AniScraper.resolve_stream`."""
+        candidates = await self.resolve_candidates(embeds, grace_period, show_id)
+        return candidates[0].url if candidates else None
+
+    async def resolve_candidates(self, embeds: List[Dict], grace_period: Optional[float] = None,
+                                 show_id: Optional[str] = None) -> List[StreamCandidate]:
+        """
+        Async version of `AniScraper.resolve_candidates`. Losing providers are
+        cancelled for real here, their connections go straight back to the pool.
+        """
+        if not embeds:
+            return []
+        return await self.inflight.do(self._resolve_flight_key(embeds, show_id),
+                                      lambda: self._resolve_candidates(embeds, grace_period, show_id))
+
+    async def _resolve_candidates(self, embeds: List[Dict], grace_period: Optional[float],
+                                  show_id: Optional[str]) -> List[StreamCandidate]:
+        if grace_period is None:
+            grace_period = self.RESOLVE_GRACE_PERIOD
+
+        ranked = self._rank_embeds(embeds, show_id)
+        tasks = {asyncio.ensure_future(self._timed_candidates(embed)): rank for rank, embed in enumerate(ranked)}
+        pending = set(tasks)
+        results = {}  # rank -> stream candidates
+        loop = asyncio.get_running_loop()
+        deadline = None
+
+        try:
+            while pending:
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    rank = tasks[task]
+                    provider_name = ranked[rank].get("sourceName", f"Provider {rank + 1}")
+                    candidates = [] if task.exception() else task.result()
+                    if candidates:
+                        print(f"✓ Provider '{provider_name}' returned: {candidates[0].url}")
+                        results[rank] = candidates
+                    else:
+                        print(f"✗ Provider '{provider_name}' failed")
+
+                if not results:
+                    continue
+
+                best_rank = min(results)
+                if all(tasks[t] > best_rank for t in pending):
+                    break
+                if deadline is None:
+                    deadline = loop.time() + grace_period
+                elif loop.time() >= deadline:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if not results:
+            return []
+        self._record_winner(show_id, ranked[min(results)])
+        return results[min(results)]
+
+# Process-wide instances, so identical requests from different views get coalesced
+scraper = AniScraper()
+async_scraper = AsyncAniScraper()
 
 if __name__ == "__main__":
     # Simple test
@@ -341,17 +918,17 @@ if __name__ == "__main__":
         print(f"Found {len(results)} results")
         first = results[0]
         print(f"First result: {first['title']} ({first['id']})")
-        
+
         print("Getting episodes...")
         eps = scraper.get_episodes_list(first['id'])
         print(f"Found {len(eps)} episodes. First 5: {eps[:5]}")
-        
+
         if eps:
             ep_no = eps[0]
             print(f"Getting embeds for Episode {ep_no}...")
             embeds = scraper.get_episode_embeds(first['id'], ep_no)
             if embeds:
                 print(f"Found {len(embeds)} embeds.")
-                # Try to get stream for first embed
-                stream_url = scraper.get_stream_link(embeds[0])
+                # Race all embeds like ani-cli does
+                stream_url = scraper.resolve_stream(embeds)
                 print(f"Stream URL: {stream_url}")
@@ -0,0 +1,309 @@
+"""
+Multi-connection HTTP downloader for when aria2c isn't around.
+
+The file is probed for Range support, preallocated and then fetched as small
+byte-range segments by a pool of connections, each written straight to its
+offset. The number of connections starts low and grows while the measured
+throughput keeps improving (a simple hill climb), up to `max_connections`.
+Servers without Range support, or without a length, are streamed to disk over
+a single connection.
+
+`resume_state()` describes what is already on disk; passing it back as
+`resume=` continues an interrupted download instead of starting over.
+"""
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class _Writer:
+    """Positional writes on a shared file; os.pwrite where available, seek+write elsewhere."""
+
+    def __init__(self, path: str):
+        self.fd = os.open(path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+        self.lock = None if hasattr(os, "pwrite") else threading.Lock()
+
+    def write_at(self, data: bytes, offset: int):
+        view = memoryview(data)
+        while view:
+            if self.lock is None:
+                written = os.pwrite(self.fd, view, offset)
+            else:
+                with self.lock:
+                    os.lseek(self.fd, offset, os.SEEK_SET)
+                    written = os.write(self.fd, view)
+            view = view[written:]
+            offset += written
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SegmentedDownloader:
+    SEGMENT_SIZE = 2 * 1024 * 1024
+    CHUNK_SIZE = 64 * 1024
+    INITIAL_CONNECTIONS = 2
+    MAX_CONNECTIONS = 8
+    # Don't bother splitting files smaller than this
+    MIN_SPLIT_SIZE = 4 * 1024 * 1024
+    # Re-evaluate the connection count this often (seconds)
+    TUNE_INTERVAL = 1.5
+    # Add a connection only while the last one improved throughput by this much
+    MIN_GAIN = 0.10
+    SEGMENT_RETRIES = 3
+
+    def __init__(self, session: requests.Session, url: str, path: str,
+                 headers: Optional[Dict[str, str]] = None, timeout=None,
+                 max_connections: int = MAX_CONNECTIONS,
+                 on_progress: Optional[Callable[[int, int, float], None]] = None,
+                 should_cancel: Optional[Callable[[], bool]] = None,
+                 resume: Optional[Dict] = None,
+                 throttle: Optional[Callable[[int], None]] = None):
+        self.session = session
+        self.url = url
+        self.path = path
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.max_connections = max(1, max_connections)
+        self.on_progress = on_progress
+        self.should_cancel = should_cancel or (lambda: False)
+        self.resume = resume or {}
+        # Shared bandwidth limit, called with the size of every chunk read
+        self.throttle = throttle or (lambda num_bytes: None)
+
+        self.total = 0
+        self.ranged = False
+        self.done_segments = set()  # start offsets of segments fully on disk
+        self.downloaded = 0
+        self.resumed = 0  # bytes that were already there when we started
+        self.connections = 0
+        self.started = 0.0
+        self.lock = threading.Lock()
+        # (segment start, first missing byte, segment end, attempts)
+        self.segments: "queue.Queue[Tuple[int, int, int, int]]" = queue.Queue()
+
+    def run(self) -> int:
+        """Downloads to `path` and returns the number of bytes transferred by this run."""
+        self.started = time.monotonic()
+
+        response = self._resume_stream()
+        if response is None:
+            total, response = self._probe()
+        if response is not None:
+            with response:
+                self._stream(response)
+            return self.downloaded - self.resumed
+
+        self.total = total
+        self.ranged = True
+        self.done_segments = self._resumable_segments(total)
+        if not self.done_segments:
+            self._preallocate(total)
+        for start in range(0, total, self.SEGMENT_SIZE):
+            end = min(start + self.SEGMENT_SIZE, total) - 1
+            if start in self.done_segments:
+                self.downloaded += end + 1 - start
+            else:
+                self.segments.put((start, start, end, 0))
+        self.resumed = self.downloaded
+        if self.resumed:
+            print(f"⏯️ Resuming at {self.resumed / 1024 / 1024:.1f} MB of {total / 1024 / 1024:.1f} MB")
+        self._download_segments()
+        return self.downloaded - self.resumed
+
+    def resume_state(self) -> Dict:
+        """JSON-friendly description of the progress on disk, for `resume=`."""
+        with self.lock:
+            return {
+                "ranged": self.ranged,
+                "total": self.total,
+                "segment_size": self.SEGMENT_SIZE,
+                "done": sorted(self.done_segments),
+            }
+
+    # --- resuming ---
+
+    def _resumable_segments(self, total: int) -> set:
+        """Segments a previous run finished, if its file still matches this one."""
+        state = self.resume
+        if (not state.get("ranged") or state.get("total") != total
+                or state.get("segment_size") != self.SEGMENT_SIZE):
+            return set()
+        try:
+            if os.path.getsize(self.path) != total:
+                return set()
+        except OSError:
+            return set()
+        return {start for start in state.get("done", []) if 0 <= start < total}
+
+    def _resume_stream(self) -> Optional[requests.Response]:
+        """For single-connection downloads, asks for whatever is missing after the existing bytes."""
+        if self.resume.get("ranged") or not os.path.exists(self.path):
+            return None
+        offset = os.path.getsize(self.path)
+        if not offset:
+            return None
+        response = self.session.get(self.url, headers=dict(self.headers, Range=f"bytes={offset}-"),
+                                    stream=True, timeout=self.timeout)
+        if response.status_code == 206 and response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+            print(f"⏯️ Resuming at {offset / 1024 / 1024:.1f} MB")
+            self.downloaded = self.resumed = offset
+            return response
+        # Can't continue (no Range support, or the file changed): start over
+        response.close()
+        return None
+
+    # --- probing ---
+
+    def _probe(self) -> Tuple[int, Optional[requests.Response]]:
+        """
+        Returns `(size, None)` if the server serves byte ranges of a known-size
+        file, else `(0, response)` with a response to stream the whole body from.
+        """
+        response = self.session.get(self.url, headers=dict(self.headers, Range="bytes=0-0"),
+                                    stream=True, timeout=self.timeout)
+        response.raise_for_status()
+        if response.status_code == 206:
+            match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+            response.close()
+            if match and int(match.group(1)) >= self.MIN_SPLIT_SIZE:
+                return int(match.group(1)), None
+            # Small or unknown size: one plain request will do
+            response = self.session.get(self.url, headers=self.headers, stream=True, timeout=self.timeout)
+            response.raise_for_status()
+        # 200: Range was ignored, the body is the whole file
+        return 0, response
+
+    def _preallocate(self, size: int):
+        with open(self.path, "wb") as f:
+            f.truncate(size)
+
+    # --- single connection ---
+
+    def _stream(self, response: requests.Response):
+        """Streams the body to disk (appending after resumed bytes), with or without a known length."""
+        length = int(response.headers.get("content-length") or 0)
+        self.total = self.resumed + length if length else 0
+        self.connections = 1
+        with open(self.path, "ab" if self.resumed else "wb") as f:
+            for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                if self.should_cancel():
+                    raise DownloadCancelled()
+                if chunk:
+                    f.write(chunk)
+                    self._advance(len(chunk))
+                    self.throttle(len(chunk))
+
+    # --- segmented ---
+
+    def _download_segments(self):
+        writer = _Writer(self.path)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="segment")
+        futures = set()
+
+        def add_connection():
+            self.connections += 1
+            futures.add(executor.submit(self._worker, writer, stop))
+
+        try:
+            for _ in range(min(self.INITIAL_CONNECTIONS, self.max_connections)):
+                add_connection()
+
+            best_rate = 0.0
+            growing = True
+            last_bytes, last_time = self.downloaded, time.monotonic()
+
+            while True:
+                done, running = wait(futures, timeout=self.TUNE_INTERVAL, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()  # re-raises a worker's error
+                if not running:
+                    break
+                if self.should_cancel():
+                    raise DownloadCancelled()
+
+                now = time.monotonic()
+                rate = (self.downloaded - last_bytes) / max(now - last_time, 1e-6)
+                last_bytes, last_time = self.downloaded, now
+
+                if growing and self.connections < self.max_connections and self.segments.qsize() > self.connections:
+                    if rate > best_rate * (1 + self.MIN_GAIN):
+                        best_rate = rate
+                        add_connection()
+                    else:
+                        # The link is saturated, more connections would just compete
+                        growing = False
+                        print(f"⚙️ Settled on {self.connections} connections ({rate / 1024 / 1024:.2f} MB/s)")
+        finally:
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            writer.close()
+
+    def _worker(self, writer: _Writer, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                segment, start, end, attempts = self.segments.get_nowait()
+            except queue.Empty:
+                return
+            position = [start]
+            try:
+                self._fetch_segment(writer, position, end, stop)
+                with self.lock:
+                    self.done_segments.add(segment)
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                if attempts + 1 >= self.SEGMENT_RETRIES:
+                    raise Exception(f"Segment {start}-{end} failed: {e}")
+                print(f"⚠️ Segment {start}-{end} failed ({e}), retrying")
+                time.sleep(0.5 * (attempts + 1))
+                # Only what's still missing goes back in the queue
+                self.segments.put((segment, position[0], end, attempts + 1))
+
+    def _fetch_segment(self, writer: _Writer, position: list, end: int, stop: threading.Event):
+        """Fetches bytes position[0]..end, keeping position[0] at the first byte not yet written."""
+        offset = position[0]
+        headers = dict(self.headers, Range=f"bytes={offset}-{end}")
+        with self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise Exception("Server stopped honouring Range requests")
+            for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                if stop.is_set() or self.should_cancel():
+                    raise DownloadCancelled()
+                if not chunk:
+                    continue
+                chunk = chunk[:end + 1 - offset]
+                writer.write_at(chunk, offset)
+                offset += len(chunk)
+                position[0] = offset
+                self._advance(len(chunk))
+                self.throttle(len(chunk))
+                if offset > end:
+                    break
+        if offset <= end:
+            raise Exception(f"Connection closed early at byte {offset}")
+
+    # --- progress ---
+
+    def _advance(self, num_bytes: int):
+        with self.lock:
+            self.downloaded += num_bytes
+            downloaded = self.downloaded
+        if self.on_progress:
+            elapsed = time.monotonic() - self.started
+            transferred = downloaded - self.resumed
+            self.on_progress(downloaded, self.total, transferred / elapsed if elapsed > 0 else 0.0)
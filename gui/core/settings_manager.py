@@ -2,6 +2,8 @@ import json
 import os
 from pathlib import Path
 
+from .persistence import DebouncedWriter
+
 class SettingsManager:
     def __init__(self):
         # Settings file location
@@ -12,10 +14,15 @@ class SettingsManager:
         self.defaults = {
             "playback": {
                 "default_mode": "sub",
-                "default_player": "mpv"
+                "default_player": "mpv",
+                "quality": "auto"
             },
             "downloads": {
-                "location": str(Path.home() / "ani-cli-downloads")
+                "location": str(Path.home() / "ani-cli-downloads"),
+                "max_concurrent": 3,
+                "max_per_host": 2,
+                # SHA-256 every finished download (compared when a checksum is known)
+                "verify_checksum": False
             },
             "discord_rpc": {
                 "enabled": True,
@@ -24,9 +31,29 @@ class SettingsManager:
             },
             "appearance": {
                 "theme": "standard"
+            },
+            "history": {
+                # Two-way sync with the shell ani-cli's ani-hsts file
+                "sync_ani_cli": True
+            },
+            "bandwidth": {
+                "limit_kbps": 0,
+                "playback_limit_kbps": 0,
+                "schedule": []
+            },
+            "network": {
+                "connect_timeout": 5.0,
+                "read_timeout": 15.0,
+                "download_read_timeout": 30.0,
+                "pool_size": 10,
+                "retries": 3,
+                "api_read_retries": 0,
+                "backoff": 0.5
             }
         }
         
+        # Bursts of saves (theme dropdown, then the settings dialog) become one atomic write
+        self.writer = DebouncedWriter(self.settings_file, lambda: self.settings)
         self.settings = self.load_settings()
     
     def load_settings(self):
@@ -64,23 +91,20 @@ class SettingsManager:
         return merged
     
     def save_settings(self, settings=None):
-        """Save settings to JSON file"""
-        try:
-            print(f"🆔 SettingsManager.save_settings instance ID: {id(self)}")
-            if settings:
-                self.settings = settings
-            
-            print(f"💾 Saving settings to: {self.settings_file}")
-            print(f"📦 Content to save: {self.settings}")
-            
-            self.settings_dir.mkdir(parents=True, exist_ok=True)
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.settings, f, indent=2)
-            print("✅ Settings saved")
-            return True
-        except Exception as e:
-            print(f"⚠️ Error saving settings: {e}")
-            return False
+        """Save settings to JSON file (written in the background, see DebouncedWriter)"""
+        if settings:
+            self.settings = settings
+        print(f"💾 Saving settings to: {self.settings_file}")
+        self.writer.schedule()
+        return True
+
+    def flush(self):
+        """Write pending settings to disk right away; False if that failed (see `save_error`)"""
+        return self.writer.flush()
+
+    @property
+    def save_error(self):
+        return self.writer.error
     
     def get(self, category, key):
         """Get a specific setting value"""
@@ -0,0 +1,104 @@
+"""
+Decoder for the obfuscated `sourceUrl` values returned by the allanime API.
+
+Ported from `provider_init` in ani-cli. The sed script there splits the string
+into 2-char chunks and swaps each known chunk for a character. Every known
+chunk is simply a hex byte XOR 0x38, so instead of mapping chunk by chunk we
+turn the whole string into bytes once and run it through a translation table.
+Anything the sed script would leave alone (unknown chunks, upper case hex, odd
+length) goes through the chunk-wise path, so output is identical either way.
+"""
+import re
+from typing import Dict, List, Optional
+
+# Hex chunk -> char, exactly the substitutions made by ani-cli
+SOURCE_MAP: Dict[str, str] = {
+    "01": "9", "00": "8", "0f": "7", "0e": "6", "0d": "5", "0c": "4",
+    "0b": "3", "0a": "2", "09": "1", "08": "0", "42": "z", "41": "y",
+    "40": "x", "4f": "w", "4e": "v", "4d": "u", "4c": "t", "4b": "s",
+    "4a": "r", "49": "q", "48": "p", "57": "o", "56": "n", "55": "m",
+    "54": "l", "53": "k", "52": "j", "51": "i", "50": "h", "5f": "g",
+    "5e": "f", "5d": "e", "5c": "d", "5b": "c", "5a": "b", "59": "a",
+    "62": "Z", "61": "Y", "60": "X", "6f": "W", "6e": "V", "6d": "U",
+    "6c": "T", "6b": "S", "6a": "R", "69": "Q", "68": "P", "77": "O",
+    "76": "N", "75": "M", "74": "L", "73": "K", "72": "J", "71": "I",
+    "70": "H", "7f": "G", "7e": "F", "7d": "E", "7c": "D", "7b": "C",
+    "7a": "B", "79": "A",
+
+    # Symbols
+    "15": "-", "16": ".", "67": "_", "46": "~", "02": ":", "17": "/",
+    "07": "?", "1b": "#", "63": "[", "65": "]", "78": "@", "19": "!",
+    "1c": "$", "1e": "&", "10": "(", "11": ")", "12": "*", "13": "+",
+    "14": ",", "03": ";", "05": "=", "1d": "%",
+}
+
+# Raw bytes that have a substitution, and the 256-entry table applying it
+_KNOWN_BYTES = bytes(int(chunk, 16) for chunk in SOURCE_MAP)
+_TABLE = bytes.maketrans(_KNOWN_BYTES, "".join(SOURCE_MAP.values()).encode("ascii"))
+
+# Only lower case hex pairs are eligible for the bulk path (bytes.fromhex
+# would also accept upper case and whitespace, which the sed script keeps)
+_HEX_PAIRS = re.compile(r"(?:[0-9a-f]{2})*")
+
+
+def _strip_prefix(url: str) -> str:
+    # Remove "--" prefix if present (implied by regex in ani-cli)
+    return url[2:] if url.startswith("--") else url
+
+
+def _fast_bytes(body: str) -> Optional[bytes]:
+    """Raw bytes of `body` if every chunk has a substitution, else None."""
+    if not _HEX_PAIRS.fullmatch(body):
+        return None
+    raw = bytes.fromhex(body)
+    if raw.translate(None, _KNOWN_BYTES):
+        return None
+    return raw
+
+
+def _decode_chunks(body: str) -> str:
+    # Same as the sed script: map known chunks, keep anything else as is
+    get = SOURCE_MAP.get
+    return "".join([get(body[i:i + 2], body[i:i + 2]) for i in range(0, len(body), 2)])
+
+
+def _finish(decoded: str) -> str:
+    # Replace /clock with /clock.json
+    return decoded.replace("/clock", "/clock.json")
+
+
+def decode_source(url: str) -> str:
+    """Decodes a single `sourceUrl`."""
+    body = _strip_prefix(url)
+    raw = _fast_bytes(body)
+    if raw is None:
+        return _finish(_decode_chunks(body))
+    return _finish(raw.translate(_TABLE).decode("ascii"))
+
+
+def decode_many(urls: List[str]) -> List[str]:
+    """
+    Decodes a batch of `sourceUrl`s. All eligible strings are joined and
+    decoded with a single hex conversion and translate call, then sliced back.
+    """
+    bodies = [_strip_prefix(url) for url in urls]
+    results: List[Optional[str]] = [None] * len(bodies)
+
+    # Optimistically treat everything as eligible and validate the joined string once
+    bulk = [i for i, body in enumerate(bodies) if not len(body) % 2]
+    joined = "".join([bodies[i] for i in bulk])
+    raw = bytes.fromhex(joined) if _HEX_PAIRS.fullmatch(joined) else None
+    if raw is None or raw.translate(None, _KNOWN_BYTES):
+        # Some entry isn't plain known hex, sort them out one by one
+        bulk = [i for i in bulk if _fast_bytes(bodies[i]) is not None]
+        raw = bytes.fromhex("".join([bodies[i] for i in bulk]))
+
+    decoded = raw.translate(_TABLE).decode("ascii")
+    offset = 0
+    for i in bulk:
+        size = len(bodies[i]) // 2
+        results[i] = _finish(decoded[offset:offset + size])
+        offset += size
+
+    return [result if result is not None else _finish(_decode_chunks(bodies[i]))
+            for i, result in enumerate(results)]
@@ -0,0 +1,147 @@
+"""
+Single-pass extraction of stream links from provider responses.
+
+Providers answer with JSON (`{"links": [...]}`), JSON-ish fragments or a
+player page. Instead of trying json.loads and then a pile of regexes, one
+precompiled scanner walks the body once and collects every link it can find,
+split on `},{` object boundaries like the `sed 's|},{|\n|g'` in ani-cli.
+"""
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+@dataclass
+class StreamCandidate:
+    url: str
+    resolution: Optional[str] = None  # as reported, e.g. "1080p", "Mp4", "Hls"
+    hls: bool = False
+    hardsub_lang: Optional[str] = None
+    referer: Optional[str] = None
+
+    @property
+    def height(self) -> Optional[int]:
+        """Numeric resolution (1080 for "1080p"), None if unknown."""
+        if self.resolution:
+            match = re.match(r"(\d{3,4})", self.resolution)
+            if match:
+                return int(match.group(1))
+        return None
+
+
+_TOKEN_RE = re.compile(r'''
+      (?P<sep>\},\{)
+    | "(?P<key>link|url|resolutionStr|hardsub_lang|Referer)"\s*:\s*"(?P<value>(?:[^"\\]|\\.)*)"
+    | "hls"\s*:\s*(?P<hls_flag>true|false)
+    | (?P<hls_type>"hls")
+    | \b(?:file|source|src)\s*:\s*["'](?P<attr_value>[^"']+)["']
+    | (?P<html>(?i:<html|<script|redirecting))
+''', re.X)
+
+# Rank of each kind of match, lower is better
+_RANK_HLS_EN = 0    # hls","url":"...","hardsub_lang":"en-US" (what ani-cli prefers)
+_RANK_HLS = 1       # "link":"...","hls":true
+_RANK_LINK = 2      # "link":"...","resolutionStr":"..."
+_RANK_BARE = 3      # any other "link"
+_RANK_PLAYER = 4    # file: / source: / src: in a player page
+
+
+def _unescape(value: str) -> str:
+    """Decodes the JSON escapes in a captured string body (\\u0026, \\", \\/ ...)"""
+    if "\\" not in value:
+        return value
+    try:
+        return json.loads('"' + value + '"')
+    except ValueError:
+        # Not valid JSON (e.g. a player page), undo the common slash escapes only
+        return value.replace('\\u002F', '/').replace('\\/', '/')
+
+
+def _is_media_url(url: str) -> bool:
+    return url.startswith('http') or url.startswith('//')
+
+
+def extract_candidates(text: str, full_url: str) -> List[StreamCandidate]:
+    """
+    Returns every stream link found in a provider response, best first.
+    An empty list means the provider failed (HTML/redirect page or nothing usable).
+    """
+    ranked = []  # (rank, candidate)
+    record: Dict = {}
+    first_referer = None
+    saw_html = False
+
+    def _candidate(link):
+        return StreamCandidate(
+            url=link,
+            resolution=record.get("resolutionStr"),
+            hls=bool(record.get("hls")),
+            hardsub_lang=record.get("hardsub_lang"),
+            referer=record.get("Referer")
+        )
+
+    def flush():
+        link = record.get("link")
+        url = record.get("url")
+        if link:
+            if record.get("hls"):
+                rank = _RANK_HLS
+            elif record.get("resolutionStr"):
+                rank = _RANK_LINK
+            else:
+                rank = _RANK_BARE
+            if rank != _RANK_BARE or _is_media_url(link):
+                ranked.append((rank, _candidate(link)))
+        elif url and record.get("hls"):
+            rank = _RANK_HLS_EN if record.get("hardsub_lang") == "en-US" else _RANK_HLS
+            ranked.append((rank, _candidate(url)))
+        record.clear()
+
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == "sep":
+            flush()
+        elif kind == "value":
+            key = match.group("key")
+            value = _unescape(match.group("value"))
+            record.setdefault(key, value)
+            if key == "Referer" and first_referer is None:
+                first_referer = value
+        elif kind == "hls_flag":
+            record["hls"] = match.group("hls_flag") == "true"
+        elif kind == "hls_type":
+            record["hls"] = True
+        elif kind == "attr_value":
+            link = _unescape(match.group("attr_value"))
+            if _is_media_url(link):
+                ranked.append((_RANK_PLAYER, StreamCandidate(url=link)))
+        elif kind == "html":
+            saw_html = True
+    flush()
+
+    # Stable sort, so links of the same kind keep the provider's order
+    ranked.sort(key=lambda item: item[0])
+    candidates = [candidate for _, candidate in ranked]
+
+    # Same referer for everything of this provider unless a link brought its own
+    for candidate in candidates:
+        if candidate.referer is None:
+            candidate.referer = first_referer
+
+    if candidates:
+        return candidates
+
+    # Nothing usable. An HTML/redirect page means this provider is blocked or
+    # needs JavaScript, so let the caller try the next one.
+    if saw_html:
+        print(f"⚠ Response is HTML/redirect page, not a valid stream URL!")
+        return []
+
+    # Last resort - if it looks like a valid media URL (and the body wasn't
+    # a proper but empty JSON answer), return it for yt-dlp to attempt
+    looks_like_json = text.lstrip().startswith(("{", "["))
+    if not looks_like_json and full_url.startswith('http') and not any(ext in full_url.lower() for ext in ['.html', '.php?', '.asp']):
+        print(f"Returning raw URL for yt-dlp to attempt: {full_url}")
+        return [StreamCandidate(url=full_url)]
+
+    return []
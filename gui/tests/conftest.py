@@ -0,0 +1,90 @@
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Tests import the app modules the way main.py does (`from core.x import y`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings, journals and history live under ~; keep the real ones out of it
+os.environ["HOME"] = tempfile.mkdtemp(prefix="ani-cli-gui-tests-")
+for name in ("XDG_STATE_HOME", "ANI_CLI_HIST_DIR"):
+    os.environ.pop(name, None)
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split("?")[0]
+        range_header = self.headers.get("Range")
+        server.requests.append((path, range_header))
+        body = server.files.get(path)
+        if body is None:
+            self.send_error(404)
+            return
+        match = re.match(r"bytes=(\d+)-(\d*)", range_header or "")
+        if match and path not in server.no_range:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else len(body) - 1, len(body) - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+            body = body[start:end + 1]
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        delay = server.delays.get(path)
+        if not delay:
+            self.wfile.write(body)
+            return
+        for offset in range(0, len(body), 64 * 1024):
+            try:
+                self.wfile.write(body[offset:offset + 64 * 1024])
+            except OSError:
+                return  # client went away
+            time.sleep(delay)
+
+
+@pytest.fixture
+def media_server():
+    """Local HTTP server with Range support: set `files[path] = bytes`, check `requests`"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MediaHandler)
+    server.daemon_threads = True
+    server.files = {}
+    server.no_range = set()  # paths that ignore Range and always send the whole body
+    server.delays = {}  # path -> seconds to sleep after every 64 KB sent
+    server.requests = []  # (path, Range header)
+    server.url = lambda path: f"http://127.0.0.1:{server.server_address[1]}{path}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def wait_for():
+    def wait(condition, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "timed out"
+            time.sleep(0.02)
+    return wait
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    """Per-test HOME, so download journals and ani-hsts files don't leak between tests"""
+    path = tmp_path / "home"
+    path.mkdir()
+    monkeypatch.setenv("HOME", str(path))
+    return path
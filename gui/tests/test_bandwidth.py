@@ -0,0 +1,36 @@
+from core.bandwidth import BandwidthGovernor
+
+
+def governor(limit_kbps, monkeypatch):
+    monkeypatch.setattr(BandwidthGovernor, "effective_limit_kbps", lambda self, now=None: limit_kbps)
+    return BandwidthGovernor()
+
+
+def test_aria2_share_comes_out_of_the_bucket(monkeypatch):
+    gov = governor(1000, monkeypatch)
+    assert gov.bucket.rate == 1000 * 1024
+
+    reserved = gov.reserve(2 / 3)  # two of three running downloads are in aria2
+    assert reserved + gov.bucket.rate == gov.limit
+    assert reserved == int(gov.limit * 2 / 3)
+
+
+def test_bucket_keeps_a_floor_when_aria2_runs_everything(monkeypatch):
+    gov = governor(1000, monkeypatch)
+    reserved = gov.reserve(1.0)
+    assert gov.bucket.rate == BandwidthGovernor.MIN_BUCKET_RATE
+    assert reserved + gov.bucket.rate == gov.limit
+
+
+def test_limit_changes_keep_the_split(monkeypatch):
+    gov = governor(1000, monkeypatch)
+    gov.reserve(0.5)
+    monkeypatch.setattr(BandwidthGovernor, "effective_limit_kbps", lambda self, now=None: 400)
+    gov.refresh()
+    assert gov.bucket.rate == 200 * 1024
+
+
+def test_unlimited(monkeypatch):
+    gov = governor(0, monkeypatch)
+    assert gov.reserve(0.5) == 0
+    assert gov.bucket.rate == 0
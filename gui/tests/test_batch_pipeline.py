@@ -0,0 +1,89 @@
+import time
+from types import SimpleNamespace
+
+from core.batch_pipeline import BatchDownload, parse_episode_range
+
+
+class FakeScraper:
+    EMBED_BATCH_SIZE = 10
+
+    def get_episode_embeds_batch(self, show_id, episodes, mode="sub"):
+        return {}
+
+    def get_episode_embeds(self, show_id, ep, mode="sub"):
+        return [{"sourceUrl": ep}]
+
+    def resolve_candidates(self, embeds, show_id=None):
+        return embeds
+
+    def choose_stream(self, candidates, quality):
+        return SimpleNamespace(url=f"http://cdn.example/{candidates[0]['sourceUrl']}.mp4", referer=None, hls=False)
+
+
+class FakeDownloads:
+    """Downloads stay pending until the test moves them along"""
+
+    def __init__(self):
+        self.downloads = {}
+        self.cancelled = []
+
+    def limits(self):
+        return 3, 3
+
+    def find_existing(self, title, ep, mode):
+        return None
+
+    def download_episode(self, url, title, ep, **kwargs):
+        self.downloads[ep] = SimpleNamespace(status="pending", error_msg=None)
+        return ep
+
+    def cancel_download(self, download_id):
+        self.cancelled.append(download_id)
+        self.downloads[download_id].status = "cancelled"
+
+
+def start_batch(episodes):
+    downloads = FakeDownloads()
+    batch = BatchDownload("show", "Show", episodes, quality="best",
+                          scraper=FakeScraper(), download_manager=downloads)
+    batch.POLL_INTERVAL = 0.02
+    return batch.start(), downloads
+
+
+def test_parse_episode_range():
+    episodes = [str(i) for i in range(1, 13)] + ["12.5"]
+    assert parse_episode_range("1-3,7", episodes) == ["1", "2", "3", "7"]
+    assert parse_episode_range("11-", episodes) == ["11", "12", "12.5"]
+    assert parse_episode_range("unwatched", ["1", "2", "3"], lambda ep: ep != "2") == ["2"]
+
+
+def test_paused_downloads_settle_the_batch_until_resumed(wait_for):
+    batch, downloads = start_batch(["1", "2"])
+    wait_for(lambda: len(downloads.downloads) == 2)
+    downloads.downloads["1"].status = "completed"
+    downloads.downloads["2"].status = "paused"
+    wait_for(lambda: batch.states["2"] == BatchDownload.PAUSED)
+    assert batch.settled and not batch.finished
+
+    downloads.downloads["2"].status = "downloading"
+    wait_for(lambda: batch.states["2"] == BatchDownload.DOWNLOADING)
+    assert not batch.settled
+    downloads.downloads["2"].status = "completed"
+    wait_for(lambda: batch.finished)
+    assert batch.counts() == {BatchDownload.DONE: 2}
+
+
+def test_cancel_stops_running_and_paused_downloads(wait_for):
+    batch, downloads = start_batch(["1", "2", "3", "4", "5"])
+    wait_for(lambda: len(downloads.downloads) == 3)  # three slots, the rest wait
+    downloads.downloads["1"].status = "paused"
+    wait_for(lambda: batch.states["1"] == BatchDownload.PAUSED)
+    wait_for(lambda: len(downloads.downloads) == 4)  # a paused download frees its slot
+
+    batch.cancel()
+    assert batch.finished
+    assert sorted(downloads.cancelled) == sorted(downloads.downloads)
+    assert set(batch.states.values()) == {BatchDownload.CANCELLED}
+    time.sleep(0.1)
+    assert len(downloads.downloads) == 4
+    assert set(batch.states.values()) == {BatchDownload.CANCELLED}
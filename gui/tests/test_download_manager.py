@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+import time
+
+from core.download_manager import DownloadManager
+
+
+def test_concurrent_requests_for_one_episode_share_a_download(monkeypatch):
+    manager = DownloadManager()
+    monkeypatch.setattr(manager, "_schedule", lambda: None)  # keep everything queued
+    find_existing = manager.find_existing
+
+    def slow_find_existing(*args, **kwargs):
+        time.sleep(0.05)  # widen the window between the duplicate check and the insert
+        return find_existing(*args, **kwargs)
+
+    monkeypatch.setattr(manager, "find_existing", slow_find_existing)
+
+    barrier = threading.Barrier(2)
+    ids = []
+
+    def request():
+        barrier.wait()
+        ids.append(manager.download_episode("http://127.0.0.1:9/ep1.mp4", "Race Show", 1,
+                                            show_id="race", mode="sub"))
+
+    threads = [threading.Thread(target=request) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(ids) == 2 and ids[0] == ids[1]
+    assert len(manager.downloads) == 1
+    assert len(manager._queue) == 1
+
+
+def test_rejected_file_is_not_resumed(media_server, wait_for):
+    good = bytes(range(256)) * 4096  # 1 MB, a single-connection download
+    corrupt = good[:-1] + b"!"
+    media_server.files["/ep.mp4"] = corrupt
+    manager = DownloadManager()
+    manager.has_aria2 = False
+    sha256 = hashlib.sha256(good).hexdigest()
+
+    first = manager.download_episode(media_server.url("/ep.mp4"), "Checksum Show", 1, sha256=sha256)
+    wait_for(lambda: manager.downloads[first].status == "error")
+    item = manager.downloads[first]
+    assert "Checksum mismatch" in item.error_msg
+    assert not os.path.exists(item.part_path)
+
+    # The retry (batch pipeline or a manual click) must fetch the file again, not append to the rejected one
+    media_server.files["/ep.mp4"] = good
+    media_server.requests.clear()
+    second = manager.download_episode(media_server.url("/ep.mp4"), "Checksum Show", 1, sha256=sha256)
+    wait_for(lambda: manager.downloads[second].status in ("completed", "error"))
+    assert manager.downloads[second].status == "completed"
+    with open(manager.downloads[second].path, "rb") as f:
+        assert f.read() == good
+    assert all(not (range_header or "").startswith(f"bytes={len(good)}") for _, range_header in media_server.requests)
+
+
+def test_journal_round_trip(monkeypatch):
+    started = []
+    monkeypatch.setattr(DownloadManager, "_schedule", lambda self: started.append(self))
+    manager = DownloadManager()
+    running = manager.download_episode("http://127.0.0.1:9/1.mp4", "Journal Show", 1, show_id="j", referer="https://ref/")
+    paused = manager.download_episode("http://127.0.0.1:9/2.mp4", "Journal Show", 2, show_id="j", mode="dub")
+    done = manager.download_episode("http://127.0.0.1:9/3.mp4", "Journal Show", 3, show_id="j")
+    resume = {"ranged": True, "total": 10 * 1024 * 1024, "segment_size": 2 * 1024 * 1024, "done": [0, 2097152]}
+    manager.downloads[running].status = "downloading"
+    manager.downloads[running].resume = resume
+    manager.downloads[running].progress = 0.4
+    manager.downloads[paused].status = "paused"
+    manager.downloads[done].status = "completed"
+    manager._save_journal(force=True)
+
+    restored = DownloadManager()
+    assert set(restored.downloads) == {running, paused}  # completed downloads aren't journaled
+    item = restored.downloads[running]
+    assert (item.url, item.title, item.episode, item.show_id, item.referer) == (
+        "http://127.0.0.1:9/1.mp4", "Journal Show", "1", "j", "https://ref/")
+    assert item.resume == resume and item.progress == 0.4
+    assert not item.cancel_flag and not item.pause_flag
+    # Running downloads are picked up again, paused ones wait for the user
+    assert item.status == "pending"
+    assert restored.downloads[paused].status == "paused"
+    assert restored.downloads[paused].mode == "dub"
+    assert [entry[2] for entry in restored._queue] == [running]
+
+
+def test_corrupt_journal_is_ignored(home):
+    journal = home / ".ani-cli-gui" / "downloads.json"
+    journal.parent.mkdir(parents=True)
+    journal.write_text("{not json")
+    assert DownloadManager().downloads == {}
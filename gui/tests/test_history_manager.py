@@ -0,0 +1,83 @@
+import sqlite3
+
+from core.history_manager import SCHEMA_VERSION, HistoryManager
+
+# Schema as shipped in version 1, before shows.watched existed
+V1_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shows (
+    anime_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    thumbnail TEXT,
+    last_episode INTEGER NOT NULL DEFAULT 0,
+    last_watched TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_shows_last_watched ON shows (last_watched);
+
+CREATE TABLE IF NOT EXISTS episodes (
+    anime_id TEXT NOT NULL,
+    episode TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (anime_id, episode)
+);
+
+CREATE TABLE IF NOT EXISTS favorites (
+    anime_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    thumbnail TEXT,
+    added TEXT NOT NULL
+);
+"""
+
+
+def make_v1_database(data_dir):
+    conn = sqlite3.connect(str(data_dir / "history.db"))
+    conn.executescript(V1_SCHEMA)
+    conn.executemany(
+        "INSERT INTO shows (anime_id, title, thumbnail, last_episode, last_watched) VALUES (?, ?, ?, ?, ?)",
+        [("a", "Show A", "a.jpg", 5, "2024-01-02T00:00:00"),
+         ("b", "Show B", None, 12, "2024-01-03T00:00:00"),
+         ("c", "Show C", None, 0, "2024-01-01T00:00:00")]
+    )
+    episodes = [("a", str(n)) for n in (1, 2, 3, 5)] + [("b", "12"), ("b", "12.5"), ("b", "11")]
+    conn.executemany(
+        "INSERT INTO episodes (anime_id, episode, timestamp) VALUES (?, ?, '2024-01-01T00:00:00')", episodes
+    )
+    conn.execute("INSERT INTO favorites (anime_id, title, thumbnail, added) VALUES ('a', 'Show A', NULL, 'x')")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+
+def test_v1_database_is_migrated(tmp_path):
+    make_v1_database(tmp_path)
+    history = HistoryManager(tmp_path)
+
+    assert history.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION == 2
+    rows = dict(history.conn.execute("SELECT anime_id, watched FROM shows").fetchall())
+    assert rows == {"a": "1-3,5", "b": "11-12,12.5", "c": ""}
+
+    watched = history.get_watched_set("a")
+    assert "2" in watched and "4" not in watched
+    assert history.is_episode_watched("b", "12.5")
+    assert [show["id"] for show in history.get_continue_watching()] == ["b", "a", "c"]
+    assert history.get_show("b")["last_episode"] == 12
+    assert history.is_favorite("a")
+
+    # The migrated rows take further watches like any other
+    history.mark_episode_watched("a", "Show A", 4)
+    assert history.conn.execute("SELECT watched FROM shows WHERE anime_id = 'a'").fetchone()[0] == "1-5"
+    history.conn.close()
+
+
+def test_migration_runs_once(tmp_path):
+    make_v1_database(tmp_path)
+    HistoryManager(tmp_path).conn.close()
+    conn = sqlite3.connect(str(tmp_path / "history.db"))
+    conn.execute("UPDATE shows SET watched = 'kept' WHERE anime_id = 'a'")
+    conn.commit()
+    conn.close()
+
+    history = HistoryManager(tmp_path)
+    # A v2 database is left alone, so the ranges are not rebuilt
+    assert history.conn.execute("SELECT watched FROM shows WHERE anime_id = 'a'").fetchone()[0] == "kept"
+    history.conn.close()
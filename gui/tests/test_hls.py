@@ -0,0 +1,35 @@
+from core.hls import HlsVariant, parse_master_playlist, select_variant
+
+MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080
+1080.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=1280x720
+720.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=1000000,RESOLUTION=854x480
+480.m3u8
+"""
+
+
+def variants():
+    return parse_master_playlist(MASTER, "https://cdn.example/master.m3u8")
+
+
+def test_auto_without_measurement_starts_conservative():
+    assert select_variant(variants(), "auto").height == 720
+
+
+def test_auto_follows_measured_throughput():
+    assert select_variant(variants(), "auto", throughput=1_000_000).height == 1080
+    assert select_variant(variants(), "auto", throughput=200_000).height == 480
+    assert select_variant(variants(), "auto", throughput=10_000).height == 480
+
+
+def test_explicit_quality_ignores_the_default():
+    assert select_variant(variants(), "best").height == 1080
+    assert select_variant(variants(), "1080p").height == 1080
+    assert select_variant(variants(), "worst").height == 480
+
+
+def test_auto_without_resolutions_uses_bandwidth():
+    plain = [HlsVariant("a", 6_000_000), HlsVariant("b", 2_000_000), HlsVariant("c", 800_000)]
+    assert select_variant(plain, "auto").url == "b"
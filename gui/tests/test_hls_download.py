@@ -0,0 +1,83 @@
+import time
+
+import pytest
+import requests
+
+from core.hls_download import HlsDownloader
+
+SEGMENT = bytes(range(256)) * 4096  # 1 MB
+
+
+def media_playlist(count):
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:4"]
+    for index in range(count):
+        lines += ["#EXTINF:4.0,", f"seg{index}.ts"]
+    return "\n".join(lines + ["#EXT-X-ENDLIST", ""]).encode()
+
+
+def serve_stream(server, count):
+    server.files["/stream/index.m3u8"] = media_playlist(count)
+    for index in range(count):
+        server.files[f"/stream/seg{index}.ts"] = SEGMENT[:-1] + bytes([index])
+
+
+def test_failed_run_stops_fetches_in_flight(media_server, tmp_path):
+    serve_stream(media_server, 4)
+    del media_server.files["/stream/seg0.ts"]  # 404: the run fails on its first segment
+    for index in (1, 2, 3):
+        media_server.delays[f"/stream/seg{index}.ts"] = 0.05  # ~0.8 s per segment
+
+    class OneTry(HlsDownloader):
+        SEGMENT_RETRIES = 1
+
+    throttled = []
+    downloader = OneTry(requests.Session(), media_server.url("/stream/index.m3u8"), str(tmp_path / "out.ts"),
+                        workers=4, throttle=throttled.append)
+    with pytest.raises(Exception, match="Segment failed"):
+        downloader.run()
+    reads_at_failure = len(throttled)
+    time.sleep(1.5)  # long enough for the slow segments to have finished
+    assert downloader.fetched == 0
+    assert len(throttled) - reads_at_failure <= 3  # at most the read each worker was in
+
+
+def test_resume_continues_at_the_next_segment(media_server, tmp_path):
+    serve_stream(media_server, 4)
+    segment2 = media_server.files.pop("/stream/seg2.ts")
+    path = tmp_path / "out.ts"
+
+    class OneTry(HlsDownloader):
+        SEGMENT_RETRIES = 1
+
+    first = OneTry(requests.Session(), media_server.url("/stream/index.m3u8"), str(path), workers=2)
+    with pytest.raises(Exception, match="Segment failed"):
+        first.run()
+    state = first.resume_state()
+    assert (state["written"], state["parts"], state["offset"]) == (2, 4, 2 * len(SEGMENT))
+
+    # A write that was cut off after the last recorded segment
+    with open(path, "ab") as f:
+        f.write(b"partial segment")
+    media_server.files["/stream/seg2.ts"] = segment2
+    media_server.requests.clear()
+
+    second = HlsDownloader(requests.Session(), media_server.url("/stream/index.m3u8"), str(path),
+                           workers=2, resume=state)
+    assert second.run() == 2 * len(SEGMENT)
+    # (a seg3 request of the failed run may still reach the server late)
+    fetched = {p for p, _ in media_server.requests if p.endswith(".ts")}
+    assert fetched == {"/stream/seg2.ts", "/stream/seg3.ts"}
+    expected = b"".join(media_server.files[f"/stream/seg{index}.ts"] for index in range(4))
+    assert path.read_bytes() == expected
+
+
+def test_resume_state_of_another_playlist_starts_over(media_server, tmp_path):
+    serve_stream(media_server, 3)
+    path = tmp_path / "out.ts"
+    path.write_bytes(b"old stream")
+    stale = {"hls": True, "media_url": media_server.url("/stream/index.m3u8"), "parts": 5,
+             "written": 2, "offset": 10}
+
+    downloader = HlsDownloader(requests.Session(), media_server.url("/stream/index.m3u8"), str(path), resume=stale)
+    assert downloader.run() == 3 * len(SEGMENT)
+    assert path.read_bytes() == b"".join(media_server.files[f"/stream/seg{i}.ts"] for i in range(3))
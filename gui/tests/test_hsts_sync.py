@@ -0,0 +1,107 @@
+import threading
+
+from core.history_manager import HistoryManager
+from core.hsts_sync import HstsSync, parse_hsts
+
+HSTS = "5\tA1\tShow A (12 episodes)\n3\tC3\tShow C (24 episodes)\n"
+
+
+class FakeScraper:
+    def __init__(self, fail=False, gate=None):
+        self.fail = fail
+        self.gate = gate  # lookups wait for this event when given
+
+    def get_episodes_list(self, show_id, mode):
+        if self.gate:
+            self.gate.wait(5)
+        if self.fail:
+            raise ConnectionError("provider down")
+        return [str(i) for i in range(1, 25)]
+
+
+def make_sync(tmp_path, scraper):
+    path = tmp_path / "ani-hsts"
+    path.write_text(HSTS)
+    history = HistoryManager(tmp_path / "gui")
+    return HstsSync(history=history, scraper_=scraper, path=path), history
+
+
+def test_import_merges_and_finds_next_episodes(tmp_path):
+    sync, history = make_sync(tmp_path, FakeScraper())
+    history.mark_episode_watched("C3", "Show C", 10)  # further along in the GUI
+
+    assert sync.sync() == 2
+    assert history.get_watched_set("A1").to_string() == "1-5"
+    assert history.get_show("C3")["last_episode"] == 10
+    assert sync.next_episodes == {"A1": "6", "C3": "11"}
+    assert sync.sync() == 0  # unchanged file
+
+
+def test_import_does_not_wait_for_episode_lookups(tmp_path):
+    sync, history = make_sync(tmp_path, FakeScraper(fail=True))
+    seen = []
+    sync.add_listener(lambda: seen.append(history.get_show("A1")))
+
+    assert sync.sync() == 2
+    assert seen and seen[0]["last_episode"] == 5
+    assert sync.next_episodes == {}
+
+
+def test_single_episode_is_written_back(tmp_path):
+    sync, history = make_sync(tmp_path, FakeScraper())
+    history.add_listener(sync.on_watched)
+
+    history.mark_episode_watched("A1", "Show A", 6)
+    history.mark_episode_watched("D4", "Show D", 1)
+    sync.wait_exports(5)
+
+    entries = {entry.id: entry for entry in parse_hsts(sync.path.read_text())}
+    assert (entries["A1"].episode, entries["A1"].title) == ("6", "Show A (12 episodes)")
+    assert (entries["D4"].episode, entries["D4"].title) == ("1", "Show D")
+
+
+def test_range_marks_are_written_back(tmp_path):
+    sync, history = make_sync(tmp_path, FakeScraper())
+    history.add_listener(sync.on_watched)
+
+    history.mark_range_watched("C3", "Show C", 1, 9)
+    history.mark_episodes_watched("A1", "Show A", ["7", "9", "8"])
+    sync.wait_exports(5)
+
+    entries = {entry.id: entry.episode for entry in parse_hsts(sync.path.read_text())}
+    assert entries == {"A1": "9", "C3": "9"}
+
+
+def test_write_back_happens_off_the_calling_thread(tmp_path, monkeypatch):
+    sync, history = make_sync(tmp_path, FakeScraper())
+    history.add_listener(sync.on_watched)
+    threads = []
+    export = sync.export_episode
+    monkeypatch.setattr(sync, "export_episode", lambda *args: (threads.append(threading.current_thread()), export(*args)))
+
+    history.mark_episode_watched("A1", "Show A", 6)
+    sync.wait_exports(5)
+    assert threads and threading.current_thread() not in threads
+    assert parse_hsts(sync.path.read_text())[0].episode == "6"
+
+
+def test_episode_played_during_lookup_is_not_new(tmp_path):
+    gate = threading.Event()
+    sync, history = make_sync(tmp_path, FakeScraper(gate=gate))
+    history.add_listener(sync.on_watched)
+
+    importer = threading.Thread(target=sync.sync)
+    importer.start()
+    try:
+        # The merge is in, the lookups are waiting on the gate
+        deadline = threading.Event()
+        while history.get_show("A1") is None and not deadline.wait(0.01):
+            pass
+        history.mark_episode_watched("A1", "Show A", 6)
+    finally:
+        gate.set()
+        importer.join(5)
+    sync.wait_exports(5)
+
+    assert "A1" not in sync.next_episodes
+    assert sync.next_episodes == {"C3": "4"}
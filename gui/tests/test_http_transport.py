@@ -0,0 +1,48 @@
+import socket
+import threading
+
+import pytest
+import requests
+
+from core.http_transport import HttpTransport
+
+
+@pytest.fixture
+def stuck_server():
+    """Accepts connections and never answers; yields (url, accepted connection count)"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(8)
+    accepted = []
+
+    def serve():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            accepted.append(conn)
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f"http://127.0.0.1:{server.getsockname()[1]}/api", accepted
+    server.close()
+    for conn in accepted:
+        conn.close()
+
+
+def transport():
+    return HttpTransport({"read_timeout": 0.2, "retries": 2, "backoff": 0})
+
+
+def test_api_session_does_not_retry_timed_out_reads(stuck_server):
+    url, accepted = stuck_server
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport().api_session().get(url)
+    assert len(accepted) == 1
+
+
+def test_download_session_retries_reads(stuck_server):
+    url, accepted = stuck_server
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport().session().get(url)
+    assert len(accepted) == 3
@@ -0,0 +1,54 @@
+import json
+import os
+import stat
+
+from core import persistence
+from core.persistence import DebouncedWriter, atomic_write
+from core.settings_manager import SettingsManager
+
+
+def test_atomic_write_keeps_permissions(tmp_path):
+    path = tmp_path / "state" / "state.json"
+    path.parent.mkdir()
+    path.write_text("old")
+    os.chmod(path, 0o644)
+    atomic_write(path, "new")
+    assert path.read_text() == "new"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert [p.name for p in path.parent.iterdir()] == ["state.json"]  # no temp files left
+
+
+def test_burst_of_schedules_is_one_write(tmp_path, monkeypatch):
+    writes = []
+    real_write = persistence.atomic_write_json
+    monkeypatch.setattr(persistence, "atomic_write_json", lambda *a, **k: (writes.append(a[1]), real_write(*a, **k)))
+    state = {"n": 0}
+    writer = DebouncedWriter(tmp_path / "s.json", lambda: dict(state), delay=60)
+    for n in range(5):
+        state["n"] = n
+        writer.schedule()
+    assert writes == []
+    assert writer.flush()
+    assert writes == [{"n": 4}]
+    assert json.loads((tmp_path / "s.json").read_text()) == {"n": 4}
+
+
+def test_flush_reports_a_failed_write(tmp_path):
+    target = tmp_path / "taken"
+    target.mkdir()  # os.replace can't put a file over a directory
+    writer = DebouncedWriter(target, lambda: {"a": 1}, delay=60)
+    writer.schedule()
+    assert not writer.flush()
+    assert writer.error
+    # Still pending, so the next flush tries again
+    target.rmdir()
+    assert writer.flush() and writer.error is None
+
+
+def test_settings_save_button_sees_write_errors(tmp_path):
+    manager = SettingsManager()
+    manager.set("playback", "quality", "720")
+    manager.save_settings()
+    manager.writer.path = tmp_path  # a directory: the write fails
+    assert not manager.flush()
+    assert manager.save_error
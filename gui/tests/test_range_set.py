@@ -0,0 +1,66 @@
+import random
+
+from core.range_set import RangeSet
+
+
+def test_adjacent_and_overlapping_ranges_merge():
+    ranges = RangeSet()
+    ranges.add_range(1, 3)
+    ranges.add_range(7, 9)
+    ranges.add(5)
+    assert (ranges.starts, ranges.ends) == ([1, 5, 7], [3, 5, 9])
+    ranges.add(4)  # touches both neighbours
+    ranges.add(6)
+    assert (ranges.starts, ranges.ends) == ([1], [9])
+    ranges.add_range(20, 30)
+    ranges.add_range(15, 25)  # overlaps the start
+    ranges.add_range(10, 12)  # adjacent to 1-9
+    assert (ranges.starts, ranges.ends) == ([1, 15], [12, 30])
+    ranges.add_range(0, 40)  # swallows everything
+    assert (ranges.starts, ranges.ends) == ([0], [40])
+
+
+def test_non_integer_episodes_go_to_the_side_set():
+    ranges = RangeSet(["1", "2", "12.5", " SP1 "])
+    assert "12.5" in ranges and "SP1" in ranges
+    assert 2 in ranges and "2" in ranges and " 2 " in ranges
+    assert "3" not in ranges and "12" not in ranges
+    assert len(ranges) == 4
+    assert list(ranges) == ["1", "2", "12.5", "SP1"]
+
+
+def test_string_round_trip():
+    ranges = RangeSet()
+    ranges.add_range(1, 500)
+    ranges.add(502)
+    ranges.add("12.5")
+    text = ranges.to_string()
+    assert text == "1-500,502,12.5"
+    parsed = RangeSet.from_string(text)
+    assert parsed == ranges
+    assert len(parsed) == 502
+    assert RangeSet.from_string("") == RangeSet()
+    assert RangeSet.from_string(None) == RangeSet()
+    # Unsorted or overlapping input still parses to the canonical form
+    assert RangeSet.from_string("5-8,1-3,4,7-10").to_string() == "1-10"
+
+
+def test_matches_a_plain_set():
+    rng = random.Random(1234)
+    for _ in range(50):
+        ranges, plain = RangeSet(), set()
+        for _ in range(rng.randint(0, 40)):
+            if rng.random() < 0.3:
+                first = rng.randint(1, 200)
+                last = first + rng.randint(0, 15)
+                ranges.add_range(first, last)
+                plain.update(range(first, last + 1))
+            else:
+                episode = rng.randint(1, 200)
+                ranges.add(episode)
+                plain.add(episode)
+        assert [int(ep) for ep in ranges] == sorted(plain)
+        assert len(ranges) == len(plain)
+        assert all(ranges.ends[i] + 1 < ranges.starts[i + 1] for i in range(len(ranges.starts) - 1))
+        assert all((number in ranges) == (number in plain) for number in range(0, 220))
+        assert RangeSet.from_string(ranges.to_string()) == ranges
@@ -0,0 +1,47 @@
+import time
+
+from core.response_cache import ResponseCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return ResponseCache(path=tmp_path / "cache.sqlite3", **kwargs)
+
+
+def age(cache, key, seconds):
+    cache.db.execute("UPDATE entries SET stored = stored - ? WHERE key = ?", (seconds, key))
+    cache.db.commit()
+
+
+def test_hits_do_not_write(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("k", "search", {"data": 1})
+    changes = cache.db.total_changes
+    for _ in range(100):
+        assert cache.get("k") == ({"data": 1}, True)
+    assert cache.db.total_changes == changes
+    assert not cache.db.in_transaction
+
+
+def test_stale_search_is_served_but_stale_sources_are_not(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("search", "search", {"data": "results"})
+    cache.put("sources", "embeds", {"data": "links"})
+    age(cache, "search", ResponseCache.DEFAULT_TTLS["search"] + 60)
+    age(cache, "sources", ResponseCache.DEFAULT_TTLS["embeds"] + 60)
+
+    assert cache.get("search") == ({"data": "results"}, False)
+    assert cache.get("sources") == (None, False)
+
+
+def test_recently_read_entries_survive_eviction(tmp_path):
+    body = {"data": "x" * 1000}
+    cache = make_cache(tmp_path, max_bytes=3500)
+    cache.put("old", "search", body)
+    cache.put("older", "search", body)
+    time.sleep(0.01)
+    cache.get("old")  # only recorded in memory until the next store
+    cache.put("new", "search", body)
+    cache.put("newest", "search", body)
+
+    assert cache.get("old")[0] == body
+    assert cache.get("older")[0] is None
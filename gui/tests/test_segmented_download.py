@@ -0,0 +1,111 @@
+import requests
+
+from core.segmented_download import SegmentedDownloader
+
+BODY = bytes(range(256)) * 4096 * 3  # 3 MB
+
+
+class SmallSegments(SegmentedDownloader):
+    """Same logic, sizes scaled down so tests stay quick"""
+    SEGMENT_SIZE = 256 * 1024
+    MIN_SPLIT_SIZE = 512 * 1024
+
+
+def ranges_requested(server):
+    return [range_header for _, range_header in server.requests if range_header]
+
+
+def test_ranged_download_is_split_into_segments(media_server, tmp_path):
+    media_server.files["/ep.mp4"] = BODY
+    path = tmp_path / "ep.mp4.part"
+    downloader = SmallSegments(requests.Session(), media_server.url("/ep.mp4"), str(path), max_connections=4)
+
+    assert downloader.run() == len(BODY)
+    assert path.read_bytes() == BODY
+    assert downloader.ranged and downloader.total == len(BODY)
+    segment_count = len(BODY) // SmallSegments.SEGMENT_SIZE
+    assert len(downloader.resume_state()["done"]) == segment_count
+    assert len(ranges_requested(media_server)) == 1 + segment_count  # probe + one per segment
+
+
+def test_server_without_range_support_is_streamed(media_server, tmp_path):
+    media_server.files["/ep.mp4"] = BODY
+    media_server.no_range.add("/ep.mp4")
+    path = tmp_path / "ep.mp4.part"
+    progress = []
+    downloader = SmallSegments(requests.Session(), media_server.url("/ep.mp4"), str(path),
+                               on_progress=lambda done, total, speed: progress.append((done, total)))
+
+    assert downloader.run() == len(BODY)
+    assert path.read_bytes() == BODY
+    assert not downloader.ranged
+    assert progress[-1] == (len(BODY), len(BODY))
+
+
+def test_small_file_uses_one_plain_request(media_server, tmp_path):
+    media_server.files["/small.mp4"] = BODY[:100 * 1024]
+    path = tmp_path / "small.mp4.part"
+    downloader = SmallSegments(requests.Session(), media_server.url("/small.mp4"), str(path))
+
+    assert downloader.run() == 100 * 1024
+    assert path.read_bytes() == BODY[:100 * 1024]
+    assert ranges_requested(media_server) == ["bytes=0-0"]
+
+
+# --- resuming ---
+
+def test_resume_skips_finished_segments(media_server, tmp_path):
+    media_server.files["/ep.mp4"] = BODY
+    size = SmallSegments.SEGMENT_SIZE
+    path = tmp_path / "ep.mp4.part"
+    # Segments 0 and 2 finished in an earlier run, the rest of the file is still zeros
+    on_disk = bytearray(len(BODY))
+    on_disk[0:size] = BODY[0:size]
+    on_disk[2 * size:3 * size] = BODY[2 * size:3 * size]
+    path.write_bytes(bytes(on_disk))
+    resume = {"ranged": True, "total": len(BODY), "segment_size": size, "done": [0, 2 * size]}
+
+    downloader = SmallSegments(requests.Session(), media_server.url("/ep.mp4"), str(path), resume=resume)
+    assert downloader.run() == len(BODY) - 2 * size
+    assert path.read_bytes() == BODY
+    fetched = ranges_requested(media_server)[1:]  # after the probe
+    assert f"bytes=0-{size - 1}" not in fetched
+    assert f"bytes={2 * size}-{3 * size - 1}" not in fetched
+    assert len(fetched) == len(BODY) // size - 2
+
+
+def test_resume_state_for_another_file_starts_over(media_server, tmp_path):
+    media_server.files["/ep.mp4"] = BODY
+    path = tmp_path / "ep.mp4.part"
+    path.write_bytes(b"\0" * len(BODY))
+    size = SmallSegments.SEGMENT_SIZE
+    resume = {"ranged": True, "total": len(BODY) + 1, "segment_size": size, "done": [0]}  # size changed upstream
+
+    downloader = SmallSegments(requests.Session(), media_server.url("/ep.mp4"), str(path), resume=resume)
+    assert downloader.run() == len(BODY)
+    assert path.read_bytes() == BODY
+
+
+def test_single_stream_resumes_after_existing_bytes(media_server, tmp_path):
+    body = BODY[:300 * 1024]  # below MIN_SPLIT_SIZE: one connection
+    media_server.files["/small.mp4"] = body
+    path = tmp_path / "small.mp4.part"
+    path.write_bytes(body[:100 * 1024])
+
+    downloader = SmallSegments(requests.Session(), media_server.url("/small.mp4"), str(path),
+                               resume={"ranged": False, "total": 0})
+    assert downloader.run() == 200 * 1024
+    assert path.read_bytes() == body
+    assert ranges_requested(media_server) == [f"bytes={100 * 1024}-"]
+
+
+def test_single_stream_restarts_when_range_is_ignored(media_server, tmp_path):
+    body = BODY[:300 * 1024]
+    media_server.files["/small.mp4"] = body
+    media_server.no_range.add("/small.mp4")
+    path = tmp_path / "small.mp4.part"
+    path.write_bytes(body[:100 * 1024])
+
+    downloader = SmallSegments(requests.Session(), media_server.url("/small.mp4"), str(path))
+    assert downloader.run() == len(body)
+    assert path.read_bytes() == body  # rewritten, not appended
@@ -0,0 +1,22 @@
+from core.stream_extractor import extract_candidates
+
+
+def test_json_escapes_in_link_are_decoded():
+    body = r'{"links":[{"link":"https:\/\/cdn.example/v.mp4?a=1\u0026b=2","resolutionStr":"1080p"}]}'
+    [candidate] = extract_candidates(body, "https://provider.example/clock")
+    assert candidate.url == "https://cdn.example/v.mp4?a=1&b=2"
+    assert candidate.resolution == "1080p"
+
+
+def test_escaped_quote_does_not_cut_the_link_short():
+    body = r'{"links":[{"link":"https://cdn.example/v.mp4?t=\"x\"&s=1","hls":true}]}'
+    [candidate] = extract_candidates(body, "https://provider.example/clock")
+    assert candidate.url == 'https://cdn.example/v.mp4?t="x"&s=1'
+    assert candidate.hls
+
+
+def test_referer_is_decoded_and_shared():
+    body = (r'{"links":[{"link":"https://a.example/1.m3u8","hls":true,"Referer":"https:\/\/ref.example\/"},'
+            r'{"link":"https://a.example/2.mp4","resolutionStr":"720p"}]}')
+    candidates = extract_candidates(body, "https://provider.example/clock")
+    assert [c.referer for c in candidates] == ["https://ref.example/"] * 2
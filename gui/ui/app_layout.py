@@ -1,6 +1,6 @@
 
 import flet as ft
-from core.scraper import AniScraper
+from core.scraper import scraper, async_scraper
 from ui.detail_view import EpisodeDetailView
 from ui.home_view import HomeView
 from ui.detail_view import EpisodeDetailView
@@ -11,13 +11,15 @@ from ui.settings_view import SettingsView
 from ui.downloads_view import DownloadsView
 from core.settings_manager import settings_manager
 from core.theme_manager import theme_manager
+from core.hsts_sync import hsts_sync
 
 class AppLayout(ft.Column):
     def __init__(self, page: ft.Page):
         super().__init__(expand=True)
         # self.page is a read-only property in Control, available after mount
         # We don't need to store it manually.
-        self.scraper = AniScraper()
+        self.scraper = scraper
+        self.async_scraper = async_scraper
         self.current_view = "home"  # Track current view
         self.current_mode = settings_manager.get("playback", "default_mode") or "sub"  # Track current sub/dub mode
         
@@ -28,6 +30,18 @@ class AppLayout(ft.Column):
             child_aspect_ratio=0.7,
             spacing=10,
             run_spacing=10,
+            on_scroll=self._on_results_scroll,
+        )
+        # Paging state of the current search
+        self._search_id = 0
+        self._search_pages = None
+        self._loading_more = False
+        self._has_more = False
+        self.load_more_button = ft.TextButton(
+            "Load more",
+            icon=ft.Icons.EXPAND_MORE,
+            on_click=lambda e: self._request_next_page(),
+            visible=False
         )
         self.search_field = ft.TextField(
             hint_text="Search anime...",
@@ -58,6 +72,9 @@ class AppLayout(ft.Column):
 
         # Start with home view
         self.controls = [self.home_view]
+
+        # Pull in (and keep following) the shell ani-cli's history
+        hsts_sync.start()
         
         # Settings overlay (initially None)
         # Settings overlay (initially None)
@@ -159,6 +176,7 @@ class AppLayout(ft.Column):
                 ft.Container(content=self.results_grid, expand=True),
                 self.loading_overlay,  # Overlay on top of results
             ], expand=True),
+            ft.Row([self.load_more_button], alignment=ft.MainAxisAlignment.CENTER),
         ])
         self.update()
         self.search_anime(None)  # Trigger search
@@ -188,18 +206,49 @@ class AppLayout(ft.Column):
         self.loading_overlay.update()
         self.page.update() # Update page to show overlay immediately
 
-        # Run search in background (or just sync for now, flet handles it ok-ish)
-        # Ideally threading, but lets keep simple first
-        results = self.scraper.search_anime(query)
-        
-        for anime in results:
+        # Page through results on Flet's event loop, first page renders as soon as it arrives
+        self._search_id += 1
+        self._search_pages = self.async_scraper.search_pages(query)
+        self._loading_more = False
+        self._has_more = False
+        self.load_more_button.visible = False
+        self.load_more_button.update()
+        self._request_next_page()
+
+    def _request_next_page(self):
+        if self._search_pages is None or self._loading_more:
+            return
+        self._loading_more = True
+        self.page.run_task(self._load_next_page, self._search_id, self._search_pages)
+
+    def _on_results_scroll(self, e):
+        """Infinite scroll: fetch the next page when nearing the bottom"""
+        if self._has_more and e.max_scroll_extent and e.pixels >= e.max_scroll_extent - 300:
+            self._request_next_page()
+
+    async def _load_next_page(self, search_id, pages):
+        try:
+            results = await pages.__anext__()
+        except StopAsyncIteration:
+            results = None
+        finally:
+            if search_id == self._search_id:
+                self._loading_more = False
+
+        if search_id != self._search_id:
+            return  # A newer search replaced this one
+
+        for anime in results or []:
             self.results_grid.controls.append(
                 self.create_anime_card(anime)
             )
+        self._has_more = bool(results) and len(results) >= self.async_scraper.SEARCH_PAGE_SIZE
 
         # Hide loading overlay
         self.loading_overlay.visible = False
+        self.load_more_button.visible = self._has_more
         self.loading_overlay.update()
+        self.load_more_button.update()
         self.results_grid.update()
 
     def create_anime_card(self, anime):
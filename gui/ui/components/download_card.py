@@ -33,6 +33,20 @@ class DownloadCard(ft.Card):
         )
         
         # Action Buttons
+        self.pause_btn = ft.IconButton(
+            ft.Icons.PAUSE,
+            tooltip="Pause Download",
+            on_click=self.toggle_pause
+        )
+        self._sync_pause_button()
+
+        self.next_btn = ft.IconButton(
+            ft.Icons.VERTICAL_ALIGN_TOP,
+            tooltip="Download Next",
+            on_click=lambda e: download_manager.download_next(self.item.id),
+            visible=item.status == "pending"
+        )
+
         self.cancel_btn = ft.IconButton(
             ft.Icons.CANCEL,
             tooltip="Cancel Download",
@@ -49,6 +63,8 @@ class DownloadCard(ft.Card):
                 ft.Row([
                     self.icon_view,
                     self.title_text,
+                    self.next_btn,
+                    self.pause_btn,
                     self.cancel_btn
                 ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
                 self.progress_bar,
@@ -66,6 +82,21 @@ class DownloadCard(ft.Card):
         self.cancel_btn.disabled = True
         self.update()
 
+    def toggle_pause(self, e):
+        if self.item.status == "paused" or self.item.status == "error":
+            download_manager.resume_download(self.item.id)
+        else:
+            download_manager.pause_download(self.item.id)
+        self._sync_pause_button()
+        self.update()
+
+    def _sync_pause_button(self):
+        """Pause while running, resume once paused (or failed, to retry from the partial file)"""
+        resumable = self.item.status in ["paused", "error"]
+        self.pause_btn.icon = ft.Icons.PLAY_ARROW if resumable else ft.Icons.PAUSE
+        self.pause_btn.tooltip = "Resume Download" if resumable else "Pause Download"
+        self.pause_btn.visible = self.item.status in ["pending", "downloading", "paused", "error"]
+
     def refresh_theme(self):
         """Update colors based on current theme"""
         theme = theme_manager.get_theme()
@@ -74,6 +105,8 @@ class DownloadCard(ft.Card):
         self.progress_bar.bgcolor = theme.surface
         
         self.icon_view.color = theme.primary
+        self.pause_btn.icon_color = theme.primary
+        self.next_btn.icon_color = theme.primary
         self.cancel_btn.icon_color = theme.error
         
         # Meta text usually secondary/greyish. Using theme.text with opacity or just theme.text
@@ -105,7 +138,9 @@ class DownloadCard(ft.Card):
             
         self.meta_text.value = f"{int(self.item.progress * 100)}% • {self.item.speed} • {self.item.eta}"
         
-        if self.item.status in ["completed", "error", "cancelled"]:
+        self._sync_pause_button()
+        self.next_btn.visible = self.item.status == "pending"
+        if self.item.status in ["completed", "cancelled"]:
             self.cancel_btn.visible = False
             self.progress_bar.visible = False if self.item.status == "cancelled" else True
             
@@ -4,8 +4,10 @@ import os
 import subprocess
 import shutil
 import threading
-from core.scraper import AniScraper
+from core.scraper import scraper
 from core.download_manager import download_manager
+from core.batch_pipeline import BatchDownload, parse_episode_range
+from core.bandwidth import bandwidth_governor
 from core.history_manager import history_manager
 from core.rpc_manager import rpc_manager
 from core.rpc_manager import rpc_manager
@@ -70,8 +72,10 @@ class EpisodeDetailView(ft.Column):
         self.anime = anime_data
         self.on_back = on_back
         self.mode = mode  # Store sub/dub mode
-        self.scraper = AniScraper()
+        self.scraper = scraper
         self.history = history_manager
+        self.episodes = []  # Episode strings in display order
+        self.player_process = None  # Last player we launched, see bandwidth_governor
         
         self.episodes_grid = ft.GridView(
             runs_count=8,
@@ -130,8 +134,16 @@ class EpisodeDetailView(ft.Column):
             on_click=lambda e: self.set_action_mode("download")
         )
 
+        self.btn_range = ft.OutlinedButton(
+            "Range",
+            icon=ft.Icons.DOWNLOAD_FOR_OFFLINE,
+            tooltip="Download or mark a range of episodes",
+            on_click=self.open_range_dialog
+        )
+        self.batch = None  # Running BatchDownload, if any
+
         self.mode_control = ft.Row(
-            [self.btn_watch, self.btn_download], 
+            [self.btn_watch, self.btn_download, self.btn_range], 
             alignment=ft.MainAxisAlignment.CENTER,
             spacing=10
         )
@@ -163,34 +175,48 @@ class EpisodeDetailView(ft.Column):
             self.btn_watch = ft.OutlinedButton("Watch", icon=ft.Icons.PLAY_ARROW, on_click=lambda e: self.set_action_mode("watch"))
             self.btn_download = ft.ElevatedButton("Download", icon=ft.Icons.DOWNLOAD, on_click=lambda e: self.set_action_mode("download"), bgcolor=theme.primary, color=theme.text)
             
-        self.mode_control.controls = [self.btn_watch, self.btn_download]
+        self.mode_control.controls = [self.btn_watch, self.btn_download, self.btn_range]
         self.mode_control.update()
         
         # Update episode buttons if they exist
+        self._refresh_watched_borders()
+        
+        # self.show_snack(f"Mode switched to: {self.action_mode.upper()}") # SNACK REMOVED AS IT IS NOISY ON THEME UPDATE
+        # Reload episodes to update click handlers (or just check mode in handler)
+        # Better to check mode in handler to avoid reload flicker
+        
+    def _refresh_watched_borders(self):
         if hasattr(self, "episode_buttons") and self.episode_buttons:
+            theme = theme_manager.get_theme()
+            watched = self.history.get_watched_set(self.anime["id"])
             for ep_str, btn in self.episode_buttons.items():
-                is_watched = self.history.is_episode_watched(self.anime["id"], int(ep_str))
                 if btn.style:
-                    btn.style.side = ft.BorderSide(2, theme.primary) if is_watched else None
+                    btn.style.side = ft.BorderSide(2, theme.primary) if ep_str in watched else None
                 try:
                     btn.update()
                 except: pass
-        
-        # self.show_snack(f"Mode switched to: {self.action_mode.upper()}") # SNACK REMOVED AS IT IS NOISY ON THEME UPDATE
-        # Reload episodes to update click handlers (or just check mode in handler)
-        # Better to check mode in handler to avoid reload flicker
-        
+
     def on_episode_click(self, ep_no):
         if self.action_mode == "watch":
             self.play_episode(ep_no)
         else:
             self.download_episode_action(ep_no)
 
-    def download_episode_action(self, ep_no):
+    def download_episode_action(self, ep_no, replace=False):
+        if not replace and download_manager.find_existing(self.anime["title"], ep_no, self.mode):
+            sb = ft.SnackBar(
+                content=ft.Text(f"Episode {ep_no} is already downloaded"),
+                action="Replace",
+                on_action=lambda e: self.download_episode_action(ep_no, replace=True)
+            )
+            self.page.overlay.append(sb)
+            sb.open = True
+            self.page.update()
+            return
         self.show_snack(f"Starting download for Episode {ep_no}...")
-        threading.Thread(target=self._download_episode_thread, args=(ep_no,), daemon=True).start()
+        threading.Thread(target=self._download_episode_thread, args=(ep_no, replace), daemon=True).start()
 
-    def _download_episode_thread(self, ep_no):
+    def _download_episode_thread(self, ep_no, replace=False):
         # 1. Fetch links (reuse logic?)
         # For simplicity, copy-paste basic fetch logic or refactor. 
         # Refactoring play_episode to be reusable for getting stream url would be best.
@@ -205,12 +231,10 @@ class EpisodeDetailView(ft.Column):
                 self.show_snack("Download failed: No embeds found")
                 return
 
-            stream_url = None
-            for embed in embeds:
-                stream_url = self.scraper.get_stream_link(embed)
-                if stream_url: break
+            candidates = self.scraper.resolve_candidates(embeds, show_id=self.anime["id"])
+            stream = self.scraper.choose_stream(candidates, settings_manager.get("playback", "quality") or "auto")
             
-            if not stream_url:
+            if not stream:
                  self.show_snack("Download failed: No stream link")
                  return
             
@@ -244,9 +268,14 @@ class EpisodeDetailView(ft.Column):
                     btn.update()
 
             download_manager.download_episode(
-                stream_url, 
+                stream.url, 
                 self.anime["title"], 
                 ep_no,
+                referer=stream.referer,
+                hls=stream.hls,
+                show_id=self.anime["id"],
+                mode=self.mode,
+                replace=replace,
                 on_complete=on_dl_complete,
                 on_error=on_dl_error
             )
@@ -264,6 +293,141 @@ class EpisodeDetailView(ft.Column):
                 btn.update()
 
 
+    def open_range_dialog(self, e):
+        # A range still running can be cancelled from here; a new one can start
+        # once it only waits on downloads the user paused
+        running = self.batch if self.batch and not self.batch.finished else None
+        range_field = ft.TextField(
+            label="Episodes",
+            hint_text="1-24, 5-, all, unwatched",
+            value="unwatched",
+            autofocus=True
+        )
+
+        def close(e=None):
+            dialog.open = False
+            self.page.update()
+
+        def selected():
+            watched = self.history.get_watched_set(self.anime["id"])
+            try:
+                episodes = parse_episode_range(range_field.value, self.episodes, lambda ep: ep in watched)
+            except ValueError as err:
+                range_field.error_text = str(err)
+                range_field.update()
+                return None
+            if not episodes:
+                range_field.error_text = "No episodes match"
+                range_field.update()
+                return None
+            return episodes
+
+        def start(e=None):
+            if running and not running.settled:
+                self.show_snack("A range download is already running")
+                return
+            episodes = selected()
+            if episodes:
+                close()
+                self.download_range(episodes)
+
+        def cancel_range(e=None):
+            close()
+            running.cancel()
+
+        def mark_watched(e=None):
+            episodes = selected()
+            if episodes:
+                close()
+                # One write for the whole selection
+                self.history.mark_episodes_watched(
+                    self.anime["id"], self.anime["title"], episodes, thumbnail=self.anime.get("thumbnail")
+                )
+                self._refresh_watched_borders()
+                self.show_snack(f"Marked {len(episodes)} episode(s) as watched")
+
+        range_field.on_submit = start
+        actions = [
+            ft.TextButton("Cancel", on_click=close),
+            ft.TextButton("Mark watched", icon=ft.Icons.DONE_ALL, on_click=mark_watched),
+            ft.ElevatedButton("Download", icon=ft.Icons.DOWNLOAD, on_click=start,
+                              disabled=bool(running and not running.settled)),
+        ]
+        content = range_field
+        if running:
+            counts = running.counts()
+            actions.insert(1, ft.TextButton("Cancel range", icon=ft.Icons.STOP, on_click=cancel_range))
+            status = (f"Range download: {counts.get(BatchDownload.DONE, 0)} of {len(running.episodes)} saved"
+                      + (f", {counts[BatchDownload.PAUSED]} paused" if counts.get(BatchDownload.PAUSED) else ""))
+            content = ft.Column([ft.Text(status, size=12, color="grey"), range_field], tight=True)
+        dialog = ft.AlertDialog(
+            title=ft.Text("Episode range"),
+            content=content,
+            actions=actions
+        )
+        self.page.overlay.append(dialog)
+        dialog.open = True
+        self.page.update()
+
+    def download_range(self, episodes):
+        if self.batch:
+            # Its paused downloads stay in the Downloads view, this view follows the new range
+            self.batch.on_update = None
+        self.batch = BatchDownload(
+            self.anime["id"], self.anime["title"], episodes,
+            mode=self.mode, on_update=self._on_batch_update
+        )
+        self._batch_states = {}
+        self._batch_reported = False
+        self.batch.start()
+        rpc_manager.update_activity(self.anime["title"], episodes[0], state="Downloading")
+        self.show_snack(f"Downloading {len(episodes)} episode(s)...")
+
+    def _on_batch_update(self, batch):
+        # Runs on the pipeline threads; only touch buttons whose state changed
+        for ep, state in list(batch.states.items()):
+            if self._batch_states.get(ep) == state:
+                continue
+            self._batch_states[ep] = state
+            btn = self.episode_buttons.get(ep) if hasattr(self, "episode_buttons") else None
+            if not btn:
+                continue
+            if state in (BatchDownload.RESOLVING, BatchDownload.READY, BatchDownload.DOWNLOADING):
+                btn.content = ft.Row([
+                    ft.ProgressRing(width=16, height=16, stroke_width=2),
+                    ft.Text("Downloading..." if state == BatchDownload.DOWNLOADING else "Queued", size=12),
+                ], alignment=ft.MainAxisAlignment.CENTER)
+            elif state == BatchDownload.DONE:
+                btn.content = ft.Row([
+                    ft.Icon(ft.Icons.CHECK, color="green"),
+                    ft.Text("Saved", size=12),
+                ], alignment=ft.MainAxisAlignment.CENTER)
+                btn.bgcolor = "rgba(0, 255, 0, 0.2)"
+            elif state == BatchDownload.PAUSED:
+                btn.content = ft.Row([
+                    ft.Icon(ft.Icons.PAUSE, color="orange"),
+                    ft.Text("Paused", size=12),
+                ], alignment=ft.MainAxisAlignment.CENTER)
+            elif state == BatchDownload.FAILED:
+                btn.content = ft.Row([
+                    ft.Icon(ft.Icons.ERROR, color="red"),
+                    ft.Text("Error", size=12),
+                ], alignment=ft.MainAxisAlignment.CENTER)
+            else:
+                btn.content = ft.Text(ep)
+            try:
+                btn.update()
+            except Exception:
+                pass
+
+        if batch.finished and not self._batch_reported and self.page:
+            self._batch_reported = True
+            counts = batch.counts()
+            failed = counts.get(BatchDownload.FAILED, 0)
+            outcome = "cancelled" if batch.cancelled else "finished"
+            message = f"Range download {outcome}: {counts.get(BatchDownload.DONE, 0)} saved"
+            self.show_snack(message + (f", {failed} failed" if failed else ""))
+
     def did_mount(self):
         self.page.pubsub.subscribe(self._on_pubsub_message)
         theme_manager.add_listener(self._on_theme_update)
@@ -287,7 +451,7 @@ class EpisodeDetailView(ft.Column):
             self._on_episodes_loaded(message["data"])
         elif topic == "stream_found":
             data = message["data"]
-            self._on_stream_found(data["url"], data["ep_no"])
+            self._on_stream_found(data["url"], data["ep_no"], data.get("referer"))
         elif topic == "error":
             self._on_error(message["data"])
 
@@ -347,11 +511,14 @@ class EpisodeDetailView(ft.Column):
     def _on_episodes_loaded(self, eps):
         # This runs on UI thread!
         self.episode_buttons = {} # Store references
+        self.episodes = [str(ep) for ep in eps]
         controls = []
         
         theme = theme_manager.get_theme()
+        # One lookup for the whole show instead of one per episode
+        watched = self.history.get_watched_set(self.anime["id"])
         for ep in eps:
-            is_watched = self.history.is_episode_watched(self.anime["id"], ep)
+            is_watched = str(ep) in watched
             
             # Simple text content for both
             button_content = ft.Text(str(ep))
@@ -419,25 +586,21 @@ class EpisodeDetailView(ft.Column):
                 self.page.pubsub.send_all({"topic": "error", "data": "No embeds found!"})
                 return
 
-            # Try ALL providers (Blocking)
-            stream_url = None
-            for i, embed in enumerate(embeds):
-                provider_name = embed.get("sourceName", f"Provider {i+1}")
-                print(f"Trying provider: {provider_name}")
-                
-                stream_url = self.scraper.get_stream_link(embed)
-                if stream_url:
-                    print(f"✓ Success! Provider '{provider_name}' returned: {stream_url}")
-                    break  # Found a working provider
-                else:
-                    print(f"✗ Provider '{provider_name}' failed, trying next...")
-
-            if not stream_url:
+            # Race ALL providers at once (Blocking until the best one answers)
+            print(f"Resolving {len(embeds)} providers in parallel...")
+            candidates = self.scraper.resolve_candidates(embeds, show_id=self.anime["id"])
+
+            # Pick the variant matching the quality setting (or what the link can sustain)
+            stream = self.scraper.choose_stream(candidates, settings_manager.get("playback", "quality") or "auto")
+            if not stream:
                 self.page.pubsub.send_all({"topic": "error", "data": "No valid stream links found!"})
                 return
 
             # Marshal success to UI thread via PubSub
-            self.page.pubsub.send_all({"topic": "stream_found", "data": {"url": stream_url, "ep_no": ep_no}})
+            self.page.pubsub.send_all({"topic": "stream_found", "data": {"url": stream.url, "ep_no": ep_no, "referer": stream.referer}})
+
+            # Warm the embed cache so the next episode starts faster
+            self._prefetch_next_embeds(ep_no)
             
         except FileNotFoundError:
              self.page.pubsub.send_all({"topic": "error", "data": "MPV not found in PATH!"})
@@ -445,8 +608,19 @@ class EpisodeDetailView(ft.Column):
             print(f"Error playing episode: {e}")
             self.page.pubsub.send_all({"topic": "error", "data": f"Error: {e}"})
 
-    def _on_stream_found(self, stream_url, ep_no):
+    def _prefetch_next_embeds(self, ep_no, count=2):
+        """Fetch embeds of the following episodes in one batched request"""
+        try:
+            index = self.episodes.index(str(ep_no))
+        except ValueError:
+            return
+        upcoming = self.episodes[index + 1:index + 1 + count]
+        if upcoming:
+            self.scraper.get_episode_embeds_batch(self.anime["id"], upcoming, mode=self.mode)
+
+    def _on_stream_found(self, stream_url, ep_no, referer=None):
         print(f"Final Stream URL: {stream_url}")
+        referer = referer or "https://allmanga.to"
         
         # Hide loading
         if self.loading_overlay in self.content_stack.controls:
@@ -473,7 +647,7 @@ class EpisodeDetailView(ft.Column):
                 cmd = [
                     vlc_path,
                     f"--meta-title={self.anime['title']} - Episode {ep_no}",
-                    "--http-referrer=https://allmanga.to",
+                    f"--http-referrer={referer}",
                     stream_url
                 ]
         
@@ -487,14 +661,16 @@ class EpisodeDetailView(ft.Column):
             cmd = [
                 mpv_path,
                 f"--force-media-title={self.anime['title']} - Episode {ep_no}",
-                "--referrer=https://allmanga.to",
+                f"--referrer={referer}",
                 stream_url
             ]
         
         # Launch player
         try:
             print(f"🚀 Launching: {' '.join(cmd)}")
-            subprocess.Popen(cmd)
+            self.player_process = subprocess.Popen(cmd)
+            # Downloads drop to the playback limit while this is running
+            bandwidth_governor.track_player(self.player_process)
         except Exception as e:
             error_msg = f"Failed to launch player: {e}"
             print(f"❌ {error_msg}")
@@ -23,6 +23,7 @@ class DownloadsView(ft.Container):
 
         
         self.download_cards = {}  # Map id -> DownloadCard
+        self.card_statuses = {}  # Map id -> status the list was last sorted with
         
         self.content_list = ft.ListView(
             expand=True,
@@ -63,13 +64,15 @@ class DownloadsView(ft.Container):
         # Simple implementation: Rebuild if count changes, otherwise update cards
         downloads = download_manager.get_all_downloads()
         
-        # Sort: Downloading first, then pending, then others
-        downloads.sort(key=lambda x: 0 if x.status == "downloading" else 1)
+        # Sort: Downloading first, then pending in queue order, then others
+        status_order = {"downloading": 0, "pending": 1}
+        downloads.sort(key=lambda x: (status_order.get(x.status, 2), x.priority if x.status == "pending" else 0))
         
         # Check if we need to rebuild controls (new items added)
         current_ids = set(self.download_cards.keys())
         new_ids = set(d.id for d in downloads)
         
+        self.card_statuses = {d.id: d.status for d in downloads}
         if current_ids != new_ids:
             self.content_list.controls.clear()
             self.download_cards.clear()
@@ -99,8 +102,25 @@ class DownloadsView(ft.Container):
         
         self.update()
 
-    def _on_manager_update(self):
-        """Called from background thread when downloads update"""
+    def _update_cards(self, changed):
+        """
+        Progress only touches the cards that changed; new items and status
+        changes (which move cards around) rebuild the list.
+        """
+        if changed is None:
+            self._refresh_list()
+            return
+        items = {d.id: d for d in download_manager.get_all_downloads()}
+        for download_id in changed:
+            item = items.get(download_id)
+            if download_id not in self.download_cards or not item or item.status != self.card_statuses.get(download_id):
+                self._refresh_list()
+                return
+        for download_id in changed:
+            self.download_cards[download_id].update_state()
+
+    def _on_manager_update(self, changed=None):
+        """Called from background thread when downloads update, with the changed ids"""
         # Schedule update on UI thread to prevent collisions
         if not self._page or not self.page:
              # If view is not mounted (self.page is None), do nothing
@@ -109,21 +129,21 @@ class DownloadsView(ft.Container):
         try:
             # Try to use run_task if available (Flet 0.21+) to schedule on UI loop
             if hasattr(self._page, "run_task"):
-                self._page.run_task(self._handle_update_async)
+                self._page.run_task(self._handle_update_async, changed)
             else:
                 # Fallback for older Flet: just call synchronously
-                self._handle_update_sync()
+                self._handle_update_sync(changed)
         except Exception as e:
             print(f"Error triggering update: {e}")
 
-    async def _handle_update_async(self):
+    async def _handle_update_async(self, changed=None):
         """Async wrapper for update logic if run_task is used"""
-        self._handle_update_sync()
+        self._handle_update_sync(changed)
 
-    def _handle_update_sync(self):
+    def _handle_update_sync(self, changed=None):
         """Synchronous update logic"""
         try:
-            self._refresh_list()
+            self._update_cards(changed)
         except Exception as e:
             print(f"Error updating downloads view: {e}")
             import traceback
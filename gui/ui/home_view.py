@@ -3,6 +3,7 @@ import flet as ft
 from core.history_manager import history_manager
 from core.history_manager import history_manager
 from core.history_manager import history_manager
+from core.hsts_sync import hsts_sync
 from core.settings_manager import settings_manager
 from core.theme_manager import theme_manager
 
@@ -153,6 +154,13 @@ class HomeView(ft.Column):
         except:
             pass  # Not yet added to page
     
+    def _next_episode_spans(self, anime):
+        """Adds "· Ep N out" when the ani-cli sync found an episode after the one watched"""
+        next_episode = hsts_sync.next_episodes.get(anime["id"])
+        if not next_episode or next_episode == str(anime["last_episode"]):
+            return None
+        return [ft.TextSpan(f" · Ep {next_episode} out", style=ft.TextStyle(color="orange", weight=ft.FontWeight.BOLD))]
+
     def create_continue_card(self, anime):
         """Create a card for continue watching anime"""
         return ft.Card(
@@ -178,6 +186,7 @@ class HomeView(ft.Column):
                                 f"Ep {anime['last_episode']}",
                                 size=10,
                                 color="green",
+                                spans=self._next_episode_spans(anime),
                             ),
                         ], tight=True),
                         padding=5,
@@ -275,10 +284,16 @@ class HomeView(ft.Column):
             
     def did_mount(self):
         theme_manager.add_listener(self._on_theme_update)
+        hsts_sync.add_listener(self._on_hsts_sync)
         # Also load data here if needed, but it's done in init
         
     def will_unmount(self):
         theme_manager.remove_listener(self._on_theme_update)
+        hsts_sync.remove_listener(self._on_hsts_sync)
+
+    def _on_hsts_sync(self):
+        """ani-cli history was merged in or new episodes were found (background thread)"""
+        self.load_continue_watching()
         
     def _on_theme_update(self):
         self._update_theme_colors()
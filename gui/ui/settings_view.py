@@ -1,6 +1,9 @@
 import flet as ft
 from core.settings_manager import settings_manager
 from core.theme_manager import theme_manager
+from core.hls import QUALITY_OPTIONS
+from core.download_manager import download_manager
+from core.bandwidth import bandwidth_governor
 import threading
 
 class SettingsView(ft.Container):
@@ -40,6 +43,14 @@ class SettingsView(ft.Container):
             width=300
         )
 
+        quality_labels = {"auto": "Auto (fit bandwidth)", "best": "Best", "worst": "Worst"}
+        self.quality_dropdown = ft.Dropdown(
+            label="Quality",
+            options=[ft.dropdown.Option(q, quality_labels.get(q, f"{q}p")) for q in QUALITY_OPTIONS],
+            value=self.current_settings["playback"].get("quality", "auto"),
+            width=300
+        )
+
         # Appearance settings
         theme_options = [
             ft.dropdown.Option(key, theme.name) 
@@ -66,6 +77,37 @@ class SettingsView(ft.Container):
             icon=ft.Icons.FOLDER_OPEN,
             on_click=self._browse_folder
         )
+
+        self.max_concurrent_dropdown = ft.Dropdown(
+            label="Simultaneous Downloads",
+            options=[ft.dropdown.Option(str(n)) for n in range(1, 9)],
+            value=str(self.current_settings["downloads"].get("max_concurrent", 3)),
+            width=210
+        )
+        self.max_per_host_dropdown = ft.Dropdown(
+            label="Per Server",
+            options=[ft.dropdown.Option(str(n)) for n in range(1, 9)],
+            value=str(self.current_settings["downloads"].get("max_per_host", 2)),
+            width=140
+        )
+
+        # Bandwidth limits (KB/s, 0 = unlimited); time windows are edited in settings.json
+        bandwidth = self.current_settings.get("bandwidth", {})
+        self.limit_field = ft.TextField(
+            label="Speed Limit (KB/s)",
+            value=str(bandwidth.get("limit_kbps", 0)),
+            keyboard_type=ft.KeyboardType.NUMBER,
+            hint_text="0 = unlimited",
+            tooltip="Shared by all downloads. Encrypted HLS streams are fetched by ffmpeg and aren't limited.",
+            width=175
+        )
+        self.playback_limit_field = ft.TextField(
+            label="While Playing (KB/s)",
+            value=str(bandwidth.get("playback_limit_kbps", 0)),
+            keyboard_type=ft.KeyboardType.NUMBER,
+            hint_text="0 = unlimited",
+            width=175
+        )
         
         # Discord RPC settings
         self.rpc_enabled = ft.Switch(
@@ -105,6 +147,7 @@ class SettingsView(ft.Container):
                         ft.Text("🎬 Playback", size=18, weight=ft.FontWeight.BOLD),
                         self.mode_dropdown,
                         self.player_dropdown,
+                        self.quality_dropdown,
                         ft.Divider(height=20),
 
                         # Appearance Section
@@ -118,6 +161,14 @@ class SettingsView(ft.Container):
                             self.download_location,
                             self.browse_button
                         ]),
+                        ft.Row([
+                            self.max_concurrent_dropdown,
+                            self.max_per_host_dropdown
+                        ]),
+                        ft.Row([
+                            self.limit_field,
+                            self.playback_limit_field
+                        ]),
                         ft.Divider(height=20),
                         
                         # Discord RPC Section
@@ -193,7 +244,10 @@ class SettingsView(ft.Container):
         # Update settings
         settings_manager.set("playback", "default_mode", self.mode_dropdown.value)
         settings_manager.set("playback", "default_player", self.player_dropdown.value)
+        settings_manager.set("playback", "quality", self.quality_dropdown.value)
         settings_manager.set("downloads", "location", self.download_location.value)
+        settings_manager.set("downloads", "max_concurrent", int(self.max_concurrent_dropdown.value or 3))
+        settings_manager.set("downloads", "max_per_host", int(self.max_per_host_dropdown.value or 2))
         settings_manager.set("discord_rpc", "enabled", self.rpc_enabled.value)
         settings_manager.set("discord_rpc", "show_episode", self.rpc_show_episode.value)
         settings_manager.set("discord_rpc", "show_title", self.rpc_show_title.value)
@@ -207,17 +261,34 @@ class SettingsView(ft.Container):
             settings_manager.set("appearance", "theme", current_theme_val)
             theme_manager.set_theme(current_theme_val, self._page)
         
-        # Save to file
-        if settings_manager.save_settings():
+        settings_manager.set("bandwidth", "limit_kbps", self._parse_kbps(self.limit_field.value))
+        settings_manager.set("bandwidth", "playback_limit_kbps", self._parse_kbps(self.playback_limit_field.value))
+
+        # New download limits apply to the queue right away
+        download_manager.reschedule()
+        bandwidth_governor.refresh()
+
+        # Save to file (now, not debounced, so the message tells the truth)
+        settings_manager.save_settings()
+        if settings_manager.flush():
             # Show success message
             snackbar = ft.SnackBar(content=ft.Text("✅ Settings saved successfully!"))
-            self._page.overlay.append(snackbar)
-            snackbar.open = True
-            self._page.update()
+        else:
+            snackbar = ft.SnackBar(content=ft.Text(f"⚠️ Could not save settings: {settings_manager.save_error}"))
+        self._page.overlay.append(snackbar)
+        snackbar.open = True
+        self._page.update()
         
         # Close overlay
         self._close(e)
     
+    @staticmethod
+    def _parse_kbps(value):
+        try:
+            return max(0, int(float(value or 0)))
+        except ValueError:
+            return 0
+
     def _on_theme_change(self, e):
         """Update theme immediately"""
         print(f"🖱️ DROPDOWN CHANGE: New value is '{e.data}'")